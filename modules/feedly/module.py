@@ -36,7 +36,7 @@ class FeedlyModule(Module, CapMessages, CapCollection):
     EMAIL = 'carton_ben@yahoo.fr'
     LICENSE = 'AGPLv3+'
     VERSION = '1.1'
-    STORAGE = {'seen': []}
+    STORAGE = {'seen': {}}
     CONFIG = BackendConfig(Value('username', label='Username', default=''),
                            ValueBackendPassword('password', label='Password', default=''))
 
@@ -76,7 +76,7 @@ class FeedlyModule(Module, CapMessages, CapCollection):
         if entry is None:
             return None
 
-        if thread.id not in self.storage.get('seen', default=[]):
+        if thread.id not in self.storage.get_seen():
             entry.flags = Message.IS_UNREAD
 
         entry.thread = thread
@@ -96,8 +96,9 @@ class FeedlyModule(Module, CapMessages, CapCollection):
 
     def set_message_read(self, message):
         self.browser.set_message_read(message.thread.id.split('#')[-1])
-        self.storage.get('seen', default=[]).append(message.thread.id)
-        self.storage.save()
+        seen = self.storage.get_seen()
+        seen.add(message.thread.id)
+        seen.save()
 
     def fill_thread(self, thread, fields):
         return self.get_thread(thread)
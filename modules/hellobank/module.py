@@ -43,7 +43,7 @@ class HelloBankModule(Module, CapBank, CapMessages):
     CONFIG = BackendConfig(ValueBackendPassword('login',      label='Identifiant', masked=False),
                            ValueBackendPassword('password',   label='Code secret', regexp='^(\d{6}|)$'))
     BROWSER = HelloBank
-    STORAGE = {'seen': []}
+    STORAGE = {'seen': {}}
 
     # Store the messages *list* for this duration
     CACHE_THREADS = timedelta(seconds=3 * 60 * 60)
@@ -112,7 +112,7 @@ class HelloBankModule(Module, CapBank, CapMessages):
             # the website is stupid and does not have the messages in the proper order
             threads = sorted(threads, key=lambda t: t.date, reverse=True)
             self._threads = threads
-        seen = self.storage.get('seen', default=[])
+        seen = self.storage.get_seen()
         for thread in threads:
             if thread.id not in seen:
                 thread.root.flags |= thread.root.IS_UNREAD
@@ -142,7 +142,8 @@ class HelloBankModule(Module, CapBank, CapMessages):
                 yield thread.root
 
     def set_message_read(self, message):
-        self.storage.get('seen', default=[]).append(message.thread.id)
-        self.storage.save()
+        seen = self.storage.get_seen()
+        seen.add(message.thread.id)
+        seen.save()
 
     OBJECTS = {Thread: fill_thread}
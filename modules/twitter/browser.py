@@ -97,14 +97,14 @@ class TwitterBrowser(LoginBrowser):
                               children=[]
                               )
 
-        if seen and (_id not in seen):
+        if seen is not None and _id not in seen:
             thread.root.flags = Message.IS_UNREAD
 
         comments = self.thread_page.stay_or_go(_id=splitted_id[1].split('.')[-1], user=splitted_id[0]).iter_comments()
         for comment in comments:
             comment.thread = thread
             comment.parent = thread.root
-            if seen and comment.id not in seen.keys():
+            if seen is not None and comment.id not in seen:
                 comment.flags = Message.IS_UNREAD
 
             thread.root.children.append(comment)
@@ -17,7 +17,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from weboob.tools.value import Value, ValueBackendPassword
 from weboob.tools.backend import Module, BackendConfig
 from weboob.capabilities.messages import CapMessages, Thread, CapMessagesPost
@@ -84,37 +84,16 @@ class TwitterModule(Module, CapMessages, CapMessagesPost, CapCollection):
     def get_thread(self, _id, thread=None, getseen=True):
         seen = None
         if getseen:
-            seen = self.storage.get('seen', default={})
+            seen = self.storage.get_seen(ttl=timedelta(days=60))
         return self.browser.get_thread(_id, thread, seen)
 
     def fill_thread(self, thread, fields, getseen=True):
         return self.get_thread(thread.id, thread, getseen)
 
     def set_message_read(self, message):
-        self.storage.set('seen', message.thread.id, message.thread.date)
-        self.storage.save()
-        self._purge_message_read()
-
-    def _purge_message_read(self):
-        lastpurge = self.storage.get('lastpurge', default=datetime.now() - timedelta(days=60))
-
-        if datetime.now() - lastpurge > timedelta(days=60):
-            self.storage.set('lastpurge', datetime.now() - timedelta(days=60))
-            self.storage.save()
-
-            # we can't directly delete without a "RuntimeError: dictionary changed size during iteration"
-            todelete = []
-
-            for id, date in self.storage.get('seen', default={}).iteritems():
-                # if no date available, create a new one (compatibility with "old" storage)
-                if not date:
-                    self.storage.set('seen', id, datetime.now())
-                elif lastpurge > date:
-                    todelete.append(id)
-
-            for id in todelete:
-                self.storage.delete('seen', id)
-            self.storage.save()
+        seen = self.storage.get_seen(ttl=timedelta(days=60))
+        seen.add(message.thread.id)
+        seen.save()
 
     def post_message(self, message):
         if self.config['username'].get():
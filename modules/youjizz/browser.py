@@ -43,6 +43,17 @@ class YoujizzBrowser(PagesBrowser):
 
         return self.page.get_video(video)
 
+    def get_videos(self, videos):
+        # Pages of videos are loaded at the same time, then parsed in order.
+        loads = [self.async_load(self.video.build(id=video.id)) for video in videos]
+
+        results = []
+        for video, load in zip(videos, loads):
+            page = load.result().page
+            assert isinstance(page, VideoPage)
+            results.append(page.get_video(video))
+        return results
+
     def search_videos(self, pattern):
         self.search.go(pattern=pattern, pagenum=1)
         assert self.search.is_here(pattern=pattern, pagenum=1)
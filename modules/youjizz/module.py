@@ -55,6 +55,17 @@ class YoujizzModule(Module, CapVideo, CapCollection):
 
         return video
 
+    def fill_videos(self, videos, fields):
+        if fields != ['thumbnail']:
+            # if we don't want only the thumbnail, we probably want also every fields
+            videos = self.browser.get_videos(videos)
+        if 'thumbnail' in fields:
+            for video in videos:
+                if video.thumbnail:
+                    video.thumbnail.data = self.browser.open(video.thumbnail.url).content
+
+        return videos
+
     def iter_resources(self, objs, split_path):
         if BaseVideo in objs:
             collection = self.get_collection(objs, split_path)
@@ -73,3 +84,4 @@ class YoujizzModule(Module, CapVideo, CapCollection):
         raise CollectionNotFound(collection.split_path)
 
     OBJECTS = {BaseVideo: fill_video}
+    BULK_OBJECTS = {BaseVideo: fill_videos}
@@ -37,6 +37,10 @@ class YoujizzTest(BackendTest):
         r = self.backend.browser.open(v.url, stream=True)
         self.assertTrue(r.status_code == 200)
 
+        videos = self.backend.fillobjs(l[1:4], ('url',))
+        for v in videos:
+            self.assertTrue(v.url and v.url.startswith('http://'), 'URL for video "%s" not found: %s' % (v.id, v.url))
+
     def test_latest(self):
         l = list(limit(self.backend.iter_resources([BaseVideo], [u'latest_nsfw']), 100))
         self.assertTrue(len(l) > 0)
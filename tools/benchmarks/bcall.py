@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the overhead of WebNip.do() with no-op backends.
+
+Usage: bcall.py [CALLS [BACKENDS [RESULTS]]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+from threading import RLock
+
+from weboob.core.ouiboube import WebNip
+
+
+class NoopBackend(object):
+    def __init__(self, name):
+        self.name = name
+        self.lock = RLock()
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, t, v, tb):
+        self.lock.release()
+
+    def __repr__(self):
+        return '<Backend %r>' % self.name
+
+    def deinit(self):
+        pass
+
+    def iter_nothing(self, count):
+        return range(count)
+
+
+def main(calls=200, backends=10, results=10):
+    weboob = WebNip(modules_path=False)
+    for i in range(backends):
+        backend = NoopBackend('noop%d' % i)
+        weboob.backend_instances[backend.name] = backend
+
+    timings = []
+    for i in range(calls):
+        start = time.time()
+        n = len(list(weboob.do('iter_nothing', results)))
+        timings.append(time.time() - start)
+        assert n == backends * results
+
+    weboob.deinit()
+
+    timings.sort()
+    print('%d calls on %d backends returning %d results each' % (calls, backends, results))
+    print('mean:   %.3f ms' % (1000 * sum(timings) / len(timings)))
+    print('median: %.3f ms' % (1000 * timings[len(timings) // 2]))
+    print('p99:    %.3f ms' % (1000 * timings[int(len(timings) * 0.99)]))
+    print('max:    %.3f ms' % (1000 * timings[-1]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
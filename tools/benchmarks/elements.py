@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cost per item of parsing a transactions table with elements.
+
+Usage: elements.py [ROWS [ROUNDS]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from requests.models import Response
+
+from weboob.browser import Browser
+from weboob.browser.elements import ItemElement, TableElement, method
+from weboob.browser.filters.standard import CleanDecimal, CleanText, Date, Env, TableCell
+from weboob.browser.pages import HTMLPage
+from weboob.capabilities.bank import Transaction
+
+
+class Row(object):
+    id = None
+
+
+class HistoryPage(HTMLPage):
+    @method
+    class iter_rows(TableElement):
+        head_xpath = '//table[@id="history"]/thead/tr/th'
+        item_xpath = '//table[@id="history"]/tbody/tr'
+
+        col_date = u'Date'
+
+        class item(ItemElement):
+            klass = Row
+
+            obj_account = Env('account')
+
+    @method
+    class iter_history(TableElement):
+        head_xpath = '//table[@id="history"]/thead/tr/th'
+        item_xpath = '//table[@id="history"]/tbody/tr'
+
+        col_date = u'Date'
+        col_label = u'Libellé'
+        col_amount = u'Montant'
+
+        class item(ItemElement):
+            klass = Transaction
+
+            obj_date = Date(CleanText(TableCell('date')), dayfirst=True)
+            obj_raw = CleanText(TableCell('label'))
+            obj_label = CleanText(TableCell('label'))
+            obj_amount = CleanDecimal(TableCell('amount'), replace_dots=True)
+            obj__account = Env('account')
+
+            def parse(self, el):
+                self.env['row'] = el
+
+
+def make_page(browser, rows):
+    lines = [u'<html><head><meta charset="utf-8"></head><body><table id="history">',
+             u'<thead><tr><th>Date</th><th>Libellé</th><th>Montant</th></tr></thead><tbody>']
+    for i in range(rows):
+        lines.append(u'<tr><td>%02d/01/2015</td><td>PRLV SEPA  Opération n°%d</td><td>-%d,%02d €</td></tr>'
+                     % (i % 28 + 1, i, i * 3, i % 100))
+    lines.append(u'</tbody></table></body></html>')
+
+    response = Response()
+    response.status_code = 200
+    response.url = 'http://bank.example.org/history'
+    response._content = u'\n'.join(lines).encode('utf-8')
+    response.encoding = 'utf-8'
+    return HistoryPage(browser, response, {'account': '1234'})
+
+
+def main(rows=2000, rounds=5):
+    browser = Browser()
+    page = make_page(browser, rows)
+    page.doc
+
+    def bench(func):
+        timings = []
+        for i in range(rounds):
+            start = time.time()
+            n = len(list(func()))
+            timings.append(time.time() - start)
+            assert n == rows
+        return 1e6 * min(timings) / rows
+
+    print('%d rows, best of %d rounds' % (rows, rounds))
+    print('bare items:         %.1f us per item' % bench(page.iter_rows))
+    print('transaction items:  %.1f us per item' % bench(page.iter_history))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
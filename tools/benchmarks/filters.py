@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure TableCell, CleanText and CleanDecimal on the cells of a large statement
+table.
+
+Usage: filters.py [ROWS [ROUNDS]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import lxml.html
+
+from weboob.browser.elements import ItemElement, TableElement
+from weboob.browser.filters.standard import CleanDecimal, CleanText, TableCell
+
+
+class Obj(object):
+    id = None
+
+
+class MockPage(object):
+    params = {}
+
+    def __init__(self, doc):
+        self.doc = doc
+
+
+class Statement(TableElement):
+    head_xpath = '//table/thead/tr/th'
+    item_xpath = '//table/tbody/tr'
+
+    col_date = u'Date'
+    col_label = u'Libellé'
+    col_amount = u'Montant'
+
+    class item(ItemElement):
+        klass = Obj
+
+        obj_date = TableCell('date')
+        obj_label = TableCell('label')
+        obj_amount = TableCell('amount')
+
+
+def make_doc(rows):
+    lines = [u'<html><body><table>',
+             u'<thead><tr><th>Date</th><th>Libellé</th><th>Montant</th></tr></thead><tbody>']
+    for i in range(rows):
+        label = u'PRLV SEPA  Opération\n   n°%d' % i if i % 2 else u'CB CARREFOUR   %d' % i
+        lines.append(u'<tr><td>%02d/01/2015</td><td><span>%s</span></td><td>-%d %03d,%02d €</td></tr>'
+                     % (i % 28 + 1, label, i, i % 1000, i % 100))
+    lines.append(u'</tbody></table></body></html>')
+    return lxml.html.fromstring(u'\n'.join(lines))
+
+
+def main(rows=5000, rounds=5):
+    table = Statement(MockPage(make_doc(rows)))
+    labels = table.xpath('//table/tbody/tr/td[2]')
+    amounts = table.xpath('//table/tbody/tr/td[3]')
+
+    clean_text = CleanText('.')
+    clean_decimal = CleanDecimal('.', replace_dots=True)
+
+    def bench(func):
+        timings = []
+        for i in range(rounds):
+            start = time.time()
+            func()
+            timings.append(time.time() - start)
+        return 1e6 * min(timings) / rows
+
+    print('%d rows, best of %d rounds' % (rows, rounds))
+    print('CleanText per cell:     %.2f us' % bench(lambda: [clean_text(el) for el in labels]))
+    print('CleanDecimal per cell:  %.2f us' % bench(lambda: [clean_decimal(el) for el in amounts]))
+    print('TableCell per row:      %.2f us' % bench(lambda: list(Statement(table.page))))
+    if hasattr(table, 'clean_column'):
+        print('clean_column per cell:  %.2f us' % bench(lambda: table.clean_column('label')))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure memory and time used by a large number of transactions.
+
+Usage: objects.py [COUNT]
+"""
+
+from __future__ import print_function
+
+import datetime
+import gc
+import os
+import sys
+import time
+from decimal import Decimal
+
+from weboob.capabilities.bank import Transaction
+
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def main(count=100000):
+    gc.collect()
+    before = rss()
+
+    start = time.time()
+    transactions = []
+    for i in range(count):
+        tr = Transaction(i)
+        tr.date = tr.rdate = datetime.date(2015, 1, 1 + i % 28)
+        tr.label = tr.raw = u'CB CARREFOUR %d' % i
+        tr.amount = Decimal(i)
+        transactions.append(tr)
+    built = time.time() - start
+
+    gc.collect()
+    used = rss() - before
+
+    start = time.time()
+    for tr in transactions:
+        tr.date, tr.label, tr.amount, tr.category
+    read = time.time() - start
+
+    start = time.time()
+    for tr in transactions:
+        tr._link = None
+        tr.label = u'CARREFOUR'
+        tr.amount = Decimal('1')
+    assigned = time.time() - start
+
+    trusted = None
+    if hasattr(Transaction, 'set_trusted'):
+        start = time.time()
+        for tr in transactions:
+            tr._link = None
+            tr.set_trusted('label', u'CARREFOUR')
+            tr.set_trusted('amount', Decimal('1'))
+        trusted = time.time() - start
+
+    print('%d transactions' % count)
+    print('memory:        %.0f bytes per object' % (float(used) / count))
+    print('build and set: %.2f us per object' % (1e6 * built / count))
+    print('read 4 fields: %.2f us per object' % (1e6 * read / count))
+    print('set 3 attrs:   %.2f us per object' % (1e6 * assigned / count))
+    if trusted is not None:
+        print('set trusted:   %.2f us per object' % (1e6 * trusted / count))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how many HTML pages per second are instantiated.
+
+Usage: pages.py [DIRECTORY]
+
+DIRECTORY contains saved pages, for example the ones stored by a browser
+with responses_dirname. By default, bank-like pages declaring their charset
+in a meta tag, different from the HTTP one, are generated.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+from requests.models import Response
+
+from weboob.browser import Browser
+from weboob.browser.pages import HTMLPage
+
+
+def generate_corpus(count=50, rows=200):
+    corpus = []
+    for i in range(count):
+        lines = [u'<html><head>',
+                 u'<meta http-equiv="Content-Type" content="text/html; charset=utf-8">',
+                 u'<title>Historique du compte %d</title>' % i,
+                 u'<script>%s</script>' % (u'var x = 1;\n' * 50),
+                 u'</head><body><table id="history">']
+        for j in range(rows):
+            lines.append(u'<tr><td>%02d/01/2015</td><td>PRLV SEPA Opération n°%d</td><td class="amount">-%d,%02d €</td></tr>'
+                         % (j % 28 + 1, j, j * 3, j % 100))
+        lines.append(u'</table></body></html>')
+        corpus.append(u'\n'.join(lines).encode('utf-8'))
+    return corpus
+
+
+def load_corpus(dirname):
+    corpus = []
+    for filename in sorted(os.listdir(dirname)):
+        if filename.endswith('.html'):
+            with open(os.path.join(dirname, filename), 'rb') as f:
+                corpus.append(f.read())
+    return corpus
+
+
+def make_response(content):
+    response = Response()
+    response.status_code = 200
+    response.url = 'http://bank.example.org/history'
+    response._content = content
+    # What requests gives for "text/html" without charset.
+    response.encoding = 'ISO-8859-1'
+    return response
+
+
+def main(dirname=None, rounds=5):
+    corpus = load_corpus(dirname) if dirname else generate_corpus()
+    browser = Browser()
+
+    def bench(func):
+        start = time.time()
+        for i in range(rounds):
+            for content in corpus:
+                func(HTMLPage(browser, make_response(content)))
+        return rounds * len(corpus) / (time.time() - start)
+
+    print('%d pages, %d KB' % (len(corpus), sum(len(content) for content in corpus) // 1024))
+    print('instantiate:     %.1f pages/s' % bench(lambda page: page.content))
+    print('instantiate+doc: %.1f pages/s' % bench(lambda page: page.doc))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cost of many repeated jobs in the scheduler.
+
+Usage: scheduler.py [JOBS [INTERVAL [DURATION]]]
+"""
+
+from __future__ import print_function
+
+import resource
+import sys
+import threading
+import time
+
+from weboob.core.scheduler import Scheduler
+
+
+class Probe(object):
+    def __init__(self, interval):
+        self.interval = interval
+        self.last = None
+        self.calls = 0
+        self.delays = []
+
+    def tick(self):
+        now = time.time()
+        if self.last is not None:
+            self.delays.append(now - self.last - self.interval)
+        self.last = now
+        self.calls += 1
+
+
+def main(jobs=10000, interval=1, duration=5):
+    jobs = int(jobs)
+    def cpu():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    scheduler = Scheduler()
+    probes = [Probe(interval) for i in range(jobs)]
+
+    cpu_start = cpu()
+    start = time.time()
+    ids = [scheduler.repeat(interval, probe.tick) for probe in probes]
+    registered = time.time() - start
+
+    time.sleep(duration)
+    threads = threading.active_count()
+
+    start = time.time()
+    for ev in ids:
+        scheduler.cancel(ev)
+    cancelled = time.time() - start
+
+    scheduler._wait_to_stop()
+    cpu_used = cpu() - cpu_start
+
+    delays = sorted(delay for probe in probes for delay in probe.delays)
+    print('%d jobs repeated every %ss during %ss' % (jobs, interval, duration))
+    print('threads:     %d' % threads)
+    print('calls:       %d' % sum(probe.calls for probe in probes))
+    print('register:    %.3f s' % registered)
+    print('cancel:      %.3f s' % cancelled)
+    print('cpu:         %.3f s' % cpu_used)
+    if delays:
+        print('delay p50:   %.3f ms' % (1000 * delays[len(delays) // 2]))
+        print('delay p99:   %.3f ms' % (1000 * delays[int(len(delays) * 0.99)]))
+        print('delay max:   %.3f ms' % (1000 * delays[-1]))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the time to mark a message as seen and save the storage, like
+monboob does, with several backends which have each seen many messages.
+
+Usage: storage.py [BACKENDS [SEEN [ROUNDS]]]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from weboob.tools.storage import BufferedStorage, SQLiteStorage, StandardStorage
+
+
+def bench(klass, path, backends, seen, rounds):
+    storage = klass(path)
+    for i in range(backends):
+        storage.load('backends', 'backend%d' % i, {'seen': [u'thread%d@backend%d' % (j, i) for j in range(seen)]})
+        storage.save('backends', 'backend%d' % i)
+
+    start = time.time()
+    for j in range(rounds):
+        storage.get('backends', 'backend0', 'seen').append(u'new%d' % j)
+        storage.save('backends', 'backend0')
+    duration = time.time() - start
+    storage.flush()
+    return 1e3 * duration / rounds
+
+
+def main(backends=10, seen=5000, rounds=20):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('%d backends, %d seen messages each' % (backends, seen))
+        for klass in (StandardStorage, SQLiteStorage):
+            path = os.path.join(tmpdir, klass.__name__)
+            print('%-16s %.1f ms per save' % (klass.__name__ + ':', bench(klass, path, backends, seen, rounds)))
+
+            buffered = lambda path: BufferedStorage(klass(path))
+            path = os.path.join(tmpdir, 'Buffered' + klass.__name__)
+            print('%-16s %.3f ms per save' % ('  buffered:', bench(buffered, path, backends, seen, rounds)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
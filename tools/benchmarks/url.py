@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure URL.build() and URL.match() over URL tables of modules.
+
+Usage: url.py [ROUNDS [MODULE...]]
+"""
+
+from __future__ import print_function
+
+import imp
+import inspect
+import os
+import sys
+import time
+
+from weboob.browser import PagesBrowser
+from weboob.browser.browsers import DomainBrowser
+from weboob.browser.url import UrlNotResolvable
+from weboob.tools.regex_helper import normalize
+
+
+MODULES_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'modules')
+DEFAULT_MODULES = ['youtube', 'creditmutuel', 'wellsfargo', 'hsbc', 'groupamaes', 'amazon', 'twitter', 'pastebin']
+
+
+def iter_urls(module_names):
+    for name in module_names:
+        try:
+            package = imp.load_module(name, *imp.find_module(name, [MODULES_PATH]))
+            browser = imp.load_module('%s.browser' % name, *imp.find_module('browser', package.__path__))
+        except Exception as e:
+            print('Unable to load %s: %s' % (name, e), file=sys.stderr)
+            continue
+
+        for klass in vars(browser).values():
+            if inspect.isclass(klass) and issubclass(klass, PagesBrowser) and klass._urls:
+                base = klass.BASEURL or 'http://example.org'
+                for url in klass._urls.values():
+                    yield base, url
+
+
+def main(rounds=200, *module_names):
+    module_names = module_names or DEFAULT_MODULES
+
+    cases = []
+    for base, url in iter_urls(module_names):
+        browser = DomainBrowser(baseurl=base)
+        try:
+            pattern, names = normalize(url.urls[0])[0]
+            kwargs = dict((name, '1') for name in names)
+            url.build(browser=browser, **kwargs)
+        except (UrlNotResolvable, ValueError, NotImplementedError):
+            kwargs = None
+        cases.append((browser, base, url, kwargs))
+
+    def bench(func):
+        start = time.time()
+        for i in range(rounds):
+            for browser, base, url, kwargs in cases:
+                func(browser, base, url, kwargs)
+        return (time.time() - start) / (rounds * len(cases)) * 1e6
+
+    def build(browser, base, url, kwargs):
+        if kwargs is not None:
+            url.build(browser=browser, **kwargs)
+
+    def match(browser, base, url, kwargs):
+        url.match(base + '/some/path', base)
+
+    print('%d URL objects from %s' % (len(cases), ', '.join(module_names)))
+    print('build: %.2f us per call' % bench(build))
+    print('match: %.2f us per call' % bench(match))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, *sys.argv[2:])
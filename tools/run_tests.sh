@@ -43,6 +43,12 @@ if [ -z "${NOSE}" ]; then
     which nosetests-python2.7 >/dev/null 2>&1 && NOSE=$(which nosetests-python2.7)
 fi
 
+# Python 3 is optional, it is used to test the asyncio support
+if [ -z "${PYTHON3}" ]; then
+    PYTHON3=""
+    which python3 >/dev/null 2>&1 && python3 -c "import nose" >/dev/null 2>&1 && PYTHON3=$(which python3)
+fi
+
 if [ -z "${PYTHON}" ]; then
     echo "Python required"
     exit 1
@@ -83,6 +89,12 @@ else
     echo "=== Weboob ==="
     ${PYTHON} ${NOSE} -c ${WEBOOB_DIR}/setup.cfg -sv
     STATUS_CORE=$?
+    if [ -n "${PYTHON3}" ]; then
+        echo "=== Weboob (Python 3) ==="
+        ${PYTHON3} -m nose -c /dev/null -sv weboob.core.tests.bcall || STATUS_CORE=$?
+    else
+        echo "python3-nose not found, asyncio support is not tested"
+    fi
     echo "=== Modules ==="
     find "${WEBOOB_MODULES}" -name "test.py" | sort | xargs ${PYTHON} ${NOSE} -c /dev/null -sv ${XUNIT_ARGS}
 fi
@@ -39,6 +39,7 @@ from weboob.tools.application.repl import ReplApplication
 from weboob.tools.date import utc2local
 from weboob.tools.html import html2text
 from weboob.tools.misc import get_backtrace, to_unicode
+from weboob.tools.storage import SQLiteStorage
 
 
 __all__ = ['Monboob']
@@ -72,19 +73,13 @@ class MonboobScheduler(Scheduler):
                 self.logger.error('Unable to start the SMTP daemon: %s' % e)
                 return False
 
-        # XXX Fuck, we shouldn't copy this piece of code from
-        # weboob.scheduler.Scheduler.run().
-        try:
-            while True:
-                self.stop_event.wait(0.1)
-                if self.app.options.smtpd:
-                    asyncore.loop(timeout=0.1, count=1)
-        except KeyboardInterrupt:
-            self._wait_to_stop()
-            raise
+        return Scheduler.run(self)
+
+    def _wait(self, timeout):
+        if self.app.options.smtpd:
+            asyncore.loop(timeout=timeout, count=1)
         else:
-            self._wait_to_stop()
-        return True
+            Scheduler._wait(self, timeout)
 
 
 class Monboob(ReplApplication):
@@ -110,7 +105,7 @@ class Monboob(ReplApplication):
         return Weboob(scheduler=MonboobScheduler(self))
 
     def load_default_backends(self):
-        self.load_backends(CapMessages, storage=self.create_storage())
+        self.load_backends(CapMessages, storage=self.create_storage(klass=SQLiteStorage, buffered=True))
 
     def main(self, argv):
         self.load_config()
@@ -22,9 +22,12 @@ from __future__ import print_function
 import requests
 import subprocess
 import os
+from contextlib import closing
 
+from weboob.browser import Browser
 from weboob.capabilities.video import CapVideo, BaseVideo
 from weboob.capabilities.base import empty
+from weboob.exceptions import BrowserUnavailable
 from weboob.tools.application.repl import ReplApplication, defaultcount
 from weboob.tools.application.media_player import InvalidMediaPlayer, MediaPlayer, MediaPlayerNotFound
 from weboob.tools.application.formatters.iformatter import PrettyFormatter
@@ -98,31 +101,53 @@ class Videoob(ReplApplication):
             if not check_exec('mimms'):
                 return 1
             args = ('mimms', '-r', video.url, dest)
-        elif u'm3u8' == video.ext:
-            _dest, _ = os.path.splitext(dest)
-            dest = u'%s.%s' % (_dest, 'mp4')
-            content = tuple()
-            baseurl = video.url.rpartition('/')[0]
-            for line in self.read_url(video.url):
-                if not line.startswith('#'):
-                    if not line.startswith('http'):
-                        line = u'%s/%s' % (baseurl, line)
-                    content += (line,)
-
-            args = ('wget', '-nv',) + content + ('-O', dest)
         else:
-            if check_exec('wget'):
-                args = ('wget', '-c', video.url, '-O', dest)
-            elif check_exec('curl'):
-                args = ('curl', '-C', '-', video.url, '-o', dest)
-            else:
+            # Download with the browser, which streams the video on disk. The
+            # backend is locked, as its browser may be used by other threads.
+            backend = self.weboob[video.backend]
+            try:
+                with backend:
+                    browser = self.get_browser(backend)
+                    if u'm3u8' == video.ext:
+                        _dest, _ = os.path.splitext(dest)
+                        dest = u'%s.%s' % (_dest, 'mp4')
+                        baseurl = video.url.rpartition('/')[0]
+                        with open(dest, 'wb') as f, closing(browser._open_stream(video.url)) as playlist:
+                            for line in playlist.iter_lines():
+                                if line and not line.startswith('#'):
+                                    if not line.startswith('http'):
+                                        line = u'%s/%s' % (baseurl, line)
+                                    browser.download(line, f)
+                    else:
+                        browser.download(video.url, dest, resume=True, progress=self.print_progress)
+            except (BrowserUnavailable, requests.RequestException, IOError) as e:
+                print('Error: unable to download %s: %s' % (video.url, e), file=self.stderr)
                 return 1
+            finally:
+                if self.stderr.isatty():
+                    print('', file=self.stderr)
+            return
 
         os.spawnlp(os.P_WAIT, args[0], *args)
 
-    def read_url(self, url):
-        r = requests.get(url, stream=True)
-        return r.iter_lines()
+    def get_browser(self, backend):
+        """
+        Get the browser of the backend, to download its videos with its
+        cookies, or a new browser if the backend has none.
+        """
+        browser = getattr(backend, 'browser', None)
+        if not isinstance(browser, Browser):
+            browser = Browser(logger=self.logger)
+        return browser
+
+    def print_progress(self, downloaded, total):
+        if not self.stderr.isatty():
+            return
+        if total:
+            self.stderr.write('\r%d%% of %.1f MB' % (downloaded * 100 / total, total / 1048576.))
+        else:
+            self.stderr.write('\r%.1f MB' % (downloaded / 1048576.))
+        self.stderr.flush()
 
     def complete_download(self, text, line, *ignored):
         args = line.split(' ')
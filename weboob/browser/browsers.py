@@ -28,10 +28,15 @@ try:
     from urllib.parse import urlparse, urljoin
 except ImportError:
     from urlparse import urlparse, urljoin
+import hashlib
 import os
 import sys
 from copy import deepcopy
 import inspect
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
 
 try:
     import requests
@@ -44,12 +49,15 @@ from weboob.tools.log import getLogger
 from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.json import json
 
+from .cache import CacheAdapter, HTTPCache
+from .cassette import RecordAdapter, ReplayAdapter
 from .cookies import WeboobCookieJar
-from .exceptions import HTTPNotFound, ClientError, ServerError
+from .loader import Loader
+from .exceptions import HTTPNotFound, ClientError, ServerError, DownloadError
 from .sessions import FuturesSession
 from .profiles import Firefox
-from .pages import NextPage
-from .url import URL
+from .pages import NextPage, iter_pages
+from .url import URL, URLDispatcher
 
 
 class Browser(object):
@@ -85,7 +93,38 @@ class Browser(object):
 
     MAX_WORKERS = 10
     """
-    Maximum of threads for asynchronous requests.
+    Maximum of threads for asynchronous requests. There are at least
+    :attr:`MAX_LOADS_PER_HOST` of them.
+    """
+
+    MAX_LOADS_PER_HOST = 4
+    """
+    Maximum of requests run at the same time on a host by :meth:`async_load`.
+    """
+
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+    """
+    Size of chunks written by :meth:`download`.
+    """
+
+    CACHE_TTL = None
+    """
+    Freshness lifetime of cached responses, in seconds, overriding the one
+    given by servers. None to rely on response headers, 0 to disable cache.
+    Only used when the browser is created with a `cache_dirname`.
+    """
+
+    CACHE_MAX_SIZE = 50 * 1024 * 1024
+    """
+    Maximum size of the HTTP cache, in bytes.
+    """
+
+    REPLAY_STRICT = True
+    """
+    When replaying a cassette, only serve responses of requests with the same
+    method, URL and body. Set it to False if the browser sends requests with
+    changing parameters, like timestamps (see
+    :class:`weboob.browser.cassette.ReplayAdapter`).
     """
 
     @classmethod
@@ -97,9 +136,11 @@ class Browser(object):
             return localfile
         return os.path.join(os.path.dirname(inspect.getfile(cls)), localfile)
 
-    def __init__(self, logger=None, proxy=None, responses_dirname=None):
+    def __init__(self, logger=None, proxy=None, responses_dirname=None, cache_dirname=None, cassette=None):
         self.logger = getLogger('browser', logger)
         self.PROXIES = proxy
+        self.cache_dirname = cache_dirname
+        self.cassette = cassette
         self._setup_session(self.PROFILE)
         self.url = None
         self.response = None
@@ -168,7 +209,9 @@ class Browser(object):
         """
         Set up a python-requests session for our usage.
         """
-        session = FuturesSession(max_workers=self.MAX_WORKERS)
+        # Threads are shared by all hosts, so at least MAX_LOADS_PER_HOST
+        # are needed for this limit to be reached.
+        session = FuturesSession(max_workers=max(self.MAX_WORKERS, self.MAX_LOADS_PER_HOST))
 
         session.proxies = self.PROXIES
 
@@ -179,6 +222,14 @@ class Browser(object):
         # defines a max_retries. It's mandatory in case a server is not
         # handling keep alive correctly, like the proxy burp
         a = requests.adapters.HTTPAdapter(max_retries=self.MAX_RETRIES)
+        if self.cassette is not None:
+            # Record exchanges made on network, or replay them.
+            if self.cassette.record:
+                a = RecordAdapter(self.cassette, a)
+            else:
+                a = ReplayAdapter(self.cassette, self.REPLAY_STRICT)
+        if self.cache_dirname is not None:
+            a = CacheAdapter(HTTPCache(self.cache_dirname, self.CACHE_MAX_SIZE), a, self.get_cache_ttl)
         session.mount('http://', a)
         session.mount('https://', a)
 
@@ -196,6 +247,15 @@ class Browser(object):
 
         session.cookies = WeboobCookieJar()
 
+    def get_cache_ttl(self, url):
+        """
+        Get the freshness lifetime of cached responses of an URL, overriding
+        the one given by the server. By default, it is :attr:`CACHE_TTL`.
+
+        :rtype: :class:`int` or None
+        """
+        return self.CACHE_TTL
+
     def set_profile(self, profile):
         profile.setup_session(self.session)
 
@@ -221,6 +281,7 @@ class Browser(object):
                    proxies=None,
                    data_encoding=None,
                    async=False,
+                   loop=None,
                    callback=lambda response: response,
                    **kwargs):
         """
@@ -250,6 +311,9 @@ class Browser(object):
 
         >>> Browser().open('http://google.com', async=True).result().text # doctest: +SKIP
 
+        If an asyncio `loop` is also given, the future is an asyncio one,
+        which can be awaited in a coroutine of this loop (see :meth:`aopen`).
+
         :param url: URL
         :type url: str
 
@@ -262,6 +326,9 @@ class Browser(object):
         :param async: Process request in a non-blocking way
         :type async: bool
 
+        :param loop: with `async`, event loop of the returned future
+        :type loop: :class:`asyncio.AbstractEventLoop`
+
         :param callback: Callback to be called when request has finished,
                          with response as its first and only argument
         :type callback: function
@@ -306,6 +373,10 @@ class Browser(object):
                                      background_callback=async and inner_callback)
         if not async:
             inner_callback(self, response)
+        elif loop is not None:
+            if asyncio is None:
+                raise ImportError('Please use Python 3.4 or later to use asyncio')
+            response = asyncio.wrap_future(response, loop=loop)
 
         return response
 
@@ -317,6 +388,148 @@ class Browser(object):
             del kwargs['async']
         return self.open(url, async=True, **kwargs)
 
+    _loader = None
+
+    def async_load(self, url, **kwargs):
+        """
+        Like :meth:`async_open`, but at most :attr:`MAX_LOADS_PER_HOST`
+        requests are run at the same time on a host; others are queued. It is
+        used to load detail pages of list items, see
+        :class:`weboob.browser.filters.standard.AsyncLoad`.
+
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        if self._loader is None:
+            self._loader = Loader(self, self.MAX_LOADS_PER_HOST)
+        return self._loader.load(url, **kwargs)
+
+    def aopen(self, url, loop=None, **kwargs):
+        """
+        Shortcut to open(url, async=True, loop=loop), which returns an asyncio
+        future to await in a coroutine. It requires Python 3.4 or later.
+
+        >>> response = await browser.aopen('http://weboob.org')  # doctest: +SKIP
+
+        The session still runs requests in its threads: the asyncio future
+        only wraps the one returned by :meth:`async_open`.
+
+        :param loop: event loop of the future; default is the current one
+        :type loop: :class:`asyncio.AbstractEventLoop`
+        """
+        if asyncio is None:
+            raise ImportError('Please use Python 3.4 or later to use asyncio')
+        kwargs.pop('async', None)
+        return self.open(url, async=True, loop=loop or asyncio.get_event_loop(), **kwargs)
+
+    def download(self, url, dest, resume=False, size=None, checksum=None, progress=None,
+                 chunk_size=None, **kwargs):
+        """
+        Download a resource to a file, writing it by chunks, so it is never
+        entirely loaded in memory. The request is made like with :meth:`open`,
+        so cookies, proxies and other settings of the browser are used, but
+        the response is not handled by pages, which would read it entirely.
+
+        When *resume* is True and *dest* is the path of an existing file, only
+        the missing part is requested, with a Range header. If the server does
+        not support it, the file is downloaded again from the beginning.
+
+        >>> Browser().download('http://weboob.org/video.mp4', 'video.mp4', resume=True)  # doctest: +SKIP
+
+        :param url: URL or Request object
+        :param dest: path of the file, or file object opened in binary mode
+        :type dest: :class:`str` or :class:`file`
+        :param resume: continue the download of an existing file
+        :type resume: :class:`bool`
+        :param size: expected size of the file, in bytes
+        :type size: :class:`int`
+        :param checksum: expected checksum of the file, as a tuple (algorithm,
+                         hex digest), for example ('sha256', '9f86d0...')
+        :type checksum: :class:`tuple`
+        :param progress: function called after each chunk with the number of
+                         bytes of the file and the total size, or None if it
+                         is unknown
+        :type progress: function
+        :param chunk_size: size of chunks read from network, default is
+                           :attr:`DOWNLOAD_CHUNK_SIZE`
+        :type chunk_size: :class:`int`
+        :raises: :class:`weboob.browser.exceptions.DownloadError` if the size
+                 or checksum of the file is not the expected one
+        :returns: size of the file, in bytes
+        :rtype: :class:`int`
+        """
+        chunk_size = chunk_size or self.DOWNLOAD_CHUNK_SIZE
+        hasher = hashlib.new(checksum[0]) if checksum else None
+        headers = dict(kwargs.pop('headers', None) or {})
+        # Sizes and ranges are about the content as it is sent.
+        headers.setdefault('Accept-Encoding', 'identity')
+
+        offset = 0
+        if isinstance(dest, basestring):
+            if resume and os.path.exists(dest):
+                offset = os.path.getsize(dest)
+            f = open(dest, 'ab' if offset else 'wb')
+        else:
+            f = dest
+
+        try:
+            response = None
+            if not offset:
+                response = self._open_stream(url, headers=headers, **kwargs)
+            elif size is None or offset < size:
+                headers['Range'] = 'bytes=%d-' % offset
+                try:
+                    response = self._open_stream(url, headers=headers, **kwargs)
+                except ClientError as e:
+                    # 416 Range Not Satisfiable: the file is already complete.
+                    if e.response.status_code != 416:
+                        raise
+
+                if response is not None and response.status_code != 206:
+                    self.logger.debug('Range not supported by server, download %s again', url)
+                    offset = 0
+                    f.seek(0)
+                    f.truncate()
+                elif response is not None:
+                    content_range = response.headers.get('Content-Range', '')
+                    if not content_range.startswith('bytes %d-' % offset):
+                        response.close()
+                        raise DownloadError('Unexpected range "%s" sent for %s' % (content_range, url))
+
+            if offset and hasher is not None:
+                with open(dest, 'rb') as existing:
+                    for chunk in iter(lambda: existing.read(chunk_size), b''):
+                        hasher.update(chunk)
+
+            total = offset
+            if response is not None:
+                length = response.headers.get('Content-Length')
+                total = offset + int(length) if length and length.isdigit() else size
+                try:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        if progress is not None:
+                            progress(offset, total)
+                finally:
+                    response.close()
+        finally:
+            if f is not dest:
+                f.close()
+
+        if size is not None and offset != size:
+            raise DownloadError('Downloaded %d bytes from %s instead of %d' % (offset, url, size))
+        if total is not None and offset != total:
+            raise DownloadError('Downloaded %d bytes from %s instead of %d' % (offset, url, total))
+        if hasher is not None and hasher.hexdigest().lower() != checksum[1].lower():
+            raise DownloadError('Checksum of %s is %s instead of %s' % (url, hasher.hexdigest(), checksum[1]))
+        return offset
+
+    def _open_stream(self, url, **kwargs):
+        # Used by download() to get the response before reading its content.
+        return self.open(url, stream=True, **kwargs)
+
     def raise_for_status(self, response):
         """
         Like Response.raise_for_status but will use other classes if needed.
@@ -584,7 +797,16 @@ class PagesBrowser(DomainBrowser):
     """
 
 
+    PREFETCH_PAGES = 0
+    """
+    Number of next pages requested in background by :meth:`pagination`
+    and the :func:`weboob.browser.pages.pagination` decorator, while the
+    current page is processed. 0 to disable it, which is required if the
+    website expects pages to be visited in order.
+    """
+
     _urls = None
+    _dispatcher = None
     __metaclass__ = _PagesBrowserMeta
 
     def __getattr__(self, name):
@@ -602,6 +824,12 @@ class PagesBrowser(DomainBrowser):
         for url in self._urls.itervalues():
             url.browser = self
 
+    def _get_dispatcher(self):
+        # BASEURL can be changed after the browser creation.
+        if self._dispatcher is None or self._dispatcher.base != self.BASEURL:
+            self._dispatcher = URLDispatcher(self._urls.values(), self.BASEURL)
+        return self._dispatcher
+
     def open(self, *args, **kwargs):
         """
         Same method than
@@ -616,10 +844,12 @@ class PagesBrowser(DomainBrowser):
         # asynchronous requests, see :meth:`Browser.open` and its `async`
         # and `callback` params.
         def internal_callback(response):
-            # Try to handle the response page with an URL instance.
+            # Try to handle the response page with an URL instance. The
+            # document is parsed once and shared by candidate pages.
             response.page = None
-            for url in self._urls.itervalues():
-                page = url.handle(response)
+            response.docs = {}
+            for url, match in self._get_dispatcher().iter_matches(response.url):
+                page = url.handle(response, match)
                 if page is not None:
                     self.logger.debug('Handle %s with %s' % (response.url, page.__class__.__name__))
                     response.page = page
@@ -632,6 +862,23 @@ class PagesBrowser(DomainBrowser):
 
         return super(PagesBrowser, self).open(callback=internal_callback, *args, **kwargs)
 
+    def _open_stream(self, url, **kwargs):
+        # Bypass pages: even if no page matches, looking for one may read the
+        # whole content.
+        return super(PagesBrowser, self).open(url, stream=True, **kwargs)
+
+    def get_cache_ttl(self, url):
+        """
+        Use the :attr:`weboob.browser.pages.Page.CACHE_TTL` attribute of the
+        page matching the url, if any.
+        """
+        for url_obj, match in self._get_dispatcher().iter_matches(url):
+            ttl = getattr(url_obj.klass, 'CACHE_TTL', None)
+            if ttl is not None:
+                return ttl
+            break
+        return super(PagesBrowser, self).get_cache_ttl(url)
+
     def location(self, *args, **kwargs):
         """
         Same method than
@@ -643,8 +890,23 @@ class PagesBrowser(DomainBrowser):
             # Call leave hook.
             self.page.on_leave()
 
-        response = self.open(*args, **kwargs)
+        return self._set_response(self.open(*args, **kwargs))
 
+    def location_response(self, response):
+        """
+        Like :meth:`location`, but go on a page from a response which has
+        already been received, for example with :meth:`async_open`.
+
+        :param response: response returned by :meth:`open`
+        :type response: :class:`requests.Response`
+        """
+        if self.page is not None:
+            # Call leave hook.
+            self.page.on_leave()
+
+        return self._set_response(response)
+
+    def _set_response(self, response):
         self.response = response
         self.page = response.page
         self.url = response.url
@@ -665,6 +927,12 @@ class PagesBrowser(DomainBrowser):
 
         :class:`NextPage` constructor can take an url or a Request object.
 
+        If the current call is cancelled (see :mod:`weboob.tools.cancel`), the
+        next page is not loaded.
+
+        If :attr:`PREFETCH_PAGES` is set, next pages are requested in
+        background (see :class:`weboob.browser.pages.Prefetcher`).
+
         >>> from .pages import HTMLPage
         >>> class Page(HTMLPage):
         ...     def iter_values(self):
@@ -683,14 +951,7 @@ class PagesBrowser(DomainBrowser):
         >>> list(b.pagination(lambda: b.page.iter_values()))
         ['One', 'Two', 'Three', 'Four']
         """
-        while True:
-            try:
-                for r in func(*args, **kwargs):
-                    yield r
-            except NextPage as e:
-                self.location(e.request)
-            else:
-                return
+        return iter_pages(self, None, lambda page: func(*args, **kwargs))
 
 
 def need_login(func):
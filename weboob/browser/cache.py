@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import absolute_import
+
+import os
+import tempfile
+import time
+from email.utils import parsedate_tz, mktime_tz
+from hashlib import sha1
+from threading import Lock
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from weboob.tools.log import getLogger
+
+
+__all__ = ['HTTPCache', 'CacheAdapter']
+
+
+class HTTPCache(object):
+    """
+    Disk storage of HTTP responses.
+
+    Each entry is stored in its own file, named from its key. When the total
+    size of files exceeds *max_size*, the least recently used entries are
+    removed.
+
+    :param dirname: directory where entries are stored
+    :type dirname: :class:`str`
+    :param max_size: maximum size of the cache, in bytes
+    :type max_size: :class:`int`
+    """
+
+    def __init__(self, dirname, max_size=50 * 1024 * 1024):
+        self.dirname = dirname
+        self.max_size = max_size
+        self._size = None
+        self._lock = Lock()
+
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+    def _path(self, key):
+        return os.path.join(self.dirname, sha1(key).hexdigest())
+
+    def get(self, key):
+        """
+        Get an entry, or None if it is not in cache.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            # The mtime is used to find the least recently used entries.
+            os.utime(path, None)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def set(self, key, entry):
+        """
+        Store an entry. The file is replaced atomically, so concurrent
+        readers never see a partial entry.
+        """
+        path = self._path(key)
+        fd, tmppath = tempfile.mkstemp(prefix='.', dir=self.dirname)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmppath)
+            with self._lock:
+                self._update_size(path, size)
+                os.rename(tmppath, path)
+                if self._size > self.max_size:
+                    self._evict()
+        except:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+            raise
+
+    def delete(self, key):
+        """
+        Remove an entry, if it exists.
+        """
+        path = self._path(key)
+        with self._lock:
+            self._update_size(path, 0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _update_size(self, path, size):
+        if self._size is None:
+            self._size = sum(st.st_size for _, st in self._iter_files())
+        try:
+            self._size -= os.path.getsize(path)
+        except OSError:
+            pass
+        self._size += size
+
+    def _iter_files(self):
+        for name in os.listdir(self.dirname):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.dirname, name)
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                continue
+
+    def _evict(self):
+        files = sorted(self._iter_files(), key=lambda item: item[1].st_mtime)
+        self._size = sum(st.st_size for _, st in files)
+        for path, st in files:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= st.st_size
+
+
+def parse_cache_control(value):
+    """
+    Parse a Cache-Control header.
+
+    >>> sorted(parse_cache_control('no-cache, max-age="60"').items())
+    [('max-age', '60'), ('no-cache', None)]
+
+    :rtype: :class:`dict`
+    """
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, arg = directive.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = arg.strip().strip('"') if arg else None
+    return directives
+
+
+def parse_http_date(value):
+    """
+    Parse a HTTP date to a timestamp, or return None if it is invalid.
+    """
+    if not value:
+        return None
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    try:
+        return mktime_tz(date)
+    except (OverflowError, ValueError):
+        return None
+
+
+def _seconds(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CacheAdapter(BaseAdapter):
+    """
+    Transport adapter implementing a private HTTP cache, as described in
+    RFC 7234.
+
+    GET and HEAD responses are stored in a :class:`HTTPCache`. As the cache
+    directory can be shared by several backends, responses marked as
+    ``private`` or ``no-store`` are never stored, and responses to requests
+    with credentials (cookies or an Authorization header) are only served
+    back to requests with the same credentials. Fresh ones
+    (according to Cache-Control, Expires or Last-Modified headers) are served
+    without any request; stale ones are revalidated with If-None-Match and
+    If-Modified-Since headers when they have a validator. Responses served from
+    cache have a ``from_cache`` attribute set to True.
+
+    The freshness lifetime given by the server can be overridden for some URLs
+    with the *get_ttl* callback, which takes an URL and returns a number of
+    seconds, or None to rely on headers. A lifetime of 0 disables the cache.
+
+    :param cache: storage of responses
+    :type cache: :class:`HTTPCache`
+    :param adapter: adapter used to send requests
+    :type adapter: :class:`requests.adapters.BaseAdapter`
+    :param get_ttl: callback giving the freshness lifetime of an URL
+    :type get_ttl: function
+    """
+
+    CACHEABLE_METHODS = ('GET', 'HEAD')
+
+    CACHEABLE_STATUS = (200, 203, 204, 300, 301, 404, 405, 410, 414, 501)
+    """
+    Status codes which are cacheable by default (RFC 7231, section 6.1).
+    """
+
+    HEURISTIC_MAX_AGE = 24 * 3600
+    """
+    Maximum freshness lifetime computed from the Last-Modified header, when
+    the server gives no explicit expiration time.
+    """
+
+    # Headers of a 304 response which must not replace stored ones.
+    _KEEP_HEADERS = frozenset(('content-length', 'content-encoding', 'transfer-encoding'))
+
+    def __init__(self, cache, adapter, get_ttl=None):
+        super(CacheAdapter, self).__init__()
+        self.cache = cache
+        self.adapter = adapter
+        self.get_ttl = get_ttl
+        self.logger = getLogger('cache')
+
+    def close(self):
+        self.adapter.close()
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method not in self.CACHEABLE_METHODS:
+            response = self.adapter.send(request, stream=stream, **kwargs)
+            if response.status_code < 400:
+                # An unsafe method invalidates stored responses of the URL
+                # (RFC 7234, section 4.4).
+                for method in self.CACHEABLE_METHODS:
+                    self.cache.delete(self._key(method, request))
+            return response
+
+        ttl = self.get_ttl(request.url) if self.get_ttl is not None else None
+        req_cc = parse_cache_control(request.headers.get('Cache-Control'))
+        if stream or ttl == 0 or 'no-store' in req_cc:
+            return self.adapter.send(request, stream=stream, **kwargs)
+
+        key = self._key(request.method, request)
+        entry = self.cache.get(key)
+        if entry is not None and not self._match_vary(entry, request):
+            entry = None
+
+        if entry is not None:
+            if 'no-cache' not in req_cc and req_cc.get('max-age') != '0' and \
+               self._current_age(entry) < self._freshness_lifetime(entry, ttl):
+                self.logger.debug('Serve %s from cache', request.url)
+                return self._build_response(request, entry)
+
+            request = self._add_validators(request, entry)
+
+        request_time = time.time()
+        response = self.adapter.send(request, stream=stream, **kwargs)
+        response_time = time.time()
+
+        if entry is not None and response.status_code == 304:
+            self.logger.debug('Cached response of %s is still valid', request.url)
+            # Release the connection, and let cookies be extracted.
+            response.content
+            self._update_entry(entry, response, request_time, response_time)
+            self.cache.set(key, entry)
+            cached = self._build_response(request, entry)
+            cached.raw = response.raw
+            return cached
+
+        response.from_cache = False
+        if self._is_cacheable(response, ttl):
+            self.cache.set(key, self._create_entry(request, response, request_time, response_time))
+        elif entry is not None:
+            self.cache.delete(key)
+        return response
+
+    # Headers of requests which identify the user.
+    _CREDENTIAL_HEADERS = ('Authorization', 'Cookie')
+
+    def _key(self, method, request):
+        key = '%s %s' % (method, request.url)
+        credentials = [request.headers.get(name) for name in self._CREDENTIAL_HEADERS]
+        if any(credentials):
+            # Responses depending on credentials are not shared with other
+            # users, without storing the credentials in clear.
+            key += ' %s' % sha1(repr(credentials)).hexdigest()
+        return key
+
+    def _match_vary(self, entry, request):
+        for name, value in entry['vary'].iteritems():
+            if request.headers.get(name) != value:
+                return False
+        return True
+
+    def _add_validators(self, request, entry):
+        headers = entry['headers']
+        if 'etag' not in headers and 'last-modified' not in headers:
+            return request
+
+        request = request.copy()
+        if 'etag' in headers:
+            request.headers['If-None-Match'] = headers['etag']
+        if 'last-modified' in headers:
+            request.headers['If-Modified-Since'] = headers['last-modified']
+        return request
+
+    def _is_cacheable(self, response, ttl):
+        if response.status_code not in self.CACHEABLE_STATUS:
+            return False
+
+        vary = response.headers.get('Vary', '')
+        if vary.strip() == '*':
+            return False
+
+        cc = parse_cache_control(response.headers.get('Cache-Control'))
+        if 'no-store' in cc or 'private' in cc:
+            return False
+        if ttl is not None:
+            return True
+
+        # Keep responses which are fresh for a while, or which can be
+        # revalidated.
+        return 'max-age' in cc or 'expires' in response.headers or \
+               'etag' in response.headers or 'last-modified' in response.headers
+
+    def _create_entry(self, request, response, request_time, response_time):
+        vary = {}
+        for name in response.headers.get('Vary', '').split(','):
+            name = name.strip()
+            if name:
+                vary[name] = request.headers.get(name)
+
+        return {'url': response.url,
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': CaseInsensitiveDict(response.headers),
+                'content': response.content,
+                'vary': vary,
+                'request_time': request_time,
+                'response_time': response_time,
+               }
+
+    def _update_entry(self, entry, response, request_time, response_time):
+        for name, value in response.headers.iteritems():
+            if name.lower() not in self._KEEP_HEADERS:
+                entry['headers'][name] = value
+        entry['request_time'] = request_time
+        entry['response_time'] = response_time
+
+    def _current_age(self, entry):
+        """
+        Age of an entry (RFC 7234, section 4.2.3).
+        """
+        headers = entry['headers']
+        date = parse_http_date(headers.get('Date'))
+        if date is None:
+            date = entry['response_time']
+        apparent_age = max(0, entry['response_time'] - date)
+        age = _seconds(headers.get('Age')) or 0
+        corrected_age = age + entry['response_time'] - entry['request_time']
+        return max(apparent_age, corrected_age) + time.time() - entry['response_time']
+
+    def _freshness_lifetime(self, entry, ttl):
+        """
+        Freshness lifetime of an entry (RFC 7234, section 4.2.1).
+        """
+        if ttl is not None:
+            return ttl
+
+        headers = entry['headers']
+        cc = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-cache' in cc:
+            return 0
+        if 'max-age' in cc:
+            return _seconds(cc['max-age']) or 0
+
+        date = parse_http_date(headers.get('Date')) or entry['response_time']
+        if 'expires' in headers:
+            expires = parse_http_date(headers['expires'])
+            # An invalid date represents a time in the past.
+            return max(expires - date, 0) if expires is not None else 0
+
+        last_modified = parse_http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            return min(max(date - last_modified, 0) / 10, self.HEURISTIC_MAX_AGE)
+        return 0
+
+    def _build_response(self, request, entry):
+        response = Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = entry['content']
+        response._content_consumed = True
+        response.from_cache = True
+        return response
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import absolute_import
+
+import atexit
+import gzip
+import os
+import tempfile
+from base64 import b64decode, b64encode
+from collections import defaultdict
+from threading import Lock
+try:
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    from urlparse import urlsplit, parse_qsl
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from weboob.tools.compat import basestring, unicode
+from weboob.tools.json import json
+from weboob.tools.log import getLogger
+
+
+__all__ = ['Cassette', 'CassetteMiss', 'RecordAdapter', 'ReplayAdapter']
+
+
+class CassetteMiss(ConnectionError):
+    """
+    Raised when replaying a request which is not in the cassette.
+    """
+
+
+class Cassette(object):
+    """
+    Recorded HTTP exchanges, stored in a single JSON file, compressed with
+    gzip if its name ends with ".gz".
+
+    When recording, the file is written on :func:`save`, and at exit.
+
+    :param path: path of the cassette file
+    :type path: :class:`str`
+    :param record: if True, start an empty cassette to record exchanges,
+                   otherwise load recorded exchanges to replay them
+    :type record: :class:`bool`
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, record=False):
+        self.path = path
+        self.record = record
+        self.exchanges = []
+        self._lock = Lock()
+        self._modified = False
+
+        if record:
+            atexit.register(self.save)
+        else:
+            self.load()
+
+    def _open(self, mode):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode)
+        return open(self.path, mode)
+
+    def load(self):
+        with self._open('rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        if data.get('version') != self.VERSION:
+            raise ValueError('Unsupported version of cassette %s' % self.path)
+        self.exchanges = data['exchanges']
+
+    def save(self):
+        """
+        Write the cassette file, if exchanges have been recorded since the
+        last save.
+        """
+        with self._lock:
+            if not self._modified:
+                return
+            data = json.dumps({'version': self.VERSION, 'exchanges': self.exchanges}, separators=(',', ':'))
+            self._modified = False
+
+        dirname = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd, tmppath = tempfile.mkstemp(prefix='.cassette.', dir=dirname)
+        os.close(fd)
+        try:
+            if self.path.endswith('.gz'):
+                f = gzip.open(tmppath, 'wb')
+            else:
+                f = open(tmppath, 'wb')
+            with f:
+                f.write(data.encode('utf-8'))
+            os.rename(tmppath, self.path)
+        except:
+            os.remove(tmppath)
+            raise
+
+    def add(self, request, response, content=None):
+        """
+        Record an exchange.
+
+        :param content: body of the response; if None, the response content
+                        is read
+        :type content: :class:`bytes`
+        """
+        if content is None:
+            content = response.content
+        raw_headers = getattr(response.raw, 'headers', None)
+        # Raw headers keep repeated headers like Set-Cookie.
+        headers = list(raw_headers.items() if raw_headers is not None else response.headers.items())
+        exchange = {'method': request.method,
+                    'url': request.url,
+                    'body': _encode(request.body),
+                    'status': response.status_code,
+                    'reason': response.reason,
+                    'headers': headers,
+                    'content': _encode(content),
+                   }
+        with self._lock:
+            self.exchanges.append(exchange)
+            self._modified = True
+
+
+def _encode(body):
+    if body is None or not isinstance(body, basestring):
+        return None
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return b64encode(body).decode('ascii')
+
+
+class RecordAdapter(BaseAdapter):
+    """
+    Transport adapter recording exchanges made with an other adapter in a
+    :class:`Cassette`.
+
+    The body of a streamed response is recorded as it is consumed, once it
+    has been read entirely; a response closed before is not recorded.
+
+    :param cassette: cassette where exchanges are recorded
+    :type cassette: :class:`Cassette`
+    :param adapter: adapter used to send requests
+    :type adapter: :class:`requests.adapters.BaseAdapter`
+    """
+
+    def __init__(self, cassette, adapter):
+        super(RecordAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def close(self):
+        self.adapter.close()
+
+    def send(self, request, stream=False, **kwargs):
+        response = self.adapter.send(request, stream=stream, **kwargs)
+        if stream and response.raw is not None and response._content is False:
+            # Reading the content now would defeat the stream.
+            response.raw = _RecordingRaw(response.raw,
+                                         lambda content: self.cassette.add(request, response, content),
+                                         request.url)
+        else:
+            self.cassette.add(request, response)
+        return response
+
+
+class _RecordingRaw(object):
+    # Wraps the urllib3 response of a streamed request, to keep the chunks
+    # read, and give the whole body to *callback* at the end.
+    def __init__(self, raw, callback, url):
+        self._raw = raw
+        self._callback = callback
+        self._url = url
+        self._chunks = []
+        self._done = False
+        self.logger = getLogger('cassette')
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def stream(self, amt=2**16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._chunks.append(chunk)
+            yield chunk
+        self._finish()
+
+    def read(self, amt=None, decode_content=None, *args, **kwargs):
+        data = self._raw.read(amt, decode_content, *args, **kwargs)
+        if not decode_content and self._raw.headers.get('Content-Encoding', 'identity') != 'identity':
+            # The recorded body would be the encoded one.
+            self._give_up('it is read without being decoded')
+        else:
+            self._chunks.append(data)
+            if amt is None or not data:
+                self._finish()
+        return data
+
+    def close(self):
+        self._give_up('it is closed before being read entirely')
+        self._raw.close()
+
+    def _give_up(self, reason):
+        if not self._done:
+            self._done = True
+            self._chunks = []
+            self.logger.warning('Streamed response of %s is not recorded, as %s', self._url, reason)
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            content, self._chunks = b''.join(self._chunks), []
+            self._callback(content)
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter serving exchanges recorded in a :class:`Cassette`,
+    without any network access.
+
+    Requests are matched on method, URL and body. When the same request has
+    been recorded several times, responses are served in recording order, and
+    the last one is repeated. In lenient mode, a request which has not been
+    recorded gets the response of the recorded request with the same method
+    and path which shares the most query and body parameters, so URLs
+    containing timestamps or tokens still match.
+
+    :class:`CassetteMiss` is raised when no recorded exchange matches.
+
+    :param cassette: recorded exchanges
+    :type cassette: :class:`Cassette`
+    :param strict: if False, use lenient matching
+    :type strict: :class:`bool`
+    """
+
+    def __init__(self, cassette, strict=True):
+        super(ReplayAdapter, self).__init__()
+        self.cassette = cassette
+        self.strict = strict
+        self.logger = getLogger('cassette')
+        self._lock = Lock()
+        self._played = set()
+        self._exchanges = defaultdict(list)
+        self._by_path = defaultdict(list)
+        for i, exchange in enumerate(cassette.exchanges):
+            self._exchanges[(exchange['method'], exchange['url'], exchange['body'])].append(i)
+            self._by_path[(exchange['method'], self._path(exchange['url']))].append(i)
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        body = _encode(request.body)
+        with self._lock:
+            candidates = self._exchanges.get((request.method, request.url, body))
+            if not candidates and not self.strict:
+                candidates = self._find_similar(request.method, request.url, body)
+                if candidates:
+                    self.logger.debug('Replay %s %s with a similar request', request.method, request.url)
+            if not candidates:
+                raise CassetteMiss('%s %s has not been recorded' % (request.method, request.url),
+                                   request=request)
+
+            index = candidates[-1]
+            for i in candidates:
+                if i not in self._played:
+                    index = i
+                    break
+            self._played.add(index)
+
+        return self._build_response(request, self.cassette.exchanges[index])
+
+    def _path(self, url):
+        scheme, netloc, path, _, _ = urlsplit(url)
+        return scheme, netloc, path
+
+    def _params(self, url, body):
+        params = set(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+        if body is not None:
+            params.update(parse_qsl(b64decode(body), keep_blank_values=True))
+        return params
+
+    def _find_similar(self, method, url, body):
+        candidates = self._by_path.get((method, self._path(url)))
+        if not candidates:
+            return None
+
+        params = self._params(url, body)
+        scores = {}
+        for i in candidates:
+            exchange = self.cassette.exchanges[i]
+            scores[i] = len(params & self._params(exchange['url'], exchange['body']))
+        best = max(scores.values())
+        return [i for i in candidates if scores[i] == best]
+
+    def _build_response(self, request, exchange):
+        response = Response()
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.headers = CaseInsensitiveDict()
+        for name, value in exchange['headers']:
+            if name in response.headers:
+                response.headers[name] += ', ' + value
+            else:
+                response.headers[name] = value
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _RecordedRaw(exchange['headers'])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = b64decode(exchange['content']) if exchange['content'] is not None else b''
+        response._content_consumed = True
+        return response
+
+
+class _RecordedMessage(object):
+    # Minimal HTTP message, used by cookielib to extract cookies.
+    def __init__(self, headers):
+        self._headers = headers
+
+    def get_all(self, name, default=None):
+        values = [value for key, value in self._headers if key.lower() == name.lower()]
+        return values or default
+
+    def getheaders(self, name):
+        return self.get_all(name, [])
+
+
+class _RecordedRaw(object):
+    # Stands for the urllib3 response, so requests sets cookies of the
+    # replayed response in the session.
+    def __init__(self, headers):
+        self.headers = CaseInsensitiveDict(headers)
+        self._original_response = self
+        self.msg = _RecordedMessage(headers)
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
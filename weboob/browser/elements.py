@@ -21,17 +21,27 @@ import re
 import sys
 from copy import deepcopy
 
+try:
+    from concurrent.futures import FIRST_COMPLETED, Future, wait
+except ImportError:
+    Future = None
+from lxml.html import HtmlMixin
+
+from weboob.capabilities.base import BaseObject
 from weboob.tools.log import getLogger, DEBUG_FILTERS
 from weboob.tools.ordereddict import OrderedDict
 from weboob.browser.pages import NextPage
 
-from .filters.standard import _Filter, CleanText
-from .filters.html import AttributeNotFound, XPathNotFound
+from .filters.standard import _Filter, CleanText, compile_xpath
+from .filters.html import AttributeNotFound, XPathNotFound, compile_css
 
 
 __all__ = ['DataError', 'AbstractElement', 'ListElement', 'ItemElement', 'TableElement', 'SkipItem']
 
 
+_filters_logger = getLogger('b2filters')
+
+
 class DataError(Exception):
     """
     Returned data from pages are incoherent.
@@ -48,7 +58,31 @@ def method(klass):
     return inner
 
 
+class _ElementMeta(type):
+    """
+    Private meta-class used to find once for all the loaders of elements.
+    """
+    def __new__(mcs, name, bases, attrs):
+        new_class = super(_ElementMeta, mcs).__new__(mcs, name, bases, attrs)
+        new_class._loaders = [(attrname[len('load_'):], attrname) for attrname in dir(new_class) if attrname.startswith('load_')]
+        return new_class
+
+
 class AbstractElement(object):
+    """
+    Base class of elements.
+
+    The environment of an element, :attr:`env`, is a shallow copy of the one
+    of its parent, or of the params of the page: an element can set its own
+    keys without affecting its parent or its siblings, but values are shared.
+    So a mutable value (list, dict, set...) must not be changed in place by
+    an element, unless all the elements are expected to see the change, like
+    a set of ids already seen given to a list element. To change it only for
+    an element and its children, set the key to a new value.
+    """
+
+    __metaclass__ = _ElementMeta
+
     _creation_counter = 0
 
     def __init__(self, page, parent=None, el=None):
@@ -61,10 +95,13 @@ class AbstractElement(object):
         else:
             self.el = page.doc
 
+        # The environment is copied but not its values, so an element can
+        # change its keys without affecting its parent, but values must not
+        # be changed in place (see above).
         if parent is not None:
-            self.env = deepcopy(parent.env)
+            self.env = dict(parent.env)
         else:
-            self.env = deepcopy(page.params)
+            self.env = dict(page.params or {})
 
         # Used by debug
         self._random_id = AbstractElement._creation_counter
@@ -89,37 +126,63 @@ class AbstractElement(object):
     def parse(self, obj):
         pass
 
-    def cssselect(self, *args, **kwargs):
-        return self.el.cssselect(*args, **kwargs)
+    def cssselect(self, expression, **kwargs):
+        if kwargs or not isinstance(self.el, HtmlMixin):
+            return self.el.cssselect(expression, **kwargs)
+        return compile_css(expression)(self.el)
 
-    def xpath(self, *args, **kwargs):
-        return self.el.xpath(*args, **kwargs)
+    def xpath(self, expression, **kwargs):
+        if kwargs:
+            return self.el.xpath(expression, **kwargs)
+        return compile_xpath(expression)(self.el)
 
     def handle_loaders(self):
-        for attrname in dir(self):
-            m = re.match('load_(.*)', attrname)
-            if not m:
-                continue
-            name = m.group(1)
+        for name, attrname in self._loaders:
             if name in self.loaders:
                 continue
             loader = getattr(self, attrname)
             self.loaders[name] = self.use_selector(loader, key=attrname)
 
 
+class _ListElementMeta(_ElementMeta):
+    """
+    Private meta-class used to find once for all the elements to build for
+    each node of a :class:`ListElement`.
+    """
+    def __new__(mcs, name, bases, attrs):
+        new_class = super(_ListElementMeta, mcs).__new__(mcs, name, bases, attrs)
+        new_class.logger = getLogger(name.lower())
+
+        new_class._items = []
+        for attrname in dir(new_class):
+            attr = getattr(new_class, attrname)
+            if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr is not new_class:
+                new_class._items.append(attr)
+        return new_class
+
+
 class ListElement(AbstractElement):
+    __metaclass__ = _ListElementMeta
+
     item_xpath = None
     flush_at_end = False
     ignore_duplicate = False
+    raise_load_errors = False
+    """
+    By default, an item which can't be built because one of its pages loaded
+    in background failed is skipped; set it to stop the whole list instead.
+    """
 
     def __init__(self, *args, **kwargs):
         super(ListElement, self).__init__(*args, **kwargs)
-        self.logger = getLogger(self.__class__.__name__.lower())
         self.objects = OrderedDict()
 
+    _kwargs = {}
+
     def __call__(self, *args, **kwargs):
         for key, value in kwargs.iteritems():
             self.env[key] = value
+        self._kwargs = kwargs
 
         return self.__iter__()
 
@@ -130,7 +193,7 @@ class ListElement(AbstractElement):
         sufficient.
         """
         if self.item_xpath is not None:
-            for el in self.el.xpath(self.item_xpath):
+            for el in self.xpath(self.item_xpath):
                 yield el
         else:
             yield self.el
@@ -138,17 +201,21 @@ class ListElement(AbstractElement):
     def __iter__(self):
         self.parse(self.el)
 
+        # Let the pagination loop request the next page while this one is
+        # processed.
+        prefetcher = getattr(self.page, '_prefetcher', None)
+        if prefetcher is not None and self.parent is None and hasattr(self, 'next_page'):
+            prefetcher.prefetch(self.page, self.get_next_page(), self._find_next_page)
+
         items = []
         for el in self.find_elements():
-            for attrname in dir(self):
-                attr = getattr(self, attrname)
-                if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != type(self):
-                    item = attr(self.page, self, el)
-                    item.handle_loaders()
-                    items.append(item)
-
-        for item in items:
-            for obj in item:
+            for klass in self._items:
+                item = klass(self.page, self, el)
+                item.handle_loaders()
+                items.append(item)
+
+        for objs in self._build_items(items):
+            for obj in objs:
                 obj = self.store(obj)
                 if obj and not self.flush_at_end:
                     yield obj
@@ -159,25 +226,93 @@ class ListElement(AbstractElement):
 
         self.check_next_page()
 
+    def _build_items(self, items):
+        """
+        Get objects of each item, in order.
+
+        Items waiting for pages loaded in background (see
+        :class:`weboob.browser.filters.standard.AsyncLoad`) are built as soon
+        as their pages are loaded, so a slow page does not delay the next
+        items, but objects are still given in order. An item which can't be
+        built because one of its pages can't be loaded is skipped (see
+        :attr:`raise_load_errors`); use a default value with
+        :class:`weboob.browser.filters.standard.Async` to build it anyway.
+
+        If the iteration is stopped before the end, pages not loaded yet are
+        not requested.
+        """
+        built = {}
+        try:
+            for i, item in enumerate(items):
+                while i not in built:
+                    if not _pending_loads(item):
+                        built[i] = self._build_item(item)
+                        break
+
+                    # Build next items whose pages are loaded, or wait for one.
+                    ready = False
+                    pending = []
+                    for j in range(i + 1, len(items)):
+                        if j in built:
+                            continue
+                        loads = _pending_loads(items[j])
+                        if loads:
+                            pending.extend(loads)
+                        else:
+                            built[j] = self._build_item(items[j])
+                            ready = True
+                    if not ready:
+                        wait(_pending_loads(item) + pending, return_when=FIRST_COMPLETED)
+
+                objs, error = built.pop(i)
+                if error is not None:
+                    raise error
+                yield objs
+        finally:
+            for item in items:
+                for load in _pending_loads(item):
+                    load.cancel()
+
+    def _build_item(self, item):
+        try:
+            return list(item), None
+        except Exception as e:
+            if self.raise_load_errors or not _failed_loads(item):
+                return None, e
+            self.logger.warning('Skip an item whose page can not be loaded: %r', e)
+            return [], None
+
     def flush(self):
         for obj in self.objects.itervalues():
             yield obj
 
-    def check_next_page(self):
+    def get_next_page(self):
+        """
+        Get the next page given by the :attr:`next_page` selector, if any.
+        """
         if not hasattr(self, 'next_page'):
-            return
+            return None
 
         next_page = getattr(self, 'next_page')
         try:
-            value = self.use_selector(next_page)
+            return self.use_selector(next_page)
         except (AttributeNotFound, XPathNotFound):
-            return
+            return None
 
+    def check_next_page(self):
+        value = self.get_next_page()
         if value is None:
             return
 
         raise NextPage(value)
 
+    def _find_next_page(self, page):
+        # Used by the prefetcher to find the next page of a prefetched page.
+        element = self.__class__(page)
+        element.env.update(self._kwargs)
+        element.parse(element.el)
+        return element.get_next_page()
+
 
     def store(self, obj):
         if obj.id:
@@ -191,13 +326,29 @@ class ListElement(AbstractElement):
         return obj
 
 
+def _loads(item):
+    # Pages of an item loaded in background.
+    if Future is None:
+        return []
+    return [load for load in item.loaders.itervalues() if isinstance(load, Future)]
+
+
+def _pending_loads(item):
+    return [load for load in _loads(item) if not load.done()]
+
+
+def _failed_loads(item):
+    return [load for load in _loads(item)
+            if load.done() and not load.cancelled() and load.exception() is not None]
+
+
 class SkipItem(Exception):
     """
     Raise this exception in an :class:`ItemElement` subclass to skip an item.
     """
 
 
-class _ItemElementMeta(type):
+class _ItemElementMeta(_ElementMeta):
     """
     Private meta-class used to keep order of obj_* attributes in :class:`ItemElement`.
     """
@@ -213,6 +364,7 @@ class _ItemElementMeta(type):
 
         new_class = super(_ItemElementMeta, mcs).__new__(mcs, name, bases, attrs)
         new_class._attrs = _attrs + [f[0] for f in filters]
+        new_class.logger = getLogger(name.lower())
         return new_class
 
 
@@ -220,7 +372,6 @@ class ItemElement(AbstractElement):
     __metaclass__ = _ItemElementMeta
 
     _attrs = None
-    _loaders = None
     klass = None
     condition = None
     validate = None
@@ -230,7 +381,6 @@ class ItemElement(AbstractElement):
 
     def __init__(self, *args, **kwargs):
         super(ItemElement, self).__init__(*args, **kwargs)
-        self.logger = getLogger(self.__class__.__name__.lower())
         self.obj = None
 
     def build_object(self):
@@ -271,9 +421,14 @@ class ItemElement(AbstractElement):
             # Help debugging as tracebacks do not give us the key
             self.logger.warning('Attribute %s raises %s' % (key, repr(e)))
             raise
-        logger = getLogger('b2filters')
-        logger.log(DEBUG_FILTERS, "%s.%s = %r" % (self._random_id, key, value))
-        setattr(self.obj, key, value)
+        if _filters_logger.isEnabledFor(DEBUG_FILTERS):
+            _filters_logger.log(DEBUG_FILTERS, "%s.%s = %r" % (self._random_id, key, value))
+            # Keep conversion warnings while debugging filters.
+            setattr(self.obj, key, value)
+        elif isinstance(self.obj, BaseObject):
+            self.obj.set_trusted(key, value)
+        else:
+            setattr(self.obj, key, value)
 
 
 class TableElement(ListElement):
@@ -284,6 +439,7 @@ class TableElement(ListElement):
         super(TableElement, self).__init__(*args, **kwargs)
 
         self._cols = {}
+        self._rows = {}
 
         columns = {}
         for attrname in dir(self):
@@ -295,7 +451,7 @@ class TableElement(ListElement):
                 columns[m.group(1)] = [s.lower() for s in cols]
 
         colnum = 0
-        for el in self.el.xpath(self.head_xpath):
+        for el in self.xpath(self.head_xpath):
             title = self.cleaner.clean(el).lower()
             for name, titles in columns.iteritems():
                 if title in titles and not name in self._cols:
@@ -307,3 +463,46 @@ class TableElement(ListElement):
 
     def get_colnum(self, name):
         return self._cols.get(name, None)
+
+    def get_cells(self, row):
+        """
+        Get the cells of a row, indexed by column number. A cell which spans
+        several columns is repeated for each of them.
+
+        Rows are split once, so this is cheap to call for every column.
+
+        :rtype: :class:`list`
+        """
+        try:
+            return self._rows[row]
+        except KeyError:
+            pass
+
+        cells = []
+        for cell in row.iterchildren('td'):
+            try:
+                span = max(int(cell.attrib.get('colspan', 1)), 1)
+            except (ValueError, AttributeError):
+                span = 1
+            cells.extend([cell] * span)
+        self._rows[row] = cells
+        return cells
+
+    def clean_column(self, name):
+        """
+        Clean at once the cells of a column, for every row, with
+        :attr:`cleaner`.
+
+        :returns: cleaned texts, None for rows without this cell, or None if
+                  the column is not found
+        :rtype: :class:`list`
+        """
+        colnum = self.get_colnum(name)
+        if colnum is None:
+            return None
+
+        cells = []
+        for row in self.find_elements():
+            row_cells = self.get_cells(row)
+            cells.append(row_cells[colnum] if colnum < len(row_cells) else None)
+        return self.cleaner.clean_all(cells)
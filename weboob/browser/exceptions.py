@@ -18,7 +18,7 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 from requests.exceptions import HTTPError
-from weboob.exceptions import BrowserHTTPError, BrowserHTTPNotFound
+from weboob.exceptions import BrowserHTTPError, BrowserHTTPNotFound, BrowserUnavailable
 
 
 class HTTPNotFound(HTTPError, BrowserHTTPNotFound):
@@ -31,3 +31,9 @@ class ClientError(HTTPError, BrowserHTTPError):
 
 class ServerError(HTTPError, BrowserHTTPError):
     pass
+
+
+class DownloadError(BrowserUnavailable):
+    """
+    Raised when a downloaded file has not the expected size or checksum.
+    """
@@ -19,11 +19,12 @@
 
 
 import lxml.html as html
-from .standard import _Selector, _NO_DEFAULT, Filter, FilterError
+from lxml.cssselect import CSSSelector
+from .standard import _Selector, _NO_DEFAULT, Filter, FilterError, compile_selector
 from weboob.tools.html import html2text
 
 
-__all__ = ['CSS', 'XPath', 'XPathNotFound', 'AttributeNotFound',
+__all__ = ['compile_css', 'CSS', 'XPath', 'XPathNotFound', 'AttributeNotFound',
            'Attr', 'Link', 'CleanHTML']
 
 
@@ -35,9 +36,22 @@ class AttributeNotFound(FilterError):
     pass
 
 
+def compile_css(selector, translator='html'):
+    """
+    Get a compiled CSS selector.
+
+    :param translator: 'html' or 'xml', to choose how to translate it to XPath
+    :rtype: :class:`lxml.cssselect.CSSSelector`
+    """
+    return compile_selector(('css', selector, translator),
+                            lambda: CSSSelector(selector, translator=translator))
+
+
 class CSS(_Selector):
     @classmethod
     def select(cls, selector, item, obj=None, key=None):
+        if isinstance(item, html.HtmlMixin):
+            return compile_css(selector)(item)
         return item.cssselect(selector)
 
 
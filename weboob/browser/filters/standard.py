@@ -25,14 +25,17 @@ import unicodedata
 from decimal import Decimal, InvalidOperation
 from itertools import islice
 from collections import Iterator
+from threading import Lock
 
 from dateutil.parser import parse as parse_date
+from lxml import etree
 
 from weboob.capabilities.base import empty
 from weboob.tools.compat import basestring
 from weboob.exceptions import ParseError
 from weboob.browser.url import URL
 from weboob.tools.log import getLogger, DEBUG_FILTERS
+from weboob.tools.ordereddict import OrderedDict
 
 
 class NoDefault(object):
@@ -42,7 +45,8 @@ class NoDefault(object):
 _NO_DEFAULT = NoDefault()
 
 
-__all__ = ['FilterError', 'ColumnNotFound', 'RegexpError', 'ItemNotFound',
+__all__ = ['compile_selector', 'compile_xpath',
+           'FilterError', 'ColumnNotFound', 'RegexpError', 'ItemNotFound',
            'Filter', 'Base', 'Env', 'TableCell', 'RawText',
            'CleanText', 'Lower', 'CleanDecimal', 'Field', 'Regexp', 'Map',
            'DateTime', 'Date', 'Time', 'DateGuesser', 'Duration',
@@ -50,6 +54,59 @@ __all__ = ['FilterError', 'ColumnNotFound', 'RegexpError', 'ItemNotFound',
            'BrowserURL', 'Async', 'AsyncLoad']
 
 
+SELECTORS_CACHE_SIZE = 4096
+"""
+Maximum number of compiled selectors kept by :func:`compile_selector`.
+"""
+
+_selectors = OrderedDict()
+_selectors_lock = Lock()
+
+
+def compile_selector(key, factory):
+    """
+    Get a compiled selector from a process-wide cache, or build it with
+    *factory* if it is not there yet.
+
+    Selectors are written in modules, so they are few; when the cache is full
+    anyway, the least recently used ones are dropped.
+
+    :param key: expression of the selector, and anything needed to compile it
+    :param factory: callable returning the compiled selector
+    """
+    with _selectors_lock:
+        try:
+            # move it at the end, as the most recently used
+            selector = _selectors.pop(key)
+        except KeyError:
+            pass
+        else:
+            _selectors[key] = selector
+            return selector
+
+    # Compilation is done without the lock, another thread may store the
+    # same selector meanwhile.
+    selector = factory()
+    with _selectors_lock:
+        selector = _selectors.pop(key, selector)
+        while len(_selectors) >= SELECTORS_CACHE_SIZE:
+            _selectors.popitem(last=False)
+        _selectors[key] = selector
+    return selector
+
+
+def compile_xpath(expression):
+    """
+    Get a compiled XPath expression.
+
+    >>> compile_xpath('//p/text()')(etree.fromstring('<html><p>foo</p></html>'))
+    ['foo']
+
+    :rtype: :class:`lxml.etree.XPath`
+    """
+    return compile_selector(expression, lambda: etree.XPath(expression))
+
+
 class FilterError(ParseError):
     pass
 
@@ -105,6 +162,9 @@ def debug(*args):
     def wraper(function):
         def print_debug(self, value):
             logger = getLogger('b2filters')
+            if not logger.isEnabledFor(DEBUG_FILTERS):
+                return function(self, value)
+
             result = ''
             outputvalue = value
             if isinstance(value, list):
@@ -161,6 +221,8 @@ class Filter(_Filter):
     @classmethod
     def select(cls, selector, item, obj=None, key=None):
         if isinstance(selector, basestring):
+            if isinstance(item, (etree._Element, etree._ElementTree)):
+                return compile_xpath(selector)(item)
             return item.xpath(selector)
         elif isinstance(selector, _Filter):
             selector._key = key
@@ -191,14 +253,31 @@ class _Selector(Filter):
 
 
 class AsyncLoad(Filter):
+    """
+    Load a page in background, to be used by :class:`Async` filters.
+
+    Requests are run with :meth:`weboob.browser.browsers.Browser.async_load`,
+    so a few of them are run at the same time on a host.
+    """
+
     def __call__(self, item):
         link = self.select(self.selector, item, key=self._key, obj=self._obj)
-        return item.page.browser.async_open(link)
+        return item.page.browser.async_load(link)
 
 
 class Async(_Filter):
-    def __init__(self, name, selector=None):
-        super(Async, self).__init__()
+    """
+    Select data in a page loaded by :class:`AsyncLoad`.
+
+    If the page can't be loaded, the default value is used if any, otherwise
+    the error is raised, and the item is skipped by its
+    :class:`weboob.browser.elements.ListElement`.
+
+    >>> Async('details', CleanText('//h1')) | NotAvailable  # doctest: +SKIP
+    """
+
+    def __init__(self, name, selector=None, default=_NO_DEFAULT):
+        super(Async, self).__init__(default)
         self.selector = selector
         self.name = name
 
@@ -209,7 +288,10 @@ class Async(_Filter):
         return self
 
     def __call__(self, item):
-        result = item.loaders[self.name].result()
+        try:
+            result = item.loaders[self.name].result()
+        except Exception as e:
+            return self.default_or_raise(e)
         assert result.page is not None, 'The loaded url %s hasn\'t been matched by an URL object' % result.url
         return self.selector(result.page.doc)
 
@@ -253,6 +335,8 @@ class TableCell(_Filter):
     """
     Used with TableElement, it get the cell value from its name.
 
+    Cells of a row are counted with their colspan, as columns of the head.
+
     For example:
 
     >>> from weboob.capabilities.bank import Transaction
@@ -277,7 +361,7 @@ class TableCell(_Filter):
         for name in self.names:
             idx = item.parent.get_colnum(name)
             if idx is not None:
-                return item.xpath('./td[%s]' % (idx + 1))
+                return item.parent.get_cells(item.el)[idx:idx + 1]
 
         return self.default_or_raise(ColumnNotFound('Unable to find column %s' % ' or '.join(self.names)))
 
@@ -315,8 +399,14 @@ class CleanText(Filter):
     u'coucou coucou'
     >>> CleanText(newlines=False).filter(u'coucou\\r\\n coucou ')
     u'coucou\\ncoucou'
+
+    To clean a lot of elements at once, for example a column of a table, use
+    :meth:`clean_all`.
     """
 
+    _WHITESPACES = re.compile(u'\s+', flags=re.UNICODE)
+    _NON_ASCII = re.compile(u'[^\x00-\x7f]')
+
     def __init__(self, selector=None, symbols='', replace=[], children=True, newlines=True, normalize='NFC', **kwargs):
         super(CleanText, self).__init__(selector, **kwargs)
         self.symbols = symbols
@@ -339,24 +429,41 @@ class CleanText(Filter):
     @classmethod
     def clean(cls, txt, children=True, newlines=True, normalize='NFC'):
         if not isinstance(txt, basestring):
-            if children:
-                txt = [t.strip() for t in txt.itertext()]
+            if not children:
+                txt = txt.text.strip()
+            elif newlines:
+                # spaces around pieces are collapsed below
+                txt = u' '.join(txt.itertext())  # 'foo \n  bar'
             else:
-                txt = [txt.text.strip()]
-            txt = u' '.join(txt)  # 'foo   bar'
+                txt = u' '.join([t.strip() for t in txt.itertext()])  # 'foo   bar'
         if newlines:
-            txt = re.compile(u'\s+', flags=re.UNICODE).sub(u' ', txt)  # 'foo bar'
+            txt = cls._WHITESPACES.sub(u' ', txt)  # 'foo bar'
         else:
             # normalize newlines and clean what is inside
             txt = '\n'.join([cls.clean(l) for l in txt.splitlines()])
         txt = txt.strip()
         # lxml under Python 2 returns str instead of unicode if it is pure ASCII
         txt = unicode(txt)
-        # normalize to a standard Unicode form
-        if normalize:
+        # normalize to a standard Unicode form, which is useless for ASCII
+        if normalize and cls._NON_ASCII.search(txt):
             txt = unicodedata.normalize(normalize, txt)
         return txt
 
+    @classmethod
+    def clean_all(cls, elements, children=True, newlines=True, normalize='NFC'):
+        """
+        Clean a list of elements or strings, like :meth:`clean`.
+
+        Missing elements (None) give None.
+
+        >>> CleanText.clean_all([u' foo\\n bar ', None, u'caf\\u0065\\u0301'])
+        [u'foo bar', None, u'caf\\xe9']
+
+        :rtype: :class:`list`
+        """
+        clean = cls.clean
+        return [None if el is None else clean(el, children, newlines, normalize) for el in elements]
+
     @classmethod
     def remove(cls, txt, symbols):
         for symbol in symbols:
@@ -396,6 +503,8 @@ class CleanDecimal(CleanText):
     >>> CleanDecimal('./td[1]', replace_dots=(',', '.'))  # doctest: +SKIP
     """
 
+    _NOT_NUMBER = re.compile(r'[^\d\-\.]')
+
     def __init__(self, selector=None, replace_dots=False, sign=None, default=_NO_DEFAULT):
         super(CleanDecimal, self).__init__(selector, default=default)
         self.replace_dots = replace_dots
@@ -414,7 +523,7 @@ class CleanDecimal(CleanText):
                 thousands_sep, decimal_sep = '.', ','
             text = text.replace(thousands_sep, '').replace(decimal_sep, '.')
         try:
-            v = Decimal(re.sub(r'[^\d\-\.]', '', text))
+            v = Decimal(self._NOT_NUMBER.sub('', text))
             if self.sign:
                 v *= self.sign(original_text)
             return v
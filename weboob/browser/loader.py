@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from __future__ import absolute_import
+
+from collections import defaultdict, deque
+from threading import Lock
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+import requests
+
+
+__all__ = ['Loader']
+
+
+class Loader(object):
+    """
+    Run asynchronous requests of a browser, with at most *max_per_host*
+    requests running at the same time on each host. Other requests are queued,
+    and started in order as soon as a request on the same host finishes.
+
+    :param browser: browser used to open pages
+    :type browser: :class:`weboob.browser.browsers.Browser`
+    :param max_per_host: maximum number of running requests per host
+    :type max_per_host: :class:`int`
+    """
+
+    def __init__(self, browser, max_per_host):
+        assert max_per_host > 0
+        self.browser = browser
+        self.max_per_host = max_per_host
+        self._lock = Lock()
+        self._running = defaultdict(int)
+        self._queues = defaultdict(deque)
+
+    def load(self, url, **kwargs):
+        """
+        Request an URL like :meth:`weboob.browser.browsers.Browser.async_open`.
+
+        :returns: a future, which can be cancelled until the request is started
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        if Future is None:
+            raise ImportError('Please install python-concurrent.futures')
+
+        if hasattr(self.browser, 'absurl'):
+            if isinstance(url, requests.Request):
+                url.url = self.browser.absurl(url.url)
+            else:
+                url = self.browser.absurl(url)
+        host = urlsplit(url.url if isinstance(url, requests.Request) else url).netloc
+
+        future = Future()
+        with self._lock:
+            self._queues[host].append((future, url, kwargs))
+        self._start(host)
+        return future
+
+    def _start(self, host):
+        while True:
+            with self._lock:
+                queue = self._queues[host]
+                if not queue or self._running[host] >= self.max_per_host:
+                    if not queue:
+                        del self._queues[host]
+                    return
+                future, url, kwargs = queue.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running[host] += 1
+
+            try:
+                request = self.browser.async_open(url, **kwargs)
+            except Exception as e:
+                self._finish(host)
+                future.set_exception(e)
+            else:
+                request.add_done_callback(lambda request, future=future: self._done(host, future, request))
+
+    def _done(self, host, future, request):
+        try:
+            result = request.result()
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        self._finish(host)
+
+    def _finish(self, host):
+        with self._lock:
+            self._running[host] -= 1
+            if not self._running[host]:
+                del self._running[host]
+        self._start(host)
@@ -19,16 +19,19 @@
 
 from __future__ import absolute_import
 
+import re
 import warnings
 from io import BytesIO
 import codecs
 from cgi import parse_header
+from threading import Lock
 
 import requests
 
 from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.compat import basestring
 
+from weboob.tools.cancel import is_cancelled
 from weboob.tools.log import getLogger
 
 
@@ -41,6 +44,9 @@ def pagination(func):
 
     :class:`NextPage` constructor can take an url or a Request object.
 
+    If the current call is cancelled (see :mod:`weboob.tools.cancel`), the next
+    page is not loaded.
+
     >>> class Page(HTMLPage):
     ...     @pagination
     ...     def iter_values(self):
@@ -62,17 +68,185 @@ def pagination(func):
     ['One', 'Two', 'Three', 'Four']
     """
     def inner(page, *args, **kwargs):
+        return iter_pages(page.browser, page, lambda page: func(page, *args, **kwargs))
+
+    return inner
+
+
+def iter_pages(browser, page, call):
+    """
+    Loop used by :func:`pagination` and
+    :meth:`weboob.browser.browsers.PagesBrowser.pagination`: yield values
+    of ``call(page)``, and when it raises :class:`NextPage`, go on the next
+    page and call it again.
+
+    When the browser's ``PREFETCH_PAGES`` attribute is set, next pages are
+    prefetched by a :class:`Prefetcher`.
+
+    :param page: first page, or None to use the current page of the browser
+    """
+    if page is None:
+        page = browser.page
+
+    prefetcher = None
+    # Pages are prefetched with asynchronous requests, which need an executor.
+    if getattr(browser, 'PREFETCH_PAGES', 0) > 0 and browser.session.executor is not None:
+        prefetcher = Prefetcher(browser, browser.PREFETCH_PAGES)
+
+    try:
         while True:
+            if page is not None:
+                page._prefetcher = prefetcher
             try:
-                for r in func(page, *args, **kwargs):
+                for r in call(page):
                     yield r
             except NextPage as e:
-                result = page.browser.location(e.request)
-                page = result.page
+                if is_cancelled():
+                    browser.logger.debug('Call cancelled, do not go on next page')
+                    return
+
+                response = None
+                if prefetcher is not None and page is not None:
+                    response = prefetcher.get(page, e.request)
+                if response is not None:
+                    browser.location_response(response)
+                else:
+                    response = browser.location(e.request)
+                page = response.page
             else:
                 return
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
 
-    return inner
+
+class Prefetcher(object):
+    """
+    Request next pages of a pagination in background, while the current one is
+    still processed.
+
+    Next page of a page is given by the :class:`weboob.browser.elements.ListElement`
+    processing it, as soon as it starts. Then a chain of at most *depth* pages
+    is requested, each page being parsed in background to find the next one.
+
+    Only URLs are prefetched; a :class:`NextPage` raised with a Request
+    object (for example to post a form) is handled normally. If the wanted next
+    page is not the prefetched one, all prefetched pages are dropped, and the
+    page is requested again.
+
+    As pages are requested before the current one is left, this must not be
+    used on websites where the state of the session depends on the order of
+    navigation.
+
+    :param browser: browser used to request pages
+    :type browser: :class:`weboob.browser.browsers.PagesBrowser`
+    :param depth: maximum number of pages requested in advance
+    :type depth: :class:`int`
+    """
+
+    def __init__(self, browser, depth):
+        self.browser = browser
+        self.depth = depth
+        self.logger = getLogger('prefetcher', browser.logger)
+        self._futures = OrderedDict()
+        self._tail = None
+        self._closed = False
+        self._lock = Lock()
+
+    def _key(self, page, request):
+        if not isinstance(request, basestring):
+            return None
+        return self.browser.absurl(request, base=page.url)
+
+    def prefetch(self, page, request, finder):
+        """
+        Request the next page of *page* if it has not been requested yet.
+
+        :param page: current page
+        :type page: :class:`Page`
+        :param request: URL of the next page
+        :param finder: function which takes a page and returns the URL of
+                       its next page, or None
+        """
+        key = self._key(page, request)
+        if key is None:
+            return
+        with self._lock:
+            if self._closed or key in self._futures or len(self._futures) >= self.depth:
+                return
+            self._submit(key, finder)
+
+    def get(self, page, request):
+        """
+        Get the response of the next page, if it has been prefetched.
+
+        :rtype: :class:`requests.Response` or None
+        """
+        key = self._key(page, request)
+        with self._lock:
+            if key not in self._futures:
+                self._cancel()
+                return None
+            while True:
+                url, future = self._futures.popitem(last=False)
+                if url == key:
+                    break
+                future.cancel()
+
+        try:
+            response = future.result()
+        except Exception as e:
+            self.logger.debug('Unable to prefetch %s: %s', key, e)
+            return None
+
+        self._extend()
+        return response
+
+    def close(self):
+        """
+        Cancel requests of pages which have not been used.
+        """
+        with self._lock:
+            self._closed = True
+            self._cancel()
+
+    def _cancel(self):
+        for future in self._futures.itervalues():
+            future.cancel()
+        self._futures.clear()
+        self._tail = None
+
+    def _submit(self, key, finder):
+        self.logger.debug('Prefetch %s', key)
+        callback = lambda response: self._on_response(key, finder, response)
+        self._futures[key] = self.browser.async_open(key, callback=callback)
+
+    def _on_response(self, key, finder, response):
+        # Called in a thread of the browser when a page is loaded.
+        with self._lock:
+            if self._closed or key not in self._futures or response.page is None:
+                return response
+            self._tail = (response.page, finder)
+        self._extend()
+        return response
+
+    def _extend(self):
+        with self._lock:
+            if self._closed or self._tail is None or len(self._futures) >= self.depth:
+                return
+            page, finder = self._tail
+            self._tail = None
+
+        try:
+            key = self._key(page, finder(page))
+        except Exception as e:
+            self.logger.debug('Unable to find next page of %s: %s', page.url, e)
+            return
+
+        with self._lock:
+            if key is not None and not self._closed and key not in self._futures \
+               and len(self._futures) < self.depth:
+                self._submit(key, finder)
 
 
 class NextPage(Exception):
@@ -116,6 +290,20 @@ class Page(object):
     It is recommended to use None for autodetection.
     """
 
+    ENCODING_DETECTION_SIZE = 8192
+    """
+    Number of bytes at the beginning of the page where :meth:`detect_encoding`
+    looks for an encoding declaration.
+    """
+
+    CACHE_TTL = None
+    """
+    Freshness lifetime of cached responses of this page, in seconds, see
+    :attr:`weboob.browser.browsers.Browser.CACHE_TTL`.
+    """
+
+    _prefetcher = None
+
     logged = False
     """
     If True, the page is in a restrected area of the wesite. Useful with
@@ -129,19 +317,20 @@ class Page(object):
         self.url = self.response.url
         self.params = params
 
-        # Setup encoding and build document
+        # Setup encoding. The document is built on first access to
+        # :attr:`doc`, so encoding has to be known before.
         self.forced_encoding = encoding or self.ENCODING
         if self.forced_encoding:
             self.response.encoding = self.forced_encoding
-        self.doc = self.build_doc(self.data)
-
-        # Last chance to change encoding, according to :meth:`detect_encoding`,
-        # which can be used to detect a document-level encoding declaration
-        if not self.forced_encoding:
+        else:
+            # Last chance to change encoding, according to
+            # :meth:`detect_encoding`, which can be used to detect a
+            # document-level encoding declaration
             encoding = self.detect_encoding()
             if encoding and encoding != self.encoding:
                 self.response.encoding = encoding
-                self.doc = self.build_doc(self.data)
+                # The document may have been built by detect_encoding().
+                self.__dict__.pop('_doc', None)
 
     # Encoding issues are delegated to Response instance, implemented by
     # requests module.
@@ -155,6 +344,30 @@ class Page(object):
         self.forced_encoding = True
         self.response.encoding = value
 
+    @property
+    def doc(self):
+        """
+        Document built by :meth:`build_doc`, on first access.
+
+        When several pages are tried on the same response (see
+        :meth:`weboob.browser.browsers.PagesBrowser.open`), the document is
+        built once and shared between pages which build it the same way.
+        """
+        if '_doc' not in self.__dict__:
+            docs = getattr(self.response, 'docs', None)
+            key = self._doc_key()
+            if docs is not None and key in docs:
+                self._doc = docs[key]
+            else:
+                self._doc = self.build_doc(self.data)
+                if docs is not None:
+                    docs[key] = self._doc
+        return self._doc
+
+    @doc.setter
+    def doc(self, value):
+        self._doc = value
+
     @property
     def content(self):
         """
@@ -192,13 +405,26 @@ class Page(object):
         data (HTML, Json, CSV...) from :attr:`data` property. It also can be
         overriden in modules pages to preprocess or postprocess data. It must
         return an object -- that will be assigned to :attr:`doc`.
+
+        The document can be shared with other pages using the same
+        :meth:`build_doc`, :meth:`detect_encoding` and :attr:`data`, so it
+        should not change the state of the page.
         """
         raise NotImplemented
 
+    def _doc_key(self):
+        klass = self.__class__
+        return (getattr(klass.build_doc, '__func__', klass.build_doc),
+                klass.data,
+                self.encoding)
+
     def detect_encoding(self):
         """
         Override this method to implement detection of document-level encoding
         declaration, if any (eg. html5's <meta charset="some-charset">).
+
+        It is called before the document is built, so it should only look at
+        the first :attr:`ENCODING_DETECTION_SIZE` bytes of :attr:`content`.
         """
         return None
 
@@ -416,8 +642,7 @@ class XMLPage(Page):
     """
 
     def detect_encoding(self):
-        import re
-        m = re.search('<\?xml version="1.0" encoding="(.*)"\?>', self.data)
+        m = re.search('<\?xml version="1.0" encoding="(.*)"\?>', self.content[:self.ENCODING_DETECTION_SIZE])
         if m:
             return m.group(1)
 
@@ -456,10 +681,18 @@ class HTMLPage(Page):
     The class to instanciate when using :meth:`HTMLPage.get_form`. Default to :class:`Form`.
     """
 
+    _HEAD_END = re.compile(r'</head\s*>|<body[\s>]', re.IGNORECASE)
+    _META = re.compile(r'<meta\s([^>]*)>', re.IGNORECASE)
+    _META_ATTRS = re.compile(r'''([\w-]+)\s*=\s*("[^"]*"|'[^']*'|[^\s>]+)''')
+
+    _xpath_functions_defined = set()
+
     def __init__(self, *args, **kwargs):
-        import lxml.html as html
-        ns = html.etree.FunctionNamespace(None)
-        self.define_xpath_functions(ns)
+        if self.__class__ not in self._xpath_functions_defined:
+            import lxml.html as html
+            ns = html.etree.FunctionNamespace(None)
+            self.define_xpath_functions(ns)
+            self._xpath_functions_defined.add(self.__class__)
 
         super(HTMLPage, self).__init__(*args, **kwargs)
 
@@ -467,8 +700,9 @@ class HTMLPage(Page):
         """
         Define XPath functions on the given lxml function namespace.
 
-        This method is called in constructor of :class:`HTMLPage` and can be
-        overloaded by children classes to add extra functions.
+        This method is called in constructor of the first instance of each
+        :class:`HTMLPage` class, and can be overloaded by children classes to
+        add extra functions.
         """
         ns['lower-case'] = lambda context, args: ' '.join([s.lower() for s in args])
 
@@ -513,17 +747,30 @@ class HTMLPage(Page):
     def detect_encoding(self):
         """
         Look for encoding in the document "http-equiv" and "charset" meta nodes.
+
+        Only the beginning of the document is scanned, until the end of its
+        head, without parsing it.
         """
         encoding = self.encoding
-        for content in self.doc.xpath('//head/meta[lower-case(@http-equiv)="content-type"]/@content'):
-            # meta http-equiv=content-type content=...
-            _, params = parse_header(content)
-            if 'charset' in params:
-                encoding = params['charset'].strip("'\"")
-
-        for charset in self.doc.xpath('//head/meta[@charset]/@charset'):
-            # meta charset=...
-            encoding = charset.lower()
+        head = self.content[:self.ENCODING_DETECTION_SIZE]
+        m = self._HEAD_END.search(head)
+        if m:
+            head = head[:m.start()]
+
+        charset = None
+        for m in self._META.finditer(head):
+            attrs = dict((name.lower(), value.strip('\'"'))
+                         for name, value in self._META_ATTRS.findall(m.group(1)))
+            if 'charset' in attrs:
+                # meta charset=...
+                charset = attrs['charset'].lower()
+            elif attrs.get('http-equiv', '').lower() == 'content-type':
+                # meta http-equiv=content-type content=...
+                _, params = parse_header(attrs.get('content', ''))
+                if 'charset' in params:
+                    encoding = params['charset'].strip("'\"")
+        if charset:
+            encoding = charset
 
         if encoding == 'iso-8859-1' or not encoding:
             encoding = 'windows-1252'
@@ -584,13 +831,14 @@ class LoggedPage(object):
 
 class ChecksumPage(object):
     """
-    Compute a checksum of raw content before parsing it.
+    Compute a checksum of raw content.
     """
     import hashlib
 
     hashfunc = hashlib.md5
-    checksum = None
 
-    def build_doc(self, content):
-        self.checksum = self.hashfunc(content).hexdigest()
-        return super(ChecksumPage, self).build_doc(content)
+    @property
+    def checksum(self):
+        if '_checksum' not in self.__dict__:
+            self._checksum = self.hashfunc(self.data).hexdigest()
+        return self._checksum
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+from threading import Lock
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.utils import get_encoding_from_headers
+
+from weboob.browser.browsers import urllib3
+
+
+__all__ = ['FakeAdapter']
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    Adapter answering requests of a session without network, to mount on it
+    or to give to a :class:`weboob.browser.cassette.RecordAdapter`.
+
+    Subclasses implement :meth:`respond`. Requests sent are stored in
+    :attr:`requests`.
+    """
+
+    def __init__(self):
+        super(FakeAdapter, self).__init__()
+        self.lock = Lock()
+        self.requests = []
+
+    def respond(self, request):
+        """
+        Get the response to a request.
+
+        :returns: status code, headers and content of the response
+        :rtype: tuple
+        """
+        raise NotImplementedError()
+
+    def send(self, request, stream=False, **kwargs):
+        with self.lock:
+            self.requests.append(request)
+        status_code, headers, content = self.respond(request)
+
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = status_code
+        response.headers.update(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        if stream:
+            response.raw = urllib3.response.HTTPResponse(BytesIO(content), preload_content=False)
+        else:
+            response._content = content
+        return response
+
+    def close(self):
+        pass
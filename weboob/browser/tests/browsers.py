@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import TestCase
+
+from weboob.browser import Browser, PagesBrowser, URL
+from weboob.browser.exceptions import DownloadError
+from weboob.browser.pages import Page
+from weboob.browser.tests import FakeAdapter
+
+
+# Adapter serving a file, supporting Range requests if ranges is True
+class FileAdapter(FakeAdapter):
+    def __init__(self, content, ranges=True):
+        super(FileAdapter, self).__init__()
+        self.content = content
+        self.ranges = ranges
+
+    def respond(self, request):
+        status_code = 200
+        headers = {}
+        content = self.content
+        if self.ranges and 'Range' in request.headers:
+            start = int(request.headers['Range'][len('bytes='):-1])
+            if start >= len(content):
+                status_code = 416
+                content = b''
+            else:
+                status_code = 206
+                headers['Content-Range'] = 'bytes %d-%d/%d' % (start, len(content) - 1, len(content))
+                content = content[start:]
+        headers['Content-Length'] = str(len(content))
+        return status_code, headers, content
+
+
+class FilePage(Page):
+    def __init__(self, *args, **kwargs):
+        raise AssertionError('Downloaded files must not be handled by pages')
+
+
+class FilesBrowser(PagesBrowser):
+    BASEURL = 'http://weboob.test'
+
+    file = URL('/file', FilePage)
+
+
+class DownloadTest(TestCase):
+    CONTENT = b''.join(chr(i % 256) for i in range(200000))
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'file')
+        self.browser = Browser()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def mount(self, **kwargs):
+        adapter = FileAdapter(self.CONTENT, **kwargs)
+        self.browser.session.mount('http://', adapter)
+        return adapter
+
+    def test_download(self):
+        self.mount()
+        calls = []
+        checksum = ('sha1', hashlib.sha1(self.CONTENT).hexdigest())
+        size = self.browser.download('http://weboob.test/file', self.path, checksum=checksum,
+                                     progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(size, len(self.CONTENT))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(calls[-1], (200000, 200000))
+
+        f = BytesIO()
+        self.browser.download('http://weboob.test/file', f, chunk_size=1000)
+        self.assertEqual(f.getvalue(), self.CONTENT)
+
+        self.assertRaises(DownloadError, self.browser.download, 'http://weboob.test/file', self.path,
+                          checksum=('sha1', '0' * 40))
+        self.assertRaises(DownloadError, self.browser.download, 'http://weboob.test/file', self.path, size=1000)
+
+    def test_resume(self):
+        adapter = self.mount()
+        with open(self.path, 'wb') as f:
+            f.write(self.CONTENT[:150000])
+        checksum = ('sha1', hashlib.sha1(self.CONTENT).hexdigest())
+        self.browser.download('http://weboob.test/file', self.path, resume=True, checksum=checksum)
+        self.assertEqual(adapter.requests[0].headers['Range'], 'bytes=150000-')
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+        # Complete file
+        self.browser.download('http://weboob.test/file', self.path, resume=True, checksum=checksum)
+        self.assertEqual(len(adapter.requests), 2)
+        self.browser.download('http://weboob.test/file', self.path, resume=True, size=len(self.CONTENT))
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_resume_unsupported(self):
+        adapter = self.mount(ranges=False)
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        self.browser.download('http://weboob.test/file', self.path, resume=True)
+        self.assertEqual(len(adapter.requests), 1)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+    def test_pages(self):
+        self.browser = FilesBrowser()
+        self.mount()
+        self.browser.download('/file', self.path)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import time
+from email.utils import formatdate
+from unittest import TestCase
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.cache import HTTPCache
+from weboob.browser.pages import Page
+from weboob.browser.tests import FakeAdapter
+
+
+# Adapter serving canned responses, honoring If-None-Match
+class ServerAdapter(FakeAdapter):
+    def __init__(self):
+        super(ServerAdapter, self).__init__()
+        self.resources = {}
+
+    def respond(self, request):
+        headers, content = self.resources[request.url]
+        if 'ETag' in headers and request.headers.get('If-None-Match') == headers['ETag']:
+            return 304, headers, b''
+        return 200, headers, content
+
+
+class StaticPage(Page):
+    CACHE_TTL = 3600
+
+
+class CacheBrowser(PagesBrowser):
+    BASEURL = 'http://weboob.test'
+
+    static = URL('/static', StaticPage)
+    other = URL('/other', Page)
+
+
+class CacheAdapterTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.browser = CacheBrowser(cache_dirname=self.tmpdir)
+        self.server = ServerAdapter()
+        self.browser.session.get_adapter('http://').adapter = self.server
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def open(self, url, **kwargs):
+        return self.browser.open('http://weboob.test%s' % url, **kwargs)
+
+    def test_fresh(self):
+        self.server.resources['http://weboob.test/a'] = ({'Cache-Control': 'max-age=60'}, b'a')
+        self.assertFalse(self.open('/a').from_cache)
+        response = self.open('/a')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.content, b'a')
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.open('/a', headers={'Cache-Control': 'no-cache'})
+        self.assertEqual(len(self.server.requests), 2)
+
+        # Unsafe methods invalidate the stored response.
+        self.open('/a', data={'x': 1})
+        self.assertFalse(self.open('/a').from_cache)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_not_stored(self):
+        self.server.resources['http://weboob.test/a'] = ({'Cache-Control': 'no-store, max-age=60'}, b'a')
+        self.server.resources['http://weboob.test/b'] = ({}, b'b')
+        self.open('/a')
+        self.open('/b')
+        self.assertFalse(self.open('/a').from_cache)
+        self.assertFalse(self.open('/b').from_cache)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_revalidate(self):
+        self.server.resources['http://weboob.test/a'] = ({'ETag': '"1"', 'Cache-Control': 'no-cache'}, b'a')
+        self.open('/a')
+        response = self.open('/a')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'a')
+        self.assertEqual(self.server.requests[1].headers['If-None-Match'], '"1"')
+
+        self.server.resources['http://weboob.test/a'] = ({'ETag': '"2"', 'Cache-Control': 'no-cache'}, b'b')
+        response = self.open('/a')
+        self.assertFalse(response.from_cache)
+        self.assertEqual(response.content, b'b')
+
+    def test_expires(self):
+        now = time.time()
+        self.server.resources['http://weboob.test/a'] = ({'Date': formatdate(now - 60, usegmt=True),
+                                                          'Expires': formatdate(now + 3600, usegmt=True)}, b'a')
+        self.server.resources['http://weboob.test/b'] = ({'Expires': '0'}, b'b')
+        self.server.resources['http://weboob.test/c'] = ({'Date': formatdate(now - 60, usegmt=True),
+                                                          'Last-Modified': formatdate(now - 10 * 3600, usegmt=True)},
+                                                         b'c')
+        for url in ('/a', '/b', '/c'):
+            self.open(url)
+        self.assertTrue(self.open('/a').from_cache)
+        self.assertFalse(self.open('/b').from_cache)
+        # Heuristic freshness: 10% of the time since last modification.
+        self.assertTrue(self.open('/c').from_cache)
+
+    def test_page_ttl(self):
+        self.server.resources['http://weboob.test/static'] = ({'Cache-Control': 'no-cache'}, b'static')
+        self.server.resources['http://weboob.test/other'] = ({'Cache-Control': 'no-cache'}, b'other')
+        self.open('/static')
+        self.open('/other')
+        response = self.open('/static')
+        self.assertTrue(response.from_cache)
+        self.assertIsInstance(response.page, StaticPage)
+        self.assertFalse(self.open('/other').from_cache)
+
+        # The TTL of a page does not override no-store and private.
+        for cc in ('no-store', 'private'):
+            self.server.resources['http://weboob.test/static'] = ({'Cache-Control': cc}, b'static')
+            self.browser.session.get_adapter('http://').cache.delete('GET http://weboob.test/static')
+            self.open('/static')
+            self.assertFalse(self.open('/static').from_cache)
+
+    def test_credentials(self):
+        self.server.resources['http://weboob.test/a'] = ({'Cache-Control': 'max-age=60'}, b'a')
+        self.open('/a', headers={'Authorization': 'Basic Ym9iOjEyMzQ='})
+        self.assertTrue(self.open('/a', headers={'Authorization': 'Basic Ym9iOjEyMzQ='}).from_cache)
+        self.assertFalse(self.open('/a', headers={'Authorization': 'Basic YWxpY2U6YWJjZA=='}).from_cache)
+        self.assertFalse(self.open('/a').from_cache)
+        self.assertEqual(len(self.server.requests), 3)
+
+
+class HTTPCacheTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_eviction(self):
+        cache = HTTPCache(self.tmpdir, max_size=3100)
+        for i in range(3):
+            cache.set('key%d' % i, 'x' * 1000)
+            os.utime(cache._path('key%d' % i), (1000 * (i + 1), 1000 * (i + 1)))
+        # Recently used entries are kept.
+        self.assertIsNotNone(cache.get('key0'))
+        cache.set('key3', 'x' * 1000)
+        self.assertIsNone(cache.get('key1'))
+        for key in ('key0', 'key2', 'key3'):
+            self.assertIsNotNone(cache.get(key))
+        self.assertTrue(cache._size <= 3100)
+
+        cache.delete('key3')
+        self.assertIsNone(cache.get('key3'))
+        self.assertEqual(len(os.listdir(self.tmpdir)), 2)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from weboob.browser import Browser
+from weboob.browser.cassette import Cassette, CassetteMiss
+from weboob.browser.tests import FakeAdapter
+
+
+# Adapter answering with the request method, url and body
+class EchoAdapter(FakeAdapter):
+    def respond(self, request):
+        count = len(self.requests)
+        headers = {'Content-Type': 'text/plain', 'Set-Cookie': 'count=%d' % count}
+        return 200, headers, ('%s %s %s %d' % (request.method, request.url, request.body, count)).encode('ascii')
+
+
+class CassetteTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.json.gz')
+
+        cassette = Cassette(self.path, record=True)
+        browser = Browser(cassette=cassette)
+        browser.session.get_adapter('http://').adapter = EchoAdapter()
+        browser.open('http://weboob.test/a')
+        browser.open('http://weboob.test/a')
+        browser.open('http://weboob.test/b?x=1&t=123', data={'y': '2'})
+        cassette.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replay(self):
+        browser = Browser(cassette=Cassette(self.path))
+        self.assertEqual(browser.open('http://weboob.test/a').text, 'GET http://weboob.test/a None 1')
+        self.assertEqual(browser.session.cookies['count'], '1')
+        self.assertEqual(browser.open('http://weboob.test/a').text, 'GET http://weboob.test/a None 2')
+        # The last response is repeated.
+        self.assertEqual(browser.open('http://weboob.test/a').text, 'GET http://weboob.test/a None 2')
+        self.assertEqual(browser.session.cookies['count'], '2')
+
+        response = browser.open('http://weboob.test/b?x=1&t=123', data={'y': '2'})
+        self.assertEqual(response.text, 'POST http://weboob.test/b?x=1&t=123 y=2 3')
+        self.assertRaises(CassetteMiss, browser.open, 'http://weboob.test/b?x=1&t=456', data={'y': '2'})
+        self.assertRaises(CassetteMiss, browser.open, 'http://weboob.test/c')
+
+    def test_lenient(self):
+        browser = Browser(cassette=Cassette(self.path))
+        browser.session.get_adapter('http://').strict = False
+        response = browser.open('http://weboob.test/b?t=456&x=1', data={'y': '2'})
+        self.assertEqual(response.text, 'POST http://weboob.test/b?x=1&t=123 y=2 3')
+        self.assertRaises(CassetteMiss, browser.open, 'http://weboob.test/c')
+
+    def test_stream(self):
+        cassette = Cassette(self.path, record=True)
+        browser = Browser(cassette=cassette)
+        browser.session.get_adapter('http://').adapter = EchoAdapter()
+        response = browser.open('http://weboob.test/a', stream=True)
+        # not recorded until the body is consumed
+        self.assertEqual(cassette.exchanges, [])
+        self.assertEqual(b''.join(response.iter_content(4)), b'GET http://weboob.test/a None 1')
+        # closed before the end
+        browser.open('http://weboob.test/b', stream=True).close()
+        cassette.save()
+
+        browser = Browser(cassette=Cassette(self.path))
+        self.assertEqual(browser.open('http://weboob.test/a').text, 'GET http://weboob.test/a None 1')
+        self.assertRaises(CassetteMiss, browser.open, 'http://weboob.test/b')
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import time
+from unittest import TestCase
+
+import lxml.html
+from requests.models import Response
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.exceptions import HTTPNotFound
+from weboob.browser.elements import ItemElement, ListElement, TableElement, method
+from weboob.browser.filters.html import Link
+from weboob.browser.filters import standard
+from weboob.browser.filters.standard import Async, AsyncLoad, CleanText, Env, TableCell, compile_selector
+from weboob.browser.pages import HTMLPage
+from weboob.browser.tests import FakeAdapter
+
+
+class Obj(object):
+    id = None
+
+
+class MockPage(object):
+    params = {'page': 1}
+
+    def __init__(self, content):
+        self.doc = lxml.html.fromstring(content)
+
+
+class ElementsTest(TestCase):
+    def setUp(self):
+        self.page = MockPage('<ul><li>a</li><li>b</li></ul>')
+
+    def test_items_and_env(self):
+        class values(ListElement):
+            item_xpath = '//li'
+
+            class item(ItemElement):
+                klass = Obj
+
+                load_upper = lambda self: self.el.text.upper()
+                obj_text = CleanText('.')
+                obj_page = Env('page')
+                obj_sort = Env('sort')
+
+                def parse(self, el):
+                    self.env['page'] += 1
+                    self.obj.upper = self.loaders['upper']
+
+        self.assertEqual([c.__name__ for c in values._items], ['item'])
+        self.assertEqual(values.item._loaders, [('upper', 'load_upper')])
+
+        element = values(self.page)
+        objs = list(element(sort='asc'))
+        self.assertEqual([(o.text, o.upper, o.page, o.sort) for o in objs],
+                         [(u'a', 'A', 2, 'asc'), (u'b', 'B', 2, 'asc')])
+        self.assertEqual(element.env, {'page': 1, 'sort': 'asc'})
+        self.assertEqual(MockPage.params, {'page': 1})
+
+    def test_clean_column(self):
+        class table(TableElement):
+            head_xpath = '//thead/tr/th'
+            item_xpath = '//tbody/tr'
+
+            col_label = u'Label'
+            col_amount = u'Amount'
+
+        page = MockPage(u'<table><thead><tr><th>Label</th><th>Amount</th></tr></thead>'
+                        u'<tbody><tr><td> foo\n <b>bar</b></td><td>1,00</td></tr>'
+                        u'<tr><td>caf\xe9</td></tr></tbody></table>')
+        element = table(page)
+        self.assertEqual(element.clean_column('label'), [u'foo bar', u'caf\xe9'])
+        self.assertEqual(element.clean_column('amount'), [u'1,00', None])
+        self.assertIsNone(element.clean_column('date'))
+
+    def test_table_cells(self):
+        class table(TableElement):
+            head_xpath = '//thead/tr/th'
+            item_xpath = '//tbody/tr'
+
+            col_date = u'Date'
+            col_label = u'Label'
+            col_debit = u'Debit'
+            col_credit = u'Credit'
+
+            class item(ItemElement):
+                klass = Obj
+
+                obj_date = CleanText(TableCell('date'))
+                obj_label = CleanText(TableCell('label'))
+                obj_amount = CleanText(TableCell('debit', 'credit'))
+                obj_credit = CleanText(TableCell('credit'))
+
+        page = MockPage(u'<table><thead><tr><th>Date</th><th colspan="2">Label</th>'
+                        u'<th>Debit</th><th>Credit</th></tr></thead><tbody>'
+                        u'<tr><td>01/01</td><td>foo</td><td>bar</td><td>1,00</td><td>2,00</td></tr>'
+                        u'<tr><td>02/01</td><td colspan="3">baz</td><td>3,00</td></tr>'
+                        u'<tr><td>03/01</td><td colspan="2">qux</td></tr></tbody></table>')
+        element = table(page)
+        self.assertEqual(element.get_colnum('debit'), 3)
+        self.assertEqual([(o.date, o.label, o.amount, o.credit) for o in element],
+                         [(u'01/01', u'foo', u'1,00', u'2,00'),
+                          (u'02/01', u'baz', u'baz', u'3,00'),
+                          (u'03/01', u'qux', u'', u'')])
+        self.assertEqual(element.clean_column('credit'), [u'2,00', u'3,00', None])
+
+
+class SelectorsCacheTest(TestCase):
+    def setUp(self):
+        self.size = standard.SELECTORS_CACHE_SIZE
+        standard.SELECTORS_CACHE_SIZE = 2
+        standard._selectors.clear()
+
+    def tearDown(self):
+        standard.SELECTORS_CACHE_SIZE = self.size
+        standard._selectors.clear()
+
+    def test_lru(self):
+        self.assertEqual(compile_selector('a', lambda: 1), 1)
+        self.assertEqual(compile_selector('b', lambda: 2), 2)
+        # 'a' is used again, so 'b' is the one dropped for 'c'
+        self.assertEqual(compile_selector('a', lambda: 0), 1)
+        self.assertEqual(compile_selector('c', lambda: 3), 3)
+        self.assertEqual(list(standard._selectors), ['a', 'c'])
+        self.assertEqual(compile_selector('b', lambda: 4), 4)
+
+
+# Adapter serving detail pages; the first one is slow, the third one is missing
+class DetailsAdapter(FakeAdapter):
+    def __init__(self):
+        super(DetailsAdapter, self).__init__()
+        self.running = 0
+        self.max_running = 0
+        self.delays = {0: 0.2}
+
+    def respond(self, request):
+        num = int(request.url.rsplit('/', 1)[1])
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.running, self.max_running)
+        time.sleep(self.delays.get(num, 0.01))
+        with self.lock:
+            self.running -= 1
+
+        content = (u'<html><body><h1>Details %d</h1></body></html>' % num).encode('utf-8')
+        return 404 if num == 2 else 200, {'Content-Type': 'text/html; charset=utf-8'}, content
+
+
+class DetailsPage(HTMLPage):
+    pass
+
+
+class ObjList(ListElement):
+    item_xpath = '//a'
+
+    class item(ItemElement):
+        klass = Obj
+
+        load_details = Link('.') & AsyncLoad
+
+        obj_id = CleanText('.')
+        obj_details = Async('details', CleanText('//h1'), default=u'missing')
+
+        def validate(self, obj):
+            ListPage.built.append(obj.id)
+            return True
+
+
+class SkippingObjList(ObjList):
+    class item(ObjList.item):
+        obj_details = Async('details', CleanText('//h1'))
+
+
+class StrictObjList(SkippingObjList):
+    raise_load_errors = True
+
+
+class ListPage(HTMLPage):
+    built = []
+
+    iter_objs = method(ObjList)
+    iter_skipping_objs = method(SkippingObjList)
+    iter_strict_objs = method(StrictObjList)
+
+
+class DetailsBrowser(PagesBrowser):
+    BASEURL = 'http://weboob.test/'
+    MAX_LOADS_PER_HOST = 2
+
+    details = URL('details/(?P<num>\\d+)', DetailsPage)
+
+    def __init__(self, *args, **kwargs):
+        super(DetailsBrowser, self).__init__(*args, **kwargs)
+        self.adapter = DetailsAdapter()
+        self.session.mount('http://', self.adapter)
+
+
+class AsyncLoadTest(TestCase):
+    def setUp(self):
+        self.browser = DetailsBrowser()
+        content = u''.join(u'<a href="details/%d">%d</a>' % (i, i) for i in range(6))
+        response = Response()
+        response.url = 'http://weboob.test/list'
+        response.encoding = 'utf-8'
+        response._content = (u'<html><body>%s</body></html>' % content).encode('utf-8')
+        self.page = ListPage(self.browser, response)
+        ListPage.built = []
+
+    def test_details(self):
+        browser, page = self.browser, self.page
+
+        objs = list(page.iter_objs())
+        # The page of item 2 is not found.
+        self.assertEqual([(obj.id, obj.details) for obj in objs],
+                         [(str(i), 'Details %d' % i if i != 2 else 'missing') for i in range(6)])
+        # Items are built while the first one is loaded.
+        self.assertEqual(ListPage.built[-1], '0')
+        self.assertEqual(browser.adapter.max_running, 2)
+
+        # Without default value, item 2 is skipped.
+        objs = [obj.id for obj in page.iter_skipping_objs()]
+        self.assertEqual(objs, ['0', '1', '3', '4', '5'])
+
+        # Unless the list asks to stop at the turn of item 2.
+        objs = []
+        with self.assertRaises(HTTPNotFound):
+            for obj in page.iter_strict_objs():
+                objs.append(obj.id)
+        self.assertEqual(objs, ['0', '1'])
+
+    def test_close(self):
+        self.browser.adapter.delays = {0: 0.1, 1: 0.1, 2: 0.1, 3: 0.1}
+        objs = self.page.iter_objs()
+        self.assertEqual(next(objs).id, '0')
+        objs.close()
+        # Pages of items 4 and 5 were waiting for items 2 and 3.
+        time.sleep(0.2)
+        requested = set(int(request.url.rsplit('/', 1)[1]) for request in self.browser.adapter.requests)
+        self.assertEqual(requested - set([0, 1, 2, 3]), set())
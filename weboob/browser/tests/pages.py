@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import time
+from unittest import TestCase
+
+from requests.models import Response
+
+from weboob.browser import Browser, PagesBrowser, URL
+from weboob.browser.elements import ItemElement, ListElement, method
+from weboob.browser.filters.html import Link
+from weboob.browser.filters.standard import CleanText
+from weboob.browser.pages import HTMLPage, NextPage, pagination
+from weboob.browser.tests import FakeAdapter
+from weboob.capabilities.base import BaseObject
+
+
+def make_response(content, encoding=None):
+    response = Response()
+    response.status_code = 200
+    response.url = 'http://weboob.test/'
+    response._content = content
+    response.encoding = encoding
+    return response
+
+
+class CountingPage(HTMLPage):
+    built = 0
+
+    def build_doc(self, content):
+        CountingPage.built += 1
+        return super(CountingPage, self).build_doc(content)
+
+
+class HTMLPageTest(TestCase):
+    def setUp(self):
+        self.browser = Browser()
+        CountingPage.built = 0
+
+    def test_lazy_doc(self):
+        page = CountingPage(self.browser, make_response(b'<html><body>ok</body></html>', 'utf-8'))
+        self.assertEqual(CountingPage.built, 0)
+        self.assertEqual(page.doc.xpath('//body')[0].text, 'ok')
+        page.doc
+        self.assertEqual(CountingPage.built, 1)
+
+    def test_meta_charset(self):
+        content = u'<html><head><meta charset="utf-8"></head><body>é</body></html>'.encode('utf-8')
+        page = CountingPage(self.browser, make_response(content, 'iso-8859-1'))
+        self.assertEqual(page.encoding, 'utf-8')
+        self.assertEqual(page.doc.xpath('//body')[0].text, u'é')
+        self.assertEqual(CountingPage.built, 1)
+
+    def test_meta_http_equiv(self):
+        content = b'<html><head><META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=ISO-8859-15">' \
+                  b'</head><body><meta charset="utf-8"></body></html>'
+        page = HTMLPage(self.browser, make_response(content, 'utf-8'))
+        self.assertEqual(page.encoding, 'ISO-8859-15')
+
+    def test_default_encoding(self):
+        page = HTMLPage(self.browser, make_response(b'<html></html>'))
+        self.assertEqual(page.encoding, 'windows-1252')
+
+    def test_forced_encoding(self):
+        content = b'<html><head><meta charset="utf-8"></head></html>'
+        page = HTMLPage(self.browser, make_response(content, 'utf-8'), encoding='iso-8859-15')
+        self.assertEqual(page.encoding, 'iso-8859-15')
+
+
+# Adapter serving 5 pages of a list, with a delay
+class ListAdapter(FakeAdapter):
+    @property
+    def urls(self):
+        return [request.url for request in self.requests]
+
+    def respond(self, request):
+        time.sleep(0.01)
+        num = int(request.url.rsplit('-', 1)[1])
+        content = u'<html><body><ul>%s</ul>' % ''.join('<li>%d.%d</li>' % (num, i) for i in range(3))
+        if num < 5:
+            content += u'<a href="list-%d">next</a>' % (num + 1)
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, (content + u'</body></html>').encode('utf-8')
+
+
+class ListPage(HTMLPage):
+    @pagination
+    @method
+    class iter_values(ListElement):
+        item_xpath = '//li'
+        next_page = Link('//a')
+
+        class item(ItemElement):
+            klass = BaseObject
+
+            obj_id = CleanText('.')
+
+    def iter_form_values(self):
+        for li in self.doc.xpath('//li'):
+            yield li.text
+        for a in self.doc.xpath('//a'):
+            raise NextPage(self.browser.build_request(a.attrib['href']))
+
+
+class ListBrowser(PagesBrowser):
+    BASEURL = 'http://weboob.test/'
+
+    lst = URL('list-(?P<num>\\d+)', ListPage)
+
+    def __init__(self, *args, **kwargs):
+        super(ListBrowser, self).__init__(*args, **kwargs)
+        self.adapter = ListAdapter()
+        self.session.mount('http://', self.adapter)
+
+
+class PrefetchTest(TestCase):
+    EXPECTED = ['%d.%d' % (num, i) for num in range(1, 6) for i in range(3)]
+
+    def iter_values(self, depth):
+        browser = ListBrowser()
+        browser.PREFETCH_PAGES = depth
+        browser.lst.go(num=1)
+        return browser, browser.page.iter_values()
+
+    def test_disabled(self):
+        browser, values = self.iter_values(0)
+        self.assertEqual([obj.id for obj in values], self.EXPECTED)
+        self.assertEqual(len(browser.adapter.urls), 5)
+
+    def test_prefetch(self):
+        browser, values = self.iter_values(2)
+        self.assertEqual(next(values).id, '1.0')
+        for i in range(100):
+            if len(browser.adapter.urls) == 3:
+                break
+            time.sleep(0.01)
+        # The first page and the two next ones have been requested.
+        self.assertEqual(browser.adapter.urls, ['http://weboob.test/list-%d' % i for i in range(1, 4)])
+
+        self.assertEqual(['1.0'] + [obj.id for obj in values], self.EXPECTED)
+        self.assertEqual(browser.adapter.urls, ['http://weboob.test/list-%d' % i for i in range(1, 6)])
+        self.assertEqual(browser.url, 'http://weboob.test/list-5')
+
+    def test_stop(self):
+        browser, values = self.iter_values(1)
+        self.assertEqual(next(values).id, '1.0')
+        values.close()
+        time.sleep(0.05)
+        self.assertTrue(len(browser.adapter.urls) <= 2)
+
+    def test_requests(self):
+        # Request objects are not prefetched.
+        browser = ListBrowser()
+        browser.PREFETCH_PAGES = 2
+        browser.lst.go(num=1)
+        values = list(browser.pagination(lambda: browser.page.iter_form_values()))
+        self.assertEqual(values, self.EXPECTED)
+        self.assertEqual(len(browser.adapter.urls), 5)
@@ -18,8 +18,9 @@
 from unittest import TestCase
 
 from weboob.browser import PagesBrowser, URL
-from weboob.browser.pages import Page
-from weboob.browser.url import UrlNotResolvable
+from weboob.browser.pages import HTMLPage, Page
+from weboob.browser.tests import FakeAdapter
+from weboob.browser.url import UrlNotResolvable, URLDispatcher
 
 
 class MyMockBrowserWithoutBrowser():
@@ -45,6 +46,7 @@ class MyMockBrowser(PagesBrowser):
     # URL used by method build
     urlValue = URL("http://test.com/(?P<id>\d+)")
     urlParams = URL("http://test.com\?id=(?P<id>\d+)&name=(?P<name>.+)")
+    urlOptional = URL("http://test.com/(?P<id>\d+)(?:/(?P<name>\w+))?")
 
     # URL used by method is_here
     urlIsHere = URL('http://weboob.org/(?P<param>)', MyMockPage)
@@ -110,6 +112,17 @@ class URLTest(TestCase):
         res = self.myBrowser.urlParams.build(id=2, name="weboob")
         self.assertEquals(res, "http://test.com?id=2&name=weboob")
 
+    # Checks that build uses the pattern taking exactly the given parameters
+    def test_build_optional_group(self):
+        self.assertEquals(self.myBrowser.urlOptional.build(id=2), "http://test.com/2")
+        self.assertEquals(self.myBrowser.urlOptional.build(id=2, name="weboob"), "http://test.com/2/weboob")
+
+    # Checks that match uses the current BASEURL
+    def test_match_baseurl_change(self):
+        self.assertTrue(self.myBrowser.urlIsHere.match("http://weboob.org/foo"))
+        self.myBrowser.BASEURL = "http://weboob.com"
+        self.assertTrue(self.myBrowser.urlRegWithoutHttp.match("http://weboob.comnews"))
+
     # Checks that an exception is raised when a parameter is missing
     # (here, the parameter name)
     def test_build_urlParams_KO_missedparams(self):
@@ -127,3 +140,72 @@ class URLTest(TestCase):
         self.assertRaisesRegexp(AssertionError, "You can use this method" +
                                 " only if there is a Page class handler.",
                                 self.myBrowser.urlRegex.is_here, id=2)
+
+
+# Adapter returning the same HTML document for every request
+class StaticAdapter(FakeAdapter):
+    def respond(self, request):
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, b'<html><body><div id="list">ok</div></body></html>'
+
+
+class CountingPage(HTMLPage):
+    built = 0
+
+    def build_doc(self, content):
+        CountingPage.built += 1
+        return super(CountingPage, self).build_doc(content)
+
+
+class RejectedPage(CountingPage):
+    is_here = '//div[@id="form"]'
+
+
+class ListPage(CountingPage):
+    is_here = '//div[@id="list"]'
+
+
+class DispatchBrowser(PagesBrowser):
+    BASEURL = 'http://weboob.test'
+
+    form = URL('/(?P<page>\\w+)\\.html', RejectedPage)
+    other = URL('/other/(?P<id>\\d+)', Page)
+    lst = URL('/(?P<name>\\w+)\\.html', ListPage)
+
+    def __init__(self, *args, **kwargs):
+        super(DispatchBrowser, self).__init__(*args, **kwargs)
+        self.session.mount('http://', StaticAdapter())
+
+
+class URLDispatcherTest(TestCase):
+    def test_order(self):
+        browser = DispatchBrowser()
+        dispatcher = URLDispatcher(browser._urls.values(), browser.BASEURL)
+        matches = list(dispatcher.iter_matches('http://weboob.test/list.html'))
+        self.assertEqual([url for url, m in matches], [browser.form, browser.lst])
+        self.assertEqual(matches[1][1].groupdict(), {'name': 'list'})
+        self.assertEqual([url for url, m in dispatcher.iter_matches('http://weboob.test/other/42')], [browser.other])
+        self.assertEqual(list(dispatcher.iter_matches('http://weboob.org/list.html')), [])
+
+    def test_many_groups(self):
+        urls = [URL('/(?P<a>\\d+)/(?P<b>\\d+)/x%dx' % i, Page) for i in range(200)]
+        urls.append(URL(r'/(?P<a>x+)-(?P=a)', Page))
+        dispatcher = URLDispatcher(urls, 'http://weboob.test')
+        self.assertTrue(len(dispatcher.chunks) > 2)
+        matches = list(dispatcher.iter_matches('http://weboob.test/1/2/x150x'))
+        self.assertEqual([url for url, m in matches], [urls[150]])
+        self.assertEqual(matches[0][1].groupdict(), {'a': '1', 'b': '2'})
+        matches = list(dispatcher.iter_matches('http://weboob.test/xx-xx'))
+        self.assertEqual([url for url, m in matches], [urls[200]])
+
+    def test_doc_built_once(self):
+        browser = DispatchBrowser()
+        CountingPage.built = 0
+        page = browser.open('/list.html').page
+        self.assertIsInstance(page, ListPage)
+        self.assertEqual(page.params, {'name': 'list'})
+        self.assertEqual(CountingPage.built, 1)
+
+    def test_baseurl_change(self):
+        browser = DispatchBrowser()
+        browser.BASEURL = 'http://weboob.other'
+        self.assertIsInstance(browser.open('http://weboob.other/list.html').page, ListPage)
@@ -27,6 +27,13 @@ import requests
 from weboob.tools.regex_helper import normalize
 
 
+# Caches shared by all URL objects, see URL._get_templates() and
+# URL._get_regexes(). Keys are the regexps written in browsers, so they are
+# bounded.
+_TEMPLATES = {}
+_REGEXES = {}
+
+
 class UrlNotResolvable(Exception):
     """
     Raised when trying to locate on an URL instance which url pattern is not resolvable as a real url.
@@ -125,23 +132,18 @@ class URL(object):
         """
         browser = kwargs.pop('browser', self.browser)
         params = kwargs.pop('params', None)
-        patterns = []
-        for url in self.urls:
-            patterns += normalize(url)
+        patterns = self._get_templates()
+
+        # Use the first pattern which takes exactly the given arguments.
+        given = frozenset(kwargs)
+        for pattern, names in patterns:
+            if names != given:
+                continue
 
-        for pattern, _ in patterns:
             url = pattern
             # only use full-name substitutions, to allow % in URLs
-            for kwkey in kwargs.keys():  # need to use keys() because of pop()
-                search = '%%(%s)s' % kwkey
-                if search in pattern:
-                    url = url.replace(search, unicode(kwargs.pop(kwkey)))
-            # if there are named substitutions left, ignore pattern
-            if re.search('%\([A-z_]+\)s', url):
-                continue
-            # if not all kwargs were used
-            if len(kwargs):
-                continue
+            for name in names:
+                url = url.replace('%%(%s)s' % name, unicode(kwargs[name]))
 
             url = browser.absurl(url, base=True)
             if params:
@@ -160,21 +162,55 @@ class URL(object):
             assert self.browser is not None
             base = self.browser.BASEURL
 
-        for regex in self.urls:
-            if not re.match(r'^\w+://.*', regex):
-                regex = re.escape(base) + regex
-            m = re.match(regex, url)
+        for regex in self._get_regexes(base):
+            m = regex.match(url)
             if m:
                 return m
 
-    def handle(self, response):
+    def _get_templates(self):
+        """
+        Get normalized patterns of regexps, with names of their arguments.
+
+        They are computed once for each regexp and shared between URL objects.
+        """
+        patterns = []
+        for regex in self.urls:
+            try:
+                templates = _TEMPLATES[regex]
+            except KeyError:
+                templates = _TEMPLATES[regex] = [(pattern, frozenset(names)) for pattern, names in normalize(regex)]
+            patterns += templates
+        return patterns
+
+    def _get_regexes(self, base):
+        """
+        Get compiled regexps, relative ones being prefixed by the given base.
+
+        They are computed once for each base and shared between URL objects.
+        """
+        key = (tuple(self.urls), base)
+        try:
+            return _REGEXES[key]
+        except KeyError:
+            regexes = []
+            for regex in self.urls:
+                if not re.match(r'^\w+://.*', regex):
+                    regex = re.escape(base) + regex
+                regexes.append(re.compile(regex))
+            _REGEXES[key] = regexes
+            return regexes
+
+    def handle(self, response, match=None):
         """
         Handle a HTTP response to get an instance of the klass if it matches.
+
+        :param match: result of :meth:`match` on the response url, if it is
+                      already known
         """
         if self.klass is None:
             return
 
-        m = self.match(response.url)
+        m = match or self.match(response.url)
         if m:
             page = self.klass(self.browser, response, m.groupdict())
             if hasattr(page, 'is_here'):
@@ -201,3 +237,101 @@ class URL(object):
 
             return func(browser, id_or_url, *args, **kwargs)
         return inner
+
+
+class URLDispatcher(object):
+    """
+    Find which :class:`URL` objects match an url.
+
+    Regexps of all URL objects having a Page class are merged in a few
+    alternations, so in most cases an url is checked with only one regex
+    search instead of one per URL object.
+
+    :param urls: URL objects, in order of priority
+    :type urls: :class:`list`
+    :param base: base url used for relative regexps
+    :type base: :class:`str`
+    """
+
+    MAX_GROUPS = 99
+    """
+    Python 2 does not support more than 100 groups in a regexp, so
+    alternations are split.
+    """
+
+    # Constructions which can't be merged in an alternation once group names
+    # are removed: back references and inline flags.
+    _STANDALONE = re.compile(r'\(\?P=|\\\d|\(\?[aiLmsux]+\)')
+    _NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+
+    def __init__(self, urls, base):
+        self.base = base
+        self.entries = []
+        self.chunks = []
+
+        for url in urls:
+            if url.klass is None:
+                continue
+            for regex in url.urls:
+                if not re.match(r'^\w+://.*', regex):
+                    if base is None:
+                        continue
+                    regex = re.escape(base) + regex
+                self.entries.append((url, regex, re.compile(regex)))
+
+        alternatives = []
+        groups = 0
+        for i, (url, regex, compiled) in enumerate(self.entries):
+            alternative = None
+            if not self._STANDALONE.search(regex):
+                alternative = self._NAMED_GROUP.sub('(?:', regex)
+                try:
+                    alt_groups = re.compile(alternative).groups + 1
+                except re.error:
+                    alternative = None
+
+            if alternative is None or groups + alt_groups > self.MAX_GROUPS:
+                self._add_chunk(alternatives)
+                alternatives = []
+                groups = 0
+            if alternative is None:
+                # Keep it alone, it will be matched with its own regexp.
+                self.chunks.append((i, i + 1, None, {}))
+                continue
+
+            alternatives.append((i, groups + 1, alternative))
+            groups += alt_groups
+        self._add_chunk(alternatives)
+
+    def _add_chunk(self, alternatives):
+        if not alternatives:
+            return
+        regex = '|'.join(['(%s)' % alternative for _, _, alternative in alternatives])
+        indexes = dict((group, i) for i, group, _ in alternatives)
+        start = alternatives[0][0]
+        end = alternatives[-1][0] + 1
+        self.chunks.append((start, end, re.compile(regex), indexes))
+
+    def iter_matches(self, url):
+        """
+        Iterate on URL objects matching an url, in order of priority.
+
+        :rtype: iter[(:class:`URL`, match object)]
+        """
+        for start, end, regex, indexes in self.chunks:
+            if regex is None:
+                m = self.entries[start][2].match(url)
+                if m:
+                    yield self.entries[start][0], m
+                continue
+
+            m = regex.match(url)
+            if not m:
+                continue
+
+            # Only the first matching regexp of the chunk is known, others
+            # are tried one by one, as the first one is usually the right one.
+            for i in range(indexes[m.lastindex], end):
+                m = self.entries[i][2].match(url)
+                if m:
+                    yield self.entries[i][0], m
@@ -20,6 +20,7 @@
 
 import warnings
 import re
+from datetime import date, time, timedelta
 from decimal import Decimal
 from copy import deepcopy, copy
 
@@ -180,7 +181,7 @@ class Field(object):
 
     def __init__(self, doc, *args, **kwargs):
         self.types = ()
-        self.value = kwargs.get('default', NotLoaded)
+        self.value = self.normalize(kwargs.get('default', NotLoaded))
         self.doc = doc
 
         for arg in args:
@@ -198,6 +199,12 @@ class Field(object):
         """
         return value
 
+    def normalize(self, value):
+        """
+        Normalize a checked value before it is stored on an object.
+        """
+        return value
+
 
 class IntField(Field):
     """
@@ -263,6 +270,32 @@ class BytesField(Field):
         return str(value)
 
 
+_Deleted = object()
+_IMMUTABLE_TYPES = (NotLoadedType, NotAvailableType, type(None), bool, int, long,
+                    float, Decimal, str, unicode, date, time, timedelta)
+
+
+class _FieldValue(object):
+    """
+    Read the value of a field in the values of an object.
+
+    It is only a non-data descriptor: values are set by
+    :meth:`BaseObject.__setattr__`, which checks them.
+    """
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+    def __get__(self, obj, objtype=None):
+        if obj is not None:
+            value = obj._values[self.index]
+            if value is not _Deleted:
+                return value
+        raise AttributeError("'%s' object has no attribute '%s'" % (
+            (objtype or type(obj)).__name__, self.name))
+
+
 class _BaseObjectMeta(type):
     def __new__(cls, name, bases, attrs):
         fields = [(field_name, attrs.pop(field_name)) for field_name, obj in attrs.items() if isinstance(obj, Field)]
@@ -272,9 +305,22 @@ class _BaseObjectMeta(type):
         if new_class._fields is None:
             new_class._fields = OrderedDict()
         else:
-            new_class._fields = deepcopy(new_class._fields)
+            new_class._fields = OrderedDict(new_class._fields)
         new_class._fields.update(fields)
 
+        # Fields are only described by the class. Objects store their values
+        # in a list, in the order of fields: a redefined field keeps the
+        # index it has in parent classes.
+        new_class._indexes = dict((field_name, index) for index, field_name in enumerate(new_class._fields))
+        new_class._defaults = [field.value for field in new_class._fields.itervalues()]
+        new_class._mutable_defaults = [index for index, value in enumerate(new_class._defaults)
+                                       if not isinstance(value, _IMMUTABLE_TYPES)]
+        for field_name, field in fields:
+            setattr(new_class, field_name, _FieldValue(field_name, new_class._indexes[field_name]))
+
+        # Names of attributes which can be set on objects without warning.
+        new_class._attribute_names = frozenset(dir(new_class))
+
         if new_class.__doc__ is None:
             new_class.__doc__ = ''
         for name, field in fields:
@@ -316,9 +362,25 @@ class BaseObject(object):
     _fields = None
 
     def __init__(self, id=u'', backend=None):
+        if '_values' not in self.__dict__:
+            self._init_values()
+
         self.id = to_unicode(id)
         self.backend = backend
-        self._fields = deepcopy(self._fields)
+
+    def _init_values(self):
+        values = list(self._defaults)
+        for index in self._mutable_defaults:
+            values[index] = deepcopy(values[index])
+        object.__setattr__(self, '_values', values)
+        return values
+
+    def __getattr__(self, name):
+        # Values are created by __init__, but the constructor of a subclass
+        # may set or read fields before calling it.
+        if name == '_values':
+            return self._init_values()
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
 
     @property
     def fullid(self):
@@ -344,7 +406,7 @@ class BaseObject(object):
 
     def copy(self):
         obj = copy(self)
-        obj._fields = copy(self._fields)
+        object.__setattr__(obj, '_values', list(self._values))
         return obj
 
     def __deepcopy__(self, memo):
@@ -372,8 +434,9 @@ class BaseObject(object):
 
         if hasattr(self, 'id') and self.id is not None:
             yield 'id', self.id
-        for name, field in self._fields.iteritems():
-            yield name, field.value
+        for name, value in zip(self._fields, self._values):
+            if value is not _Deleted:
+                yield name, value
 
     def __eq__(self, obj):
         if isinstance(obj, BaseObject):
@@ -381,23 +444,17 @@ class BaseObject(object):
         else:
             return False
 
-    def __getattr__(self, name):
-        if self._fields is not None and name in self._fields:
-            return self._fields[name].value
-        else:
-            raise AttributeError("'%s' object has no attribute '%s'" % (
-                self.__class__.__name__, name))
-
     def __setattr__(self, name, value):
         try:
-            attr = (self._fields or {})[name]
+            attr = self._fields[name]
         except KeyError:
-            if name not in dir(self) and not name.startswith('_'):
+            if not name.startswith('_') and name not in self._attribute_names and name not in self.__dict__:
                 warnings.warn('Creating a non-field attribute %s. Please prefix it with _' % name,
                               AttributeCreationWarning, stacklevel=2)
             object.__setattr__(self, name, value)
         else:
-            if not empty(value):
+            is_empty = empty(value)
+            if not is_empty:
                 try:
                     # Try to convert value to the wanted one.
                     nvalue = attr.convert(value)
@@ -413,17 +470,44 @@ class BaseObject(object):
                     # raise ValueError.
                     pass
 
-            if not isinstance(value, attr.types) and not empty(value):
+            if not is_empty and not isinstance(value, attr.types):
                 raise ValueError(
                     'Value for "%s" needs to be of type %r, not %r' % (
                         name, attr.types, type(value)))
-            attr.value = value
+            self._values[self._indexes[name]] = attr.normalize(value)
+
+    def set_trusted(self, name, value):
+        """
+        Set a field without trying to convert the value, when it is already of
+        one of the types of the field, like values returned by filters.
+
+        Other values, and attributes which are not fields, are set like with
+        :func:`setattr`.
+
+        :param name: name of the field
+        :type name: :class:`str`
+        :param value: value to set
+        """
+        try:
+            index = self._indexes[name]
+        except KeyError:
+            pass
+        else:
+            attr = self._fields[name]
+            if type(value) in attr.types or empty(value):
+                self._values[index] = attr.normalize(value)
+                return
+        setattr(self, name, value)
 
     def __delattr__(self, name):
         try:
-            self._fields.pop(name)
+            index = self._indexes[name]
         except KeyError:
             object.__delattr__(self, name)
+        else:
+            if self._values[index] is _Deleted:
+                raise AttributeError(name)
+            self._values[index] = _Deleted
 
     def to_dict(self):
         def iter_decorate(d):
@@ -84,8 +84,8 @@ class Collection(BaseCollection):
     split_path = Field('Full collection path', list)
 
     def __init__(self, split_path=None, title=None):
-        self.title = title
         BaseCollection.__init__(self, split_path)
+        self.title = title
 
     def __unicode__(self):
         if self.title and self.basename:
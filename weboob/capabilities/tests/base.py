@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import warnings
+from decimal import Decimal
+from unittest import TestCase
+
+from weboob.capabilities.base import AttributeCreationWarning, BaseObject, ConversionWarning, \
+    DecimalField, Field, IntField, NotAvailable, NotLoaded, StringField
+from weboob.capabilities.date import DateField
+from weboob.tools.date import date as weboob_date
+
+
+class Parent(BaseObject):
+    """
+    Parent object.
+    """
+    label = StringField('Label')
+    amount = DecimalField('Amount', default=Decimal('0'))
+    tags = Field('Tags', list, default=[])
+
+
+class Child(Parent):
+    """
+    Child object.
+    """
+    date = DateField('Date')
+    label = StringField('Redefined label', default=u'none')
+    count = IntField('Count')
+
+
+class BaseObjectTest(TestCase):
+    def test_fields(self):
+        self.assertEqual(list(Child._fields), ['label', 'amount', 'tags', 'date', 'count'])
+        self.assertEqual(list(Child().iter_fields()),
+                         [('id', u''), ('label', u'none'), ('amount', Decimal('0')), ('tags', []),
+                          ('date', NotLoaded), ('count', NotLoaded)])
+        self.assertEqual(Parent().label, NotLoaded)
+        self.assertRaises(AttributeError, getattr, Parent, 'label')
+
+    def test_values(self):
+        obj = Child(u'1', 'backend')
+        obj.label = 'foo'
+        obj.date = datetime.date(1850, 1, 2)
+        obj.tags.append(u'bar')
+        self.assertEqual(obj.label, u'foo')
+        self.assertIs(type(obj.date), weboob_date)
+        self.assertRaises(ValueError, setattr, obj, 'amount', u'nan?')
+        self.assertEqual(obj.to_dict(), {'id': u'1@backend', 'label': u'foo', 'amount': Decimal('0'),
+                                         'tags': [u'bar'], 'date': datetime.date(1850, 1, 2),
+                                         'count': NotLoaded})
+        self.assertEqual(Child().tags, [])
+        self.assertNotIn('_fields', obj.__dict__)
+
+    def test_set_before_init(self):
+        class Early(Child):
+            """
+            Object setting fields before calling the parent constructor.
+            """
+            def __init__(self, id):
+                self.label = u'early'
+                self.tags.append(u'foo')
+                Child.__init__(self, id)
+
+        obj = Early(u'1')
+        self.assertEqual((obj.id, obj.label, obj.tags), (u'1', u'early', [u'foo']))
+        self.assertEqual((Child().label, Child().tags), (u'none', []))
+        self.assertRaises(AttributeError, getattr, obj, '_missing')
+
+    def test_copy_and_delete(self):
+        obj = Child()
+        obj.label = u'foo'
+        obj2 = obj.copy()
+        obj2.label = u'bar'
+        self.assertEqual((obj.label, obj2.label), (u'foo', u'bar'))
+
+        del obj2.date
+        self.assertRaises(AttributeError, getattr, obj2, 'date')
+        self.assertEqual([key for key, value in obj2.iter_fields()], ['id', 'label', 'amount', 'tags', 'count'])
+        self.assertEqual(obj.date, NotLoaded)
+
+    def test_warnings(self):
+        obj = Child()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            obj._private = 1
+            obj.count = 2
+            obj.count = 3L
+            obj.foo = 4
+            obj.foo = 5
+
+        self.assertEqual([w.category for w in caught], [ConversionWarning, AttributeCreationWarning])
+        self.assertIn('foo', str(caught[1].message))
+        self.assertIs(type(obj.count), int)
+
+    def test_set_trusted(self):
+        obj = Child()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            obj.set_trusted('label', u'foo')
+            obj.set_trusted('amount', NotAvailable)
+            obj.set_trusted('count', 3L)
+            obj.set_trusted('date', datetime.date(1850, 1, 2))
+            obj.set_trusted('count', '4')
+            obj.set_trusted('_private', 5)
+
+        self.assertEqual([w.category for w in caught], [ConversionWarning])
+        self.assertEqual((obj.label, obj.amount, obj.count, obj._private), (u'foo', NotAvailable, 4, 5))
+        self.assertIs(type(obj.date), weboob_date)
+        self.assertRaises(ValueError, obj.set_trusted, 'amount', u'nan?')
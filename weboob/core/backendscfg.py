@@ -21,12 +21,16 @@
 import stat
 import os
 import sys
+import tempfile
+from threading import RLock
 try:
     from ConfigParser import RawConfigParser, DuplicateSectionError
 except ImportError:
     from configparser import RawConfigParser, DuplicateSectionError
 from logging import warning
 
+from weboob.tools.ordereddict import OrderedDict
+
 __all__ = ['BackendsConfig', 'BackendAlreadyExists']
 
 
@@ -40,6 +44,10 @@ class BackendsConfig(object):
 
     def __init__(self, confpath):
         self.confpath = confpath
+        self._lock = RLock()
+        self._config = None
+        self._stamp = None
+        self._index = None
         try:
             mode = os.stat(confpath).st_mode
         except OSError:
@@ -62,9 +70,60 @@ class BackendsConfig(object):
                     raise self.WrongPermissions(
                         u'Weboob will not start as long as config file %s is readable by group or other users.' % confpath)
 
-    def iter_backends(self):
-        config = RawConfigParser()
-        config.read(self.confpath)
+    def _read(self):
+        """
+        Get the parsed config file, which is only read again when it has been
+        changed.
+        """
+        try:
+            st = os.stat(self.confpath)
+        except OSError:
+            stamp = None
+        else:
+            stamp = (st.st_ino, st.st_size, st.st_mtime)
+
+        if self._config is None or stamp != self._stamp:
+            config = RawConfigParser()
+            config.read(self.confpath)
+            self._config = config
+            self._stamp = stamp
+            self._index = None
+        return self._config
+
+    def _write(self, config):
+        """
+        Write the config file atomically: the new content is written in a
+        temporary file, which then replaces the config file.
+        """
+        dirname, basename = os.path.split(self.confpath)
+        fd, tmppath = tempfile.mkstemp(prefix='.%s.' % basename, dir=dirname)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                config.write(f)
+            if sys.platform == 'win32' and os.path.exists(self.confpath):
+                os.remove(self.confpath)
+            os.rename(tmppath, self.confpath)
+        except:
+            self._config = None
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+            raise
+
+        st = os.stat(self.confpath)
+        self._config = config
+        self._stamp = (st.st_ino, st.st_size, st.st_mtime)
+        self._index = None
+
+    def _get_index(self):
+        """
+        Get the configured backends, indexed by name, as tuples (module name,
+        params). Backends using the old "_backend" field are converted.
+        """
+        config = self._read()
+        if self._index is not None:
+            return self._index
+
+        index = OrderedDict()
         changed = False
         for backend_name in config.sections():
             params = dict(config.items(backend_name))
@@ -79,65 +138,58 @@ class BackendsConfig(object):
                 except KeyError:
                     warning('Missing field "_module" for configured backend "%s"', backend_name)
                     continue
-            yield backend_name, module_name, params
+            index[backend_name] = (module_name, params)
 
         if changed:
-            with open(self.confpath, 'wb') as f:
-                config.write(f)
+            self._write(config)
+        self._index = index
+        return index
+
+    def iter_backends(self):
+        with self._lock:
+            backends = [(backend_name, module_name, dict(params))
+                        for backend_name, (module_name, params) in self._get_index().iteritems()]
+        return iter(backends)
 
     def backend_exists(self, name):
         """
         Return True if the backend exists in config.
         """
-        config = RawConfigParser()
-        config.read(self.confpath)
-        return name in config.sections()
+        with self._lock:
+            return self._read().has_section(name)
 
     def add_backend(self, backend_name, module_name, params, edit=False):
         if not backend_name:
             raise ValueError(u'Please give a name to the configured backend.')
-        config = RawConfigParser()
-        config.read(self.confpath)
-        if not edit:
-            try:
-                config.add_section(backend_name)
-            except DuplicateSectionError:
-                raise BackendAlreadyExists(backend_name)
-        config.set(backend_name, '_module', module_name)
-        for key, value in params.iteritems():
-            if isinstance(value, unicode):
-                value = value.encode('utf-8')
-            config.set(backend_name, key, value)
-        with open(self.confpath, 'wb') as f:
-            config.write(f)
+        with self._lock:
+            config = self._read()
+            if not edit:
+                try:
+                    config.add_section(backend_name)
+                except DuplicateSectionError:
+                    raise BackendAlreadyExists(backend_name)
+            config.set(backend_name, '_module', module_name)
+            for key, value in params.iteritems():
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                config.set(backend_name, key, value)
+            self._write(config)
 
     def edit_backend(self, backend_name, module_name, params):
         return self.add_backend(backend_name, module_name, params, True)
 
     def get_backend(self, backend_name):
-        config = RawConfigParser()
-        config.read(self.confpath)
-        if not config.has_section(backend_name):
-            raise KeyError(u'Configured backend "%s" not found' % backend_name)
-
-        items = dict(config.items(backend_name))
-
-        try:
-            module_name = items.pop('_module')
-        except KeyError:
+        with self._lock:
             try:
-                module_name = items.pop('_backend')
-                self.edit_backend(backend_name, module_name, items)
+                module_name, items = self._get_index()[backend_name]
             except KeyError:
-                warning('Missing field "_module" for configured backend "%s"', backend_name)
                 raise KeyError(u'Configured backend "%s" not found' % backend_name)
-        return module_name, items
+            return module_name, dict(items)
 
     def remove_backend(self, backend_name):
-        config = RawConfigParser()
-        config.read(self.confpath)
-        if not config.remove_section(backend_name):
-            return False
-        with open(self.confpath, 'w') as f:
-            config.write(f)
-        return True
+        with self._lock:
+            config = self._read()
+            if not config.remove_section(backend_name):
+                return False
+            self._write(config)
+            return True
@@ -18,19 +18,33 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+import time
+from collections import deque
 from copy import copy
-from threading import Thread
+from threading import Event, Thread, RLock
 try:
     import Queue
 except ImportError:
     import queue as Queue
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
 
 from weboob.capabilities.base import BaseObject
+from weboob.tools.cancel import CancelToken
+from weboob.tools.compat import basestring
 from weboob.tools.misc import get_backtrace
 from weboob.tools.log import getLogger
 
 
-__all__ = ['BackendsCall', 'CallErrors']
+__all__ = ['BackendsCall', 'AsyncBackendsCall', 'CallErrors', 'BackendTimeout']
+
+
+class BackendTimeout(Exception):
+    """
+    A backend has not finished before the deadline of the call.
+    """
 
 
 class CallErrors(Exception):
@@ -42,39 +56,154 @@ class CallErrors(Exception):
         Exception.__init__(self, msg)
         self.errors = copy(errors)
 
+    @property
+    def timedout(self):
+        """
+        Backends abandoned because they did not finish before the deadline.
+
+        :rtype: list[:class:`Module`]
+        """
+        return [backend for backend, error, backtrace in self.errors if isinstance(error, BackendTimeout)]
+
     def __iter__(self):
         return self.errors.__iter__()
 
 
+class _EndOfStream(object):
+    """
+    Sentinel put in the responses queue when a backend has finished.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+
 class BackendsCall(object):
-    def __init__(self, backends, function, *args, **kwargs):
+    WAIT_TIMEOUT = 3600
+    """
+    Blocking waits are split in slices of this duration, as with Python 2 a
+    wait without timeout can't be interrupted by a signal (like SIGINT).
+    """
+
+    def __init__(self, backends, function, args=(), kwargs=None, executor=None, max_concurrency=None, limit=None,
+                 deadline=None):
         """
         :param backends: List of backends to call
         :type backends: list[:class:`Module`]
         :param function: backends' method name, or callable object.
         :type function: :class:`str` or :class:`callable`
+        :param args: arguments given to function
+        :type args: :class:`tuple`
+        :param kwargs: keyword arguments given to function
+        :type kwargs: :class:`dict`
+        :param executor: pool used to run calls; if None, a thread is started for each backend
+        :type executor: :class:`weboob.core.workers.WorkerPool`
+        :param max_concurrency: maximum number of backends processed at the same time
+        :type max_concurrency: :class:`int`
+        :param limit: maximum number of results returned by all backends;
+                      once it is reached, the call is cancelled
+        :type limit: :class:`int`
+        :param deadline: time (as returned by :func:`time.time`) after which
+                         backends which have not finished are abandoned
+        :type deadline: :class:`float`
         """
         self.logger = getLogger('bcall')
 
         self.responses = Queue.Queue()
         self.errors = []
-        self.tasks = Queue.Queue()
+        self.finished = Event()
+        self.token = CancelToken()
+        self.limit = limit
+        self.stored = 0
+        self.deadline = deadline
+        self.timedout = None
+
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
 
-        for backend in backends:
-            Thread(target=self.backend_process, args=(function, args, kwargs)).start()
-            self.tasks.put(backend)
+        # A nested call made from a worker would wait for workers which may
+        # all be busy (or for the backend it is running on), so fallback on
+        # dedicated threads.
+        if executor is not None and executor.in_worker():
+            executor = None
+        self.executor = executor
+
+        self.mutex = RLock()
+        self.waiting = list(backends)
+        self.unfinished = list(backends)
+        self.count = len(self.waiting)
+        self.remaining = self.count
+        if self.count == 0:
+            self.finished.set()
+
+        if max_concurrency is None:
+            max_concurrency = len(self.waiting)
+        for i in range(max_concurrency):
+            self._start_next()
+
+    def _start_next(self):
+        with self.mutex:
+            if not self.waiting:
+                return
+            backend = self.waiting.pop(0)
+
+        self._run(self.backend_process, backend)
+
+    def _run(self, function, backend, *args):
+        if self.executor is None:
+            Thread(target=function, args=(backend,) + args).start()
+        else:
+            self.executor.submit(function, (backend,) + args, affinity=backend)
+
+    def cancel(self):
+        """
+        Stop the call.
+
+        Backends which are not started yet are not called, and running ones
+        stop to iterate on their results at the next one.
+        """
+        with self.mutex:
+            self.token.cancel()
+            skipped, self.waiting = self.waiting, []
+
+        for backend in skipped:
+            self._finish(backend)
+
+    def _finish(self, backend):
+        self._push(_EndOfStream(backend))
+        with self.mutex:
+            self.unfinished.remove(backend)
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.finished.set()
 
     def store_result(self, backend, result):
         if result is None:
             return
 
+        with self.mutex:
+            if self.token.cancelled:
+                return
+            self.stored += 1
+            if self.limit and self.stored >= self.limit:
+                self.logger.debug('%s: Limit of %d results reached, cancel call', backend, self.limit)
+                self.cancel()
+
         if isinstance(result, BaseObject):
             result.backend = backend.name
-        self.responses.put(result)
+        self._push(result)
 
-    def backend_process(self, function, args, kwargs):
-        backend = self.tasks.get()
-        with backend:
+    def _push(self, item):
+        """
+        Send a result, or an end of stream, to the consumer.
+        """
+        self.responses.put(item)
+
+    def backend_process(self, backend):
+        function, args, kwargs = self.function, self.args, self.kwargs
+        with backend, self.token:
+            paused = False
             try:
                 # Call method on backend
                 try:
@@ -90,26 +219,122 @@ class BackendsCall(object):
                     self.logger.debug('%s: Called function %s returned: %r', backend, function, result)
 
                     if hasattr(result, '__iter__') and not isinstance(result, basestring):
-                        # Loop on iterator
-                        try:
-                            for subresult in result:
-                                self.store_result(backend, subresult)
-                        except Exception as error:
-                            self.errors.append((backend, error, get_backtrace(error)))
+                        paused = self._iter_results(backend, iter(result))
                     else:
                         self.store_result(backend, result)
             finally:
-                self.tasks.task_done()
+                if not paused:
+                    self._start_next()
+                    self._finish(backend)
+
+    def _resume(self, backend, iterator):
+        """
+        Continue to iterate on results of a backend paused by :meth:`_pause`.
+        """
+        with backend, self.token:
+            paused = False
+            try:
+                paused = self._iter_results(backend, iterator)
+            finally:
+                if not paused:
+                    self._start_next()
+                    self._finish(backend)
+
+    def _iter_results(self, backend, iterator):
+        """
+        Store results of *iterator*, until its end or until the call is
+        cancelled.
+
+        :returns: True if the iteration has been paused
+        """
+        try:
+            if not self.token.cancelled:
+                for subresult in iterator:
+                    self.store_result(backend, subresult)
+                    if self.token.cancelled:
+                        break
+                    if self._pause(backend, iterator):
+                        return True
+        except Exception as error:
+            self.errors.append((backend, error, get_backtrace(error)))
+        else:
+            if self.token.cancelled and hasattr(iterator, 'close'):
+                # Stop the generator now (and the pages it would fetch)
+                # instead of waiting for the garbage collector. It may raise
+                # an error to tell there were more results.
+                try:
+                    iterator.close()
+                except Exception as error:
+                    self.errors.append((backend, error, get_backtrace(error)))
+        return False
+
+    def _pause(self, backend, iterator):
+        """
+        Called after each result of an iterator: return True to stop the
+        iteration for now, and release the thread running it. Whoever pauses
+        it has to give it later to :meth:`_resume`.
+        """
+        return False
+
+    def _wait_timeout(self):
+        if self.deadline is None:
+            return self.WAIT_TIMEOUT
+        return min(self.WAIT_TIMEOUT, self.deadline - time.time())
+
+    def _expire(self):
+        """
+        Called when the deadline is reached: abandon backends which have not
+        finished, and report them as errors.
+        """
+        with self.mutex:
+            if self.timedout is not None:
+                return
+
+            self.timedout = list(self.unfinished)
+            self.cancel()
+            for backend in self.timedout:
+                self.logger.debug('%s: Abandoned because the deadline is reached', backend)
+                self.errors.append((backend, BackendTimeout('Backend has not finished before the deadline'), None))
+
+    def _iter_responses(self):
+        """
+        Yield responses as they come, until every backend has sent its end of
+        stream or the deadline is reached.
+        """
+        streams = self.count
+        while streams > 0:
+            timeout = self._wait_timeout()
+            if timeout <= 0:
+                self._expire()
+                break
 
-    def _callback_thread_run(self, callback, errback, finishback):
-        while self.tasks.unfinished_tasks or not self.responses.empty():
             try:
-                response = self.responses.get(timeout=0.1)
-                if callback:
-                    callback(response)
+                response = self.responses.get(timeout=timeout)
             except Queue.Empty:
                 continue
 
+            if isinstance(response, _EndOfStream):
+                streams -= 1
+            else:
+                yield response
+        else:
+            return
+
+        # Results which arrived before the deadline are still returned.
+        while True:
+            try:
+                response = self.responses.get_nowait()
+            except Queue.Empty:
+                return
+
+            if not isinstance(response, _EndOfStream):
+                yield response
+
+    def _callback_thread_run(self, callback, errback, finishback):
+        for response in self._iter_responses():
+            if callback:
+                callback(response)
+
         # Raise errors
         while errback and self.errors:
             errback(*self.errors.pop(0))
@@ -136,17 +361,181 @@ class BackendsCall(object):
         return thread
 
     def wait(self):
-        self.tasks.join()
+        while not self.finished.wait(max(self._wait_timeout(), 0)):
+            if self.deadline is not None and time.time() >= self.deadline:
+                self._expire()
+                break
 
         if self.errors:
             raise CallErrors(self.errors)
 
     def __iter__(self):
-        while self.tasks.unfinished_tasks or not self.responses.empty():
-            try:
-                yield self.responses.get(timeout=0.1)
-            except Queue.Empty:
-                continue
+        for response in self._iter_responses():
+            yield response
 
         if self.errors:
             raise CallErrors(self.errors)
+
+
+class AsyncBackendsCall(BackendsCall):
+    """
+    Asynchronous iterator on results of backends, for asyncio.
+
+    Backends are still called in threads, but results are sent to the event
+    loop as they come, so a coroutine can consume them without blocking::
+
+        async with weboob.ado('iter_accounts') as results:
+            async for result in results:
+                print(result)
+
+    When more than *maxsize* results are waiting to be consumed, backends are
+    paused: they release their thread, so other calls can use it, and they
+    are resumed when the consumer catches up. If the consuming task is
+    cancelled, or if it leaves the ``async with`` block (or calls
+    :meth:`aclose`) before the end, the call is cancelled too.
+
+    It requires Python 3.5 or later: on Python 2, its tests are skipped, and
+    ``tools/run_tests.sh`` runs them with Python 3.
+
+    :param loop: event loop where results are sent; default is the current one
+    :type loop: :class:`asyncio.AbstractEventLoop`
+    :param maxsize: maximum number of results waiting to be consumed
+    :type maxsize: :class:`int`
+    """
+
+    def __init__(self, backends, function, args=(), kwargs=None, loop=None, maxsize=100, **params):
+        if asyncio is None:
+            raise ImportError('Please use Python 3.5 or later to iterate asynchronously on results')
+
+        # These attributes have to be set before the call starts.
+        self.loop = loop or asyncio.get_event_loop()
+        self.maxsize = maxsize
+        self.pending = 0
+        self.paused = []
+        self.buffer = deque()
+        self.waiter = None
+        self.streams = len(backends)
+        self.expired = False
+
+        super(AsyncBackendsCall, self).__init__(backends, function, args, kwargs, **params)
+
+        if self.deadline is not None:
+            self.loop.call_later(max(self.deadline - time.time(), 0), self._on_deadline)
+
+    def cancel(self):
+        super(AsyncBackendsCall, self).cancel()
+        # Resume paused backends, so they stop and close their iterators.
+        with self.mutex:
+            paused, self.paused = self.paused, []
+        for backend, iterator in paused:
+            self._run(self._resume, backend, iterator)
+
+    def _pause(self, backend, iterator):
+        with self.mutex:
+            if self.token.cancelled or self.pending < self.maxsize:
+                return False
+            self.paused.append((backend, iterator))
+            return True
+
+    def _resume_next(self):
+        with self.mutex:
+            if not self.paused or self.pending >= self.maxsize:
+                return
+            backend, iterator = self.paused.pop(0)
+        self._run(self._resume, backend, iterator)
+
+    def _consumed(self):
+        with self.mutex:
+            self.pending -= 1
+        self._resume_next()
+
+    def _finish(self, backend):
+        super(AsyncBackendsCall, self)._finish(backend)
+        # A backend may have been resumed only to end its iteration.
+        self._resume_next()
+
+    def _push(self, item):
+        # Called in threads of backends.
+        if not isinstance(item, _EndOfStream):
+            with self.mutex:
+                self.pending += 1
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, item)
+        except RuntimeError:
+            # The consumer has left and closed its loop.
+            if not self.loop.is_closed():
+                raise
+
+    def _deliver(self, item):
+        self.buffer.append(item)
+        self._wakeup()
+
+    def _on_deadline(self):
+        if self.streams > 0:
+            self._expire()
+            self.expired = True
+            self._wakeup()
+
+    def _on_waiter_done(self, future):
+        if future.cancelled():
+            self.cancel()
+
+    def _wakeup(self):
+        if self.waiter is not None and not self.waiter.done():
+            if self._next(self.waiter):
+                self.waiter = None
+
+    def _next(self, future):
+        """
+        Set the result of *future* if possible.
+
+        :returns: False if nothing is available yet
+        """
+        while self.buffer:
+            item = self.buffer.popleft()
+            if isinstance(item, _EndOfStream):
+                self.streams -= 1
+                continue
+
+            self._consumed()
+            future.set_result(item)
+            return True
+
+        if self.streams > 0 and not self.expired:
+            return False
+
+        if self.errors:
+            future.set_exception(CallErrors(self.errors))
+        else:
+            future.set_exception(StopAsyncIteration())
+        return True
+
+    def _done_future(self, result=None):
+        future = self.loop.create_future()
+        future.set_result(result)
+        return future
+
+    def aclose(self):
+        """
+        Cancel the call, for a consumer which stops before the last result.
+
+        :rtype: awaitable
+        """
+        self.cancel()
+        return self._done_future()
+
+    def __aenter__(self):
+        return self._done_future(self)
+
+    def __aexit__(self, exc_type, exc_value, tb):
+        return self.aclose()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = self.loop.create_future()
+        if not self._next(future):
+            future.add_done_callback(self._on_waiter_done)
+            self.waiter = future
+        return future
@@ -19,14 +19,17 @@
 
 
 import os
+import time
 
-from weboob.core.bcall import BackendsCall
+from weboob.core.bcall import BackendsCall, AsyncBackendsCall
 from weboob.core.modules import ModulesLoader, RepositoryModulesLoader, ModuleLoadError
 from weboob.core.backendscfg import BackendsConfig
 from weboob.core.repositories import Repositories, PrintProgress
 from weboob.core.scheduler import Scheduler
+from weboob.core.workers import WorkerPool
 from weboob.tools.backend import Module
 from weboob.tools.config.iconfig import ConfigError
+from weboob.tools.compat import basestring, unicode
 from weboob.tools.log import getLogger
 
 
@@ -50,10 +53,17 @@ class WebNip(object):
     :type storage: :class:`weboob.tools.storage.IStorage`
     :param scheduler: what scheduler to use; default is :class:`weboob.core.scheduler.Scheduler`
     :type scheduler: :class:`weboob.core.scheduler.IScheduler`
+    :param max_workers: maximum number of threads used to call backends; default is :attr:`MAX_WORKERS`
+    :type max_workers: :class:`int`
     """
     VERSION = '1.1'
 
-    def __init__(self, modules_path=None, storage=None, scheduler=None):
+    MAX_WORKERS = 10
+    """
+    Default size of the pool of threads shared by all calls to :func:`do`.
+    """
+
+    def __init__(self, modules_path=None, storage=None, scheduler=None, max_workers=None):
         self.logger = getLogger('weboob')
         self.backend_instances = {}
         self.callbacks = {'login':   lambda backend_name, value: None,
@@ -73,6 +83,8 @@ class WebNip(object):
 
         self.storage = storage
 
+        self.workers = WorkerPool(max_workers or self.MAX_WORKERS, name='bcall')
+
     def __deinit__(self):
         self.deinit()
 
@@ -82,6 +94,10 @@ class WebNip(object):
         properly unload all correctly.
         """
         self.unload_backends()
+        if self.storage is not None:
+            # Backends may have saved their storage while they were unloaded.
+            self.storage.flush()
+        self.workers.shutdown()
 
     def build_backend(self, module_name, params=None, storage=None, name=None):
         """
@@ -203,7 +219,7 @@ class WebNip(object):
         :type module: :class:`basestring`
         :rtype: iter[:class:`weboob.tools.backend.Module`]
         """
-        for _, backend in sorted(self.backend_instances.iteritems()):
+        for _, backend in sorted(self.backend_instances.items()):
             if (caps is None or backend.has_caps(caps)) and \
                (module is None or backend.NAME == module):
                 with backend:
@@ -216,8 +232,8 @@ class WebNip(object):
 
     def do(self, function, *args, **kwargs):
         r"""
-        Do calls on loaded backends with specified arguments, in separated
-        threads.
+        Do calls on loaded backends with specified arguments, in the threads
+        of the :attr:`workers` pool.
 
         This function has two modes:
 
@@ -233,8 +249,57 @@ class WebNip(object):
         :type backends: list[:class:`str`]
         :param caps: iterate on backends which implement this caps
         :type caps: list[:class:`weboob.capabilities.base.Capability`]
+        :param max_concurrency: maximum number of backends called at the same time
+        :type max_concurrency: :class:`int`
+        :param max_results: maximum number of results returned by all backends
+                            together; once it is reached, remaining backends
+                            are cancelled
+        :type max_results: :class:`int`
+        :param timeout: number of seconds after which backends which have not
+                        finished are abandoned; they are reported in the
+                        :class:`weboob.core.bcall.CallErrors` exception
+                        with a :class:`weboob.core.bcall.BackendTimeout` error
+        :type timeout: :class:`float`
+        :param deadline: same as *timeout*, but given as an absolute time (see :func:`time.time`)
+        :type deadline: :class:`float`
         :rtype: A :class:`weboob.core.bcall.BackendsCall` object (iterable)
         """
+        # The return value MUST BE the BackendsCall instance. Please never iterate
+        # here on this object, because caller might want to use other methods, like
+        # wait() on callback_thread().
+        # Thanks a lot.
+        return self._call(BackendsCall, function, args, kwargs)
+
+    def ado(self, function, *args, **kwargs):
+        """
+        Same as :func:`do`, but results can be consumed from an asyncio
+        coroutine, as they come::
+
+            async with weboob.ado('iter_accounts') as accounts:
+                async for account in accounts:
+                    print(account)
+
+        The ``async with`` block cancels the call if the loop is left before
+        the last result.
+
+        It requires Python 3.5 or later.
+
+        Additional parameters are:
+
+        :param loop: event loop to use; default is the current one
+        :type loop: :class:`asyncio.AbstractEventLoop`
+        :param maxsize: maximum number of results waiting to be consumed,
+                        before backends are paused
+        :type maxsize: :class:`int`
+        :rtype: A :class:`weboob.core.bcall.AsyncBackendsCall` object (asynchronous iterable)
+        """
+        params = {}
+        for key in ('loop', 'maxsize'):
+            if key in kwargs:
+                params[key] = kwargs.pop(key)
+        return self._call(AsyncBackendsCall, function, args, kwargs, **params)
+
+    def _call(self, klass, function, args, kwargs, **params):
         backends = self.backend_instances.values()
         _backends = kwargs.pop('backends', None)
         if _backends is not None:
@@ -263,11 +328,17 @@ class WebNip(object):
             caps = kwargs.pop('caps')
             backends = [backend for backend in backends if backend.has_caps(caps)]
 
-        # The return value MUST BE the BackendsCall instance. Please never iterate
-        # here on this object, because caller might want to use other methods, like
-        # wait() on callback_thread().
-        # Thanks a lot.
-        return BackendsCall(backends, function, *args, **kwargs)
+        max_concurrency = kwargs.pop('max_concurrency', None)
+        max_results = kwargs.pop('max_results', None)
+        deadline = kwargs.pop('deadline', None)
+        timeout = kwargs.pop('timeout', None)
+        if timeout is not None:
+            timeout = time.time() + timeout
+            deadline = timeout if deadline is None else min(deadline, timeout)
+
+        return klass(backends, function, args, kwargs,
+                     executor=self.workers, max_concurrency=max_concurrency,
+                     limit=max_results, deadline=deadline, **params)
 
     def schedule(self, interval, function, *args):
         """
@@ -328,11 +399,13 @@ class Weboob(WebNip):
     :type backends_filename: str
     :param storage: provide a storage where backends can save data
     :type storage: :class:`weboob.tools.storage.IStorage`
+    :param max_workers: maximum number of threads used to call backends
+    :type max_workers: :class:`int`
     """
     BACKENDS_FILENAME = 'backends'
 
-    def __init__(self, workdir=None, backends_filename=None, scheduler=None, storage=None):
-        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage)
+    def __init__(self, workdir=None, backends_filename=None, scheduler=None, storage=None, max_workers=None):
+        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage, max_workers=max_workers)
 
         # Create WORKDIR
         if workdir is not None:
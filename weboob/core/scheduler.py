@@ -20,12 +20,12 @@
 
 from __future__ import print_function
 
-from threading import Event, RLock
-try:
-    from threading import _Timer as Timer
-except ImportError:
-    from threading import Timer
+import heapq
+import random
+import time
+from threading import Condition, Event, RLock, Thread, current_thread
 
+from weboob.core.workers import WorkerPool
 from weboob.tools.log import getLogger
 from weboob.tools.misc import get_backtrace
 
@@ -50,81 +50,201 @@ class IScheduler(object):
         raise NotImplementedError()
 
 
-class RepeatedTimer(Timer):
-    def run(self):
-        while not self.finished.isSet():
-            try:
-                self.function(*self.args, **self.kwargs)
-            except Exception:
-                # do not stop timer because of an exception
-                print(get_backtrace())
-            self.finished.wait(self.interval)
-        self.finished.set()
+class Job(object):
+    """
+    A function scheduled by :class:`Scheduler`.
+
+    :param id: identifier returned to the caller
+    :param interval: delay between two calls, in seconds
+    :param function: callable to run
+    :param args: arguments given to function
+    :param repeat: if True, the function is called again every interval
+    """
+
+    def __init__(self, id, interval, function, args, repeat=False):
+        self.id = id
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.repeat = repeat
+        self.cancelled = False
+
+    def __repr__(self):
+        return '<Job %d %r>' % (self.id, self.function)
 
 
 class Scheduler(IScheduler):
-    def __init__(self):
+    """
+    Run functions after a delay or periodically.
+
+    Jobs are kept in a heap ordered by their due date, a single timer thread
+    waits for the earliest one and gives it to a bounded pool of workers.
+
+    A repeated job is called immediately, then *interval* seconds after the
+    end of each call, so it never runs concurrently with itself.
+
+    :param max_workers: maximum number of jobs running at the same time
+    :type max_workers: :class:`int`
+    :param jitter: maximum random delay, in seconds, added to each due date,
+                   to spread jobs registered at the same time
+    :type jitter: :class:`float`
+    :param misfire_grace: if a job starts more than this number of seconds
+                          after its due date (for example because all
+                          workers were busy), this run is skipped; by
+                          default late jobs are always run
+    :type misfire_grace: :class:`float`
+    """
+
+    MAX_WORKERS = 10
+    """
+    Default maximum number of jobs running at the same time.
+    """
+
+    WAIT_TIMEOUT = 1
+    """
+    On Python 2, a wait without timeout can't be interrupted by a signal, so
+    :func:`run` waits by slices of this number of seconds.
+    """
+
+    def __init__(self, max_workers=None, jitter=0, misfire_grace=None):
         self.logger = getLogger('scheduler')
         self.mutex = RLock()
         self.stop_event = Event()
         self.count = 0
-        self.queue = {}
+        self.jitter = jitter
+        self.misfire_grace = misfire_grace
+        self.workers = WorkerPool(max_workers or self.MAX_WORKERS, name='scheduler')
+
+        self._cond = Condition(self.mutex)
+        self._heap = []
+        self._jobs = {}
+        self._cancelled = 0
+        self._running = 0
+        self._seq = 0
+        self._thread = None
 
     def schedule(self, interval, function, *args):
-        return self._schedule(Timer, interval, self._schedule_callback, function, *args)
+        return self._schedule(interval, function, args, False)
 
     def repeat(self, interval, function, *args):
-        return self._schedule(RepeatedTimer, interval, self._repeat_callback, function, *args)
+        return self._schedule(interval, function, args, True)
 
-    def _schedule(self, klass, interval, meta_func, function, *args):
+    def _schedule(self, interval, function, args, repeat):
         if self.stop_event.isSet():
             return
 
         with self.mutex:
             self.count += 1
-            self.logger.debug('function "%s" will be called in %s seconds' % (function.__name__, interval))
-            timer = klass(interval, meta_func, (self.count, interval, function, args))
-            self.queue[self.count] = timer
-            timer.start()
-            return self.count
+            job = Job(self.count, interval, function, args, repeat)
+            self._jobs[job.id] = job
+            if repeat:
+                self.logger.debug('function "%s" will be called every %s seconds' % (function.__name__, interval))
+                self._push(job, time.time())
+            else:
+                self.logger.debug('function "%s" will be called in %s seconds' % (function.__name__, interval))
+                self._push(job, time.time() + interval)
 
-    def _schedule_callback(self, count, interval, function, args):
-        with self.mutex:
-            self.queue.pop(count)
-        return function(*args)
+            if self._thread is None:
+                self._thread = Thread(target=self._timer_run, name='scheduler')
+                self._thread.daemon = True
+                self._thread.start()
+            return job.id
 
-    def _repeat_callback(self, count, interval, function, args):
-        function(*args)
-        with self.mutex:
-            try:
-                e = self.queue[count]
-            except KeyError:
-                return
+    def _push(self, job, when):
+        if self.jitter:
+            when += random.uniform(0, self.jitter)
+        self._seq += 1
+        entry = (when, self._seq, job)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            # The timer thread has to wait less than expected.
+            self._cond.notify()
+
+    def _timer_run(self):
+        with self._cond:
+            while not self.stop_event.isSet():
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                when = self._heap[0][0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                when, _, job = heapq.heappop(self._heap)
+                if not job.repeat:
+                    self._jobs.pop(job.id, None)
+                self._running += 1
+                self.workers.submit(self._run_job, (job, when))
+            self._thread = None
+
+    def _run_job(self, job, when):
+        try:
+            late = time.time() - when
+            if job.cancelled:
+                pass
+            elif self.misfire_grace is not None and late > self.misfire_grace:
+                self.logger.warning('function "%s" is %.1f seconds late, skipped' % (job.function.__name__, late))
             else:
-                self.logger.debug('function "%s" will be called in %s seconds' % (function.__name__, e.interval))
+                try:
+                    job.function(*job.args)
+                except Exception:
+                    # do not stop repeated jobs because of an exception
+                    self.logger.error(get_backtrace())
+        finally:
+            with self._cond:
+                self._running -= 1
+                if job.repeat and not job.cancelled and not self.stop_event.isSet():
+                    self.logger.debug('function "%s" will be called in %s seconds' % (job.function.__name__, job.interval))
+                    self._push(job, time.time() + job.interval)
+                self._cond.notify_all()
 
     def cancel(self, ev):
         with self.mutex:
             try:
-                e = self.queue.pop(ev)
+                job = self._jobs.pop(ev)
             except KeyError:
                 return False
-            e.cancel()
-            self.logger.debug('scheduled function "%s" is canceled' % e.function.__name__)
+            job.cancelled = True
+            self._cancelled += 1
+            # Cancelled jobs are removed from the heap lazily, when they reach
+            # the top. Rebuild it when they are too many, so the cost stays
+            # amortized O(log n).
+            if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+            self.logger.debug('scheduled function "%s" is canceled' % job.function.__name__)
             return True
 
     def _wait_to_stop(self):
+        thread = self._thread
         self.want_stop()
-        with self.mutex:
-            for e in self.queue.itervalues():
-                e.cancel()
-                e.join()
-            self.queue = {}
+        with self._cond:
+            while self._running > 0:
+                self._cond.wait(self.WAIT_TIMEOUT)
+        if thread is not None and thread is not current_thread():
+            thread.join()
+        self.workers.join()
+
+    def _wait(self, timeout):
+        """
+        Called in loop by :func:`run` until the scheduler is stopped. It can
+        be overloaded to process other events in the main thread, as long as
+        it returns after at most *timeout* seconds.
+        """
+        self.stop_event.wait(timeout)
 
     def run(self):
         try:
-            while True:
-                self.stop_event.wait(0.1)
+            while not self.stop_event.isSet():
+                self._wait(self.WAIT_TIMEOUT)
         except KeyboardInterrupt:
             self._wait_to_stop()
             raise
@@ -134,9 +254,13 @@ class Scheduler(IScheduler):
 
     def want_stop(self):
         self.stop_event.set()
-        with self.mutex:
-            for t in self.queue.itervalues():
-                t.cancel()
-                # Contrary to _wait_to_stop(), don't call t.join
-                # because want_stop() have to be non-blocking.
-            self.queue = {}
+        with self._cond:
+            for job in self._jobs.itervalues():
+                job.cancelled = True
+            # Contrary to _wait_to_stop(), don't wait for running jobs
+            # because want_stop() have to be non-blocking.
+            self._jobs = {}
+            self._heap = []
+            self._cancelled = 0
+            self._cond.notify_all()
+        self.workers.shutdown()
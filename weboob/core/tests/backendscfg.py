@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from weboob.core.backendscfg import BackendAlreadyExists, BackendsConfig
+
+
+class BackendsConfigTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'backends')
+        self.config = BackendsConfig(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_backends(self):
+        self.config.add_backend('foo', 'foomod', {'login': u'caf\xe9'})
+        self.config.add_backend('bar', 'barmod', {})
+        self.assertRaises(BackendAlreadyExists, self.config.add_backend, 'foo', 'foomod', {})
+        self.assertEqual(oct(os.stat(self.path).st_mode & 0o777), oct(0o600))
+        self.assertEqual(os.listdir(self.tmpdir), ['backends'])
+
+        self.assertTrue(self.config.backend_exists('foo'))
+        self.assertEqual(self.config.get_backend('foo'), ('foomod', {'login': 'caf\xc3\xa9'}))
+        self.config.get_backend('foo')[1]['login'] = 'changed'
+        self.assertEqual(list(self.config.iter_backends()),
+                         [('foo', 'foomod', {'login': 'caf\xc3\xa9'}), ('bar', 'barmod', {})])
+
+        self.assertTrue(self.config.remove_backend('foo'))
+        self.assertFalse(self.config.remove_backend('foo'))
+        self.assertRaises(KeyError, self.config.get_backend, 'foo')
+        self.assertEqual(BackendsConfig(self.path).get_backend('bar'), ('barmod', {}))
+
+    def test_reload(self):
+        self.config.add_backend('foo', 'foomod', {})
+        config = self.config._read()
+        self.assertIs(self.config._read(), config)
+
+        # Changed by an other process, with the old field name.
+        with open(self.path, 'a') as f:
+            f.write('\n[bar]\n_backend = barmod\n')
+        self.assertEqual([name for name, module, params in self.config.iter_backends()], ['foo', 'bar'])
+        self.assertEqual(self.config.get_backend('bar'), ('barmod', {}))
+        with open(self.path) as f:
+            self.assertIn('_module = barmod', f.read())
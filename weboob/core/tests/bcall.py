@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from unittest import SkipTest, TestCase
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from weboob.core.bcall import BackendTimeout, CallErrors
+from weboob.core.ouiboube import WebNip
+from weboob.core.workers import WorkerPool
+
+
+class FakeBackend(object):
+    def __init__(self, name, delay=0):
+        self.name = name
+        self.lock = threading.RLock()
+        self.delay = delay
+        self.produced = 0
+        self.threads = set()
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, t, v, tb):
+        self.lock.release()
+
+    def iter_values(self, n=3):
+        self.threads.add(threading.current_thread().name)
+        for i in range(n):
+            self.produced = i + 1
+            if self.delay:
+                time.sleep(self.delay)
+            yield u'%s-%d' % (self.name, i)
+
+    def fail(self):
+        raise ValueError(self.name)
+
+
+class BackendsCallTest(TestCase):
+    def setUp(self):
+        self.weboob = WebNip(modules_path=False, max_workers=3)
+        for i in range(8):
+            backend = FakeBackend('backend%d' % i)
+            self.weboob.backend_instances[backend.name] = backend
+
+    def tearDown(self):
+        self.weboob.workers.shutdown()
+
+    def test_results(self):
+        results = sorted(self.weboob.do('iter_values', 2))
+        self.assertEqual(len(results), 16)
+        self.assertEqual(results[:2], [u'backend0-0', u'backend0-1'])
+
+    def test_pool_is_bounded_and_reused(self):
+        before = threading.active_count()
+        for i in range(5):
+            list(self.weboob.do('iter_values'))
+        self.assertTrue(threading.active_count() <= before + 3)
+        names = set()
+        for backend in self.weboob.backend_instances.values():
+            names |= backend.threads
+        self.assertTrue(len(names) <= 3)
+
+    def test_no_backends(self):
+        self.assertEqual(list(self.weboob.do('iter_values', backends=[])), [])
+        self.weboob.do('iter_values', backends=[]).wait()
+
+    def test_wait(self):
+        self.weboob.do('iter_values').wait()
+        self.assertRaises(CallErrors, self.weboob.do('fail').wait)
+
+    def test_errors(self):
+        self.assertRaises(CallErrors, list, self.weboob.do('fail'))
+
+    def test_max_concurrency(self):
+        running = [0]
+        seen = []
+        lock = threading.Lock()
+
+        def func(backend):
+            with lock:
+                running[0] += 1
+                seen.append(running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return backend.name
+
+        results = list(self.weboob.do(func, max_concurrency=2))
+        self.assertEqual(len(results), 8)
+        self.assertTrue(max(seen) <= 2)
+
+    def test_max_results(self):
+        for backend in self.weboob.backend_instances.values():
+            backend.delay = 0.001
+
+        results = list(self.weboob.do('iter_values', 1000, max_results=20))
+        self.assertEqual(len(results), 20)
+        # every backend has been stopped long before the end
+        for backend in self.weboob.backend_instances.values():
+            self.assertTrue(backend.produced < 100)
+
+    def test_cancelled_generator_is_closed(self):
+        closed = []
+
+        def func(backend):
+            try:
+                for i in range(1000):
+                    yield i
+            except GeneratorExit:
+                closed.append(backend.name)
+                raise
+
+        results = list(self.weboob.do(func, max_results=5, backends=['backend0']))
+        self.assertEqual(results, list(range(5)))
+        self.assertEqual(closed, ['backend0'])
+
+    def test_timeout(self):
+        slow = self.weboob.backend_instances['backend1']
+        slow.delay = 0.05
+
+        results = []
+        start = time.time()
+        try:
+            for result in self.weboob.do('iter_values', 100, timeout=0.2, backends=['backend0', 'backend1']):
+                results.append(result)
+        except CallErrors as e:
+            self.assertEqual(e.timedout, [slow])
+            self.assertTrue(isinstance(e.errors[0][1], BackendTimeout))
+        else:
+            self.fail('CallErrors not raised')
+
+        self.assertTrue(time.time() - start < 1)
+        # partial results of the slow backend are returned
+        self.assertTrue(u'backend1-0' in results)
+        self.assertEqual(len([r for r in results if r.startswith('backend0')]), 100)
+
+    def test_wait_timeout(self):
+        self.weboob.backend_instances['backend0'].delay = 0.05
+        call = self.weboob.do('iter_values', 100, timeout=0.1, backends=['backend0'])
+        self.assertRaises(CallErrors, call.wait)
+        self.assertEqual(call.timedout, [self.weboob.backend_instances['backend0']])
+
+    def test_nested_call(self):
+        # Calls made from a worker must not wait for the busy workers.
+        nested = FakeBackend('nested')
+
+        def func(backend):
+            return list(self.weboob.do('iter_values', 1, backends=[nested]))
+
+        results = list(self.weboob.do(func))
+        self.assertEqual(results, [u'nested-0'] * 8)
+
+
+class AsyncBackendsCallTest(TestCase):
+    def setUp(self):
+        if asyncio is None:
+            raise SkipTest('asyncio is not available')
+
+        self.loop = asyncio.new_event_loop()
+        self.weboob = WebNip(modules_path=False, max_workers=3)
+        for i in range(4):
+            backend = FakeBackend('backend%d' % i)
+            self.weboob.backend_instances[backend.name] = backend
+
+    def tearDown(self):
+        self.weboob.workers.shutdown()
+        self.loop.close()
+
+    def consume(self, call, count=None):
+        # equivalent of "async with" and "async for", without the syntax
+        # which is not supported by Python 2.
+        results = []
+        iterator = self.loop.run_until_complete(call.__aenter__()).__aiter__()
+        try:
+            while count is None or len(results) < count:
+                try:
+                    results.append(self.loop.run_until_complete(iterator.__anext__()))
+                except StopAsyncIteration:
+                    break
+        finally:
+            self.loop.run_until_complete(call.__aexit__(None, None, None))
+        return results
+
+    def test_results(self):
+        results = self.consume(self.weboob.ado('iter_values', 10, loop=self.loop, maxsize=2))
+        self.assertEqual(len(results), 40)
+
+    def test_errors(self):
+        self.assertRaises(CallErrors, self.consume, self.weboob.ado('fail', loop=self.loop))
+
+    def test_close(self):
+        call = self.weboob.ado('iter_values', 1000, loop=self.loop, maxsize=2)
+        self.assertEqual(len(self.consume(call, 3)), 3)
+        # backends waiting for the consumer are released and stop
+        self.assertTrue(call.finished.wait(1))
+        self.assertTrue(call.token.cancelled)
+
+    def test_slow_consumer(self):
+        # backends waiting for the consumer do not hold workers of the pool
+        call = self.weboob.ado('iter_values', 1000, loop=self.loop, maxsize=2)
+        results = list(self.weboob.do('iter_values', 10, timeout=5))
+        self.assertEqual(len(results), 40)
+        self.assertTrue(all(backend.produced < 1000 for backend in self.weboob.backend_instances.values()))
+
+        self.assertEqual(len(self.consume(call, 3)), 3)
+        self.assertTrue(call.finished.wait(1))
+
+    def test_slow_consumer_timeout(self):
+        call = self.weboob.ado('iter_values', 1000, timeout=0.1, loop=self.loop, maxsize=2)
+        # paused backends are stopped at the deadline
+        self.loop.run_until_complete(asyncio.sleep(0.2))
+        self.assertTrue(call.finished.wait(1))
+        self.assertEqual(len(call.errors), 4)
+
+    def test_timeout(self):
+        self.weboob.backend_instances['backend0'].delay = 0.05
+        try:
+            self.consume(self.weboob.ado('iter_values', 100, timeout=0.1, loop=self.loop))
+        except CallErrors as e:
+            self.assertEqual(e.timedout, [self.weboob.backend_instances['backend0']])
+        else:
+            self.fail('CallErrors not raised')
+
+
+class WorkerPoolTest(TestCase):
+    def test_affinity(self):
+        pool = WorkerPool(4)
+        order = []
+        done = threading.Event()
+
+        def func(i):
+            order.append(i)
+            time.sleep(0.001)
+            if i == 9:
+                done.set()
+
+        for i in range(10):
+            pool.submit(func, (i,), affinity='key')
+        done.wait(5)
+        pool.shutdown()
+        self.assertEqual(order, list(range(10)))
+
+    def test_cancel(self):
+        pool = WorkerPool(1)
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        pool.submit(lambda: (started.set(), release.wait(5)))
+        started.wait(5)
+        task = pool.submit(results.append, (1,))
+        self.assertTrue(task.cancel())
+        release.set()
+        pool.submit(results.append, (2,))
+        time.sleep(0.05)
+        pool.shutdown()
+        self.assertEqual(results, [2])
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from unittest import TestCase
+
+from weboob.core.scheduler import Scheduler
+
+
+class SchedulerTest(TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(max_workers=2)
+        self.calls = []
+
+    def tearDown(self):
+        self.scheduler._wait_to_stop()
+
+    def record(self, value):
+        self.calls.append(value)
+
+    def wait_for(self, n, timeout=2):
+        end = time.time() + timeout
+        while len(self.calls) < n and time.time() < end:
+            time.sleep(0.01)
+
+    def test_schedule(self):
+        self.scheduler.schedule(0.1, self.record, 'late')
+        self.scheduler.schedule(0.05, self.record, 'soon')
+        self.wait_for(2)
+        self.assertEqual(self.calls, ['soon', 'late'])
+
+    def test_repeat(self):
+        self.scheduler.repeat(0.01, self.record, 'x')
+        self.wait_for(5)
+        self.assertEqual(len(self.calls), 5)
+
+    def test_cancel(self):
+        ev = self.scheduler.schedule(0.05, self.record, 'x')
+        self.assertTrue(self.scheduler.cancel(ev))
+        self.assertFalse(self.scheduler.cancel(ev))
+        ev = self.scheduler.repeat(0.01, self.record, 'y')
+        self.wait_for(1)
+        self.assertTrue(self.scheduler.cancel(ev))
+        time.sleep(0.1)
+        n = len(self.calls)
+        time.sleep(0.1)
+        self.assertEqual(n, len(self.calls))
+        self.assertNotIn('x', self.calls)
+
+    def test_single_thread(self):
+        for i in range(100):
+            self.scheduler.schedule(10, self.record, i)
+        # one timer thread, workers are spawned when jobs are due
+        self.assertTrue(self.scheduler._thread.is_alive())
+        self.assertEqual(len(self.scheduler.workers._threads), 0)
+
+    def test_misfire(self):
+        self.scheduler.misfire_grace = 0.05
+        block = threading.Event()
+        self.scheduler.schedule(0, block.wait, 2)
+        self.scheduler.schedule(0, block.wait, 2)
+        self.scheduler.schedule(0, self.record, 'missed')
+        time.sleep(0.2)
+        block.set()
+        self.scheduler.schedule(0, self.record, 'run')
+        self.wait_for(1)
+        time.sleep(0.05)
+        self.assertEqual(self.calls, ['run'])
+
+    def test_run_returns_when_stopped(self):
+        self.scheduler.schedule(0.05, self.scheduler.want_stop)
+        self.assertTrue(self.scheduler.run())
+        self.assertIsNone(self.scheduler.schedule(0, self.record, 'x'))
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import deque
+from threading import Condition, Lock, Thread, current_thread, local
+
+from weboob.tools.log import getLogger
+from weboob.tools.misc import get_backtrace
+
+
+__all__ = ['WorkerPool', 'Task']
+
+
+class Task(object):
+    """
+    A unit of work submitted to a :class:`WorkerPool`.
+
+    :param function: callable to run
+    :param args: positional arguments given to function
+    :param kwargs: keyword arguments given to function
+    :param affinity: optional key; tasks sharing the same key are run one
+                     after the other, in submission order
+    """
+
+    def __init__(self, function, args=(), kwargs=None, affinity=None):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.affinity = affinity
+        self.started = False
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancel the task if it has not been started yet.
+
+        :returns: True if the task will not be run
+        :rtype: :class:`bool`
+        """
+        if self.started:
+            return False
+        self.cancelled = True
+        return True
+
+    def run(self):
+        return self.function(*self.args, **self.kwargs)
+
+
+class WorkerPool(object):
+    """
+    Bounded pool of long-lived threads.
+
+    Threads are spawned on demand up to *max_workers* and are reused between
+    submissions. Tasks submitted with the same *affinity* key are never run
+    concurrently: they are queued and run in order by the same worker, which
+    avoids occupying several threads waiting on the same backend lock.
+
+    :param max_workers: maximum number of threads
+    :type max_workers: :class:`int`
+    :param name: name used for threads and logger
+    :type name: :class:`str`
+    """
+
+    def __init__(self, max_workers=10, name='workers'):
+        assert max_workers > 0
+        self.max_workers = max_workers
+        self.name = name
+        self.logger = getLogger(name)
+
+        self._cond = Condition(Lock())
+        self._ready = deque()
+        self._pending = {}
+        self._threads = set()
+        self._idle = 0
+        self._shutdown = False
+        self._local = local()
+
+    def submit(self, function, args=(), kwargs=None, affinity=None):
+        """
+        Schedule a call of *function* in a worker thread.
+
+        :param function: callable to run
+        :param args: positional arguments
+        :type args: :class:`tuple`
+        :param kwargs: keyword arguments
+        :type kwargs: :class:`dict`
+        :param affinity: optional key to serialize related tasks
+        :rtype: :class:`Task`
+        """
+        task = Task(function, args, kwargs, affinity)
+        with self._cond:
+            # The pool can be used again after a shutdown(), new workers are
+            # spawned on demand.
+            self._shutdown = False
+
+            if affinity is None:
+                self._ready.append(task)
+            elif affinity in self._pending:
+                self._pending[affinity].append(task)
+            else:
+                self._pending[affinity] = deque([task])
+                self._ready.append(affinity)
+
+            if self._idle > 0:
+                # Waked up workers are not counted as idle anymore, so a
+                # burst of submissions spawns new threads if needed.
+                self._idle -= 1
+                self._cond.notify()
+            elif len(self._threads) < self.max_workers:
+                thread = Thread(target=self._run, name='%s-%d' % (self.name, len(self._threads)))
+                thread.daemon = True
+                self._threads.add(thread)
+                thread.start()
+        return task
+
+    def in_worker(self):
+        """
+        Return True if the current thread is one of the pool's workers.
+        """
+        return getattr(self._local, 'worker', False)
+
+    def shutdown(self):
+        """
+        Stop workers once the queued tasks are processed.
+
+        This call does not block.
+        """
+        with self._cond:
+            self._shutdown = True
+            self._idle = 0
+            self._cond.notify_all()
+
+    def join(self):
+        """
+        Wait for workers to exit, after :func:`shutdown` has been called.
+        """
+        with self._cond:
+            threads = [thread for thread in self._threads if thread is not current_thread()]
+        for thread in threads:
+            thread.join()
+
+    def _next(self):
+        with self._cond:
+            while not self._ready:
+                if self._shutdown:
+                    return None, None
+                self._idle += 1
+                self._cond.wait()
+
+            item = self._ready.popleft()
+            if isinstance(item, Task):
+                return None, item
+            return item, self._pending[item].popleft()
+
+    def _release(self, key):
+        with self._cond:
+            if self._pending[key]:
+                self._ready.append(key)
+                if self._idle > 0:
+                    self._idle -= 1
+                    self._cond.notify()
+            else:
+                del self._pending[key]
+
+    def _run(self):
+        self._local.worker = True
+        try:
+            while True:
+                key, task = self._next()
+                if task is None:
+                    return
+
+                try:
+                    if not task.cancelled:
+                        task.started = True
+                        task.run()
+                except Exception:
+                    self.logger.error(get_backtrace())
+                finally:
+                    if key is not None:
+                        self._release(key)
+        finally:
+            with self._cond:
+                self._threads.discard(current_thread())
+
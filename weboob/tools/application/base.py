@@ -24,6 +24,7 @@ import logging
 import optparse
 from optparse import OptionGroup, OptionParser
 from datetime import datetime
+from itertools import islice
 import locale
 import os
 import sys
@@ -102,6 +103,8 @@ class Application(object):
     COPYRIGHT = None
     # Verbosity of DEBUG
     DEBUG_FILTER = 2
+    # Maximum number of results given at once to Module.fillobjs()
+    FILL_CHUNK_SIZE = 10
 
     stdin = sys.stdin
     stdout = sys.stdout
@@ -164,12 +167,17 @@ class Application(object):
         self._parser.add_option('-b', '--backends', help='what backend(s) to enable (comma separated)')
         self._parser.add_option('-e', '--exclude-backends', help='what backend(s) to exclude (comma separated)')
         self._parser.add_option('-I', '--insecure', action='store_true', help='do not validate SSL')
+        self._parser.add_option('--http-cache', metavar='DIR', help='cache HTTP responses in this directory')
         logging_options = OptionGroup(self._parser, 'Logging Options')
         logging_options.add_option('-d', '--debug', action='count', help='display debug messages. Set up it twice to more verbosity')
         logging_options.add_option('-q', '--quiet', action='store_true', help='display only error messages')
         logging_options.add_option('-v', '--verbose', action='store_true', help='display info messages')
         logging_options.add_option('--logging-file', action='store', type='string', dest='logging_file', help='file to save logs')
         logging_options.add_option('-a', '--save-responses', action='store_true', help='save every response')
+        logging_options.add_option('--record', metavar='DIR',
+                                   help='record HTTP exchanges of each backend in a cassette file in this directory')
+        logging_options.add_option('--replay', metavar='DIR',
+                                   help='replay HTTP exchanges recorded with --record, without network access')
         self._parser.add_option_group(logging_options)
         self._parser.add_option('--shell-completion', action='store_true', help=optparse.SUPPRESS_HELP)
         self._is_default_count = True
@@ -189,8 +197,10 @@ class Application(object):
     def deinit(self):
         self.weboob.want_stop()
         self.weboob.deinit()
+        if self.storage is not None:
+            self.storage.storage.flush()
 
-    def create_storage(self, path=None, klass=None, localonly=False):
+    def create_storage(self, path=None, klass=None, localonly=False, buffered=False):
         """
         Create a storage object.
 
@@ -200,10 +210,14 @@ class Application(object):
         :type klass: :class:`weboob.tools.storage.IStorage`
         :param localonly: If True, do not set it on the :class:`Weboob` object.
         :type localonly: :class:`bool`
+        :param buffered: If True, saves are delayed and coalesced by a
+                         :class:`weboob.tools.storage.BufferedStorage`, and
+                         written at last by :func:`deinit`.
+        :type buffered: :class:`bool`
         :rtype: :class:`weboob.tools.storage.IStorage`
         """
+        from weboob.tools.storage import BufferedStorage, StandardStorage
         if klass is None:
-            from weboob.tools.storage import StandardStorage
             klass = StandardStorage
 
         if path is None:
@@ -212,6 +226,8 @@ class Application(object):
             path = os.path.join(self.CONFDIR, path)
 
         storage = klass(path)
+        if buffered:
+            storage = BufferedStorage(storage)
         self.storage = ApplicationStorage(self.APPNAME, storage)
         self.storage.load(self.STORAGE)
 
@@ -281,24 +297,82 @@ class Application(object):
             backend.fillobj(obj, fields)
         return obj
 
+    def _do_complete_objs(self, backend, fields, objs):
+        objs = list(objs)
+        indexes = []
+        for i, obj in enumerate(objs):
+            if obj and isinstance(obj, BaseObject):
+                obj.backend = backend.name
+                indexes.append(i)
+
+        if indexes and (fields is None or len(fields) > 0):
+            filled = backend.fillobjs([objs[i] for i in indexes], fields)
+            for i, obj in zip(indexes, filled):
+                obj.backend = backend.name
+                objs[i] = obj
+        return objs
+
     def _do_complete_iter(self, backend, count, fields, res):
         modif = 0
-
-        for i, sub in enumerate(res):
-            sub = self._do_complete_obj(backend, fields, sub)
-            if self.condition and self.condition.limit and \
-               self.condition.limit == i:
+        i = 0
+        res = iter(res)
+
+        while True:
+            # Results of backends which can fill several objects at once
+            # are filled by chunks, but without filling much more results
+            # than the ones which are needed. Others are filled and returned
+            # one by one, as soon as they are listed.
+            size = self.FILL_CHUNK_SIZE if backend.BULK_OBJECTS else 1
+            if count:
+                size = min(size, count + modif - i)
+            if self.condition and self.condition.limit:
+                size = min(size, self.condition.limit - i)
+            chunk = list(islice(res, max(size, 1)))
+            if not chunk:
                 return
 
-            if self.condition and not self.condition.is_valid(sub):
-                modif += 1
-            else:
-                if count and i - modif == count:
-                    if self._is_default_count:
-                        raise MoreResultsAvailable()
-                    else:
-                        return
-                yield sub
+            filled = iter(self._do_complete_objs(backend, fields, chunk))
+            for sub in filled:
+                if self.condition and self.condition.limit and \
+                   self.condition.limit == i:
+                    return
+
+                if self.condition and not self.condition.is_valid(sub):
+                    modif += 1
+                else:
+                    if count and i - modif == count:
+                        if self._is_default_count:
+                            raise MoreResultsAvailable()
+                        else:
+                            return
+                    try:
+                        yield sub
+                    except GeneratorExit:
+                        # The call has been cancelled, because enough results
+                        # have been returned by all backends or the deadline
+                        # is reached. Only tell there are more results if
+                        # this backend really had another one.
+                        if self._is_default_count and self._has_more(filled, res):
+                            raise MoreResultsAvailable()
+                        raise
+                i += 1
+
+    def _has_more(self, *iterators):
+        """
+        Tell if one of the iterators has another item, by consuming it.
+
+        As it is used once a call has been cancelled, an error while getting
+        the item is not reported.
+        """
+        for it in iterators:
+            try:
+                next(it)
+            except StopIteration:
+                continue
+            except Exception:
+                return False
+            return True
+        return False
 
     def _do_complete(self, backend, count, selected_fields, function, *args, **kwargs):
         assert count is None or count > 0
@@ -376,6 +450,11 @@ class Application(object):
             level = logging.WARNING
         if self.options.insecure:
             log_settings['ssl_insecure'] = True
+        if self.options.http_cache:
+            log_settings['http_cache_dirname'] = os.path.expanduser(self.options.http_cache)
+        if self.options.record or self.options.replay:
+            log_settings['cassette_mode'] = 'record' if self.options.record else 'replay'
+            log_settings['cassettes_dirname'] = os.path.expanduser(self.options.record or self.options.replay)
 
         # this only matters to developers
         if not self.options.debug and not self.options.save_responses:
@@ -30,6 +30,7 @@ import os
 from weboob.capabilities import UserError
 from weboob.capabilities.account import CapAccount, Account, AccountRegisterError
 from weboob.core.backendscfg import BackendAlreadyExists
+from weboob.core.bcall import BackendTimeout
 from weboob.core.modules import ModuleLoadError
 from weboob.core.repositories import ModuleInstallError
 from weboob.exceptions import BrowserUnavailable, BrowserIncorrectPassword, BrowserForbidden, BrowserSSLError
@@ -559,6 +560,8 @@ class ConsoleApplication(Application):
             print(u'Error(%s): %s' % (backend.name, to_unicode(error)), file=self.stderr)
         elif isinstance(error, MoreResultsAvailable):
             print(u'Hint: There are more results for backend %s' % (backend.name), file=self.stderr)
+        elif isinstance(error, BackendTimeout):
+            print(u'Error(%s): timed out, results may be incomplete' % backend.name, file=self.stderr)
         else:
             print(u'Bug(%s): %s' % (backend.name, to_unicode(error)), file=self.stderr)
 
@@ -139,8 +139,10 @@ class ReplApplication(Cmd, ConsoleApplication):
         results_options = OptionGroup(self._parser, 'Results Options')
         results_options.add_option('-c', '--condition', help='filter result items to display given a boolean expression. See CONDITION section for the syntax')
         results_options.add_option('-n', '--count', type='int',
-                                   help='limit number of results (from each backends)')
+                                   help='limit number of results')
         results_options.add_option('-s', '--select', help='select result item keys to display (comma separated)')
+        results_options.add_option('--timeout', type='float',
+                                   help='abandon backends which have not finished after this number of seconds')
         self._parser.add_option_group(results_options)
 
         formatting_options = OptionGroup(self._parser, 'Formatting Options')
@@ -370,6 +372,20 @@ class ReplApplication(Cmd, ConsoleApplication):
                 print('Warning: some selected fields will not be displayed by the formatter. Fallback to another. Hint: use option -f', file=self.stderr)
                 self.formatter = self.formatters_loader.build_formatter(ReplApplication.DEFAULT_FORMATTER)
 
+        # The count and the LIMIT of the condition are also applied on the
+        # results of all backends together, so they are cancelled as soon as
+        # enough results are returned.
+        if 'max_results' not in kwargs:
+            limits = [self.options.count]
+            if self.condition is not None:
+                limits.append(self.condition.limit)
+            limits = [limit for limit in limits if limit]
+            if limits:
+                kwargs['max_results'] = min(limits)
+
+        if self.options.timeout and 'timeout' not in kwargs:
+            kwargs['timeout'] = self.options.timeout
+
         return self.weboob.do(self._do_complete, self.options.count, fields, function, *args, **kwargs)
 
     # -- command tools ------------
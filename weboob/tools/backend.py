@@ -19,6 +19,7 @@
 
 
 import os
+from datetime import datetime
 from threading import RLock
 from copy import copy
 
@@ -26,10 +27,104 @@ from weboob.capabilities.base import BaseObject, FieldNotFound, \
     Capability, NotLoaded, NotAvailable
 from weboob.tools.misc import iter_fields
 from weboob.tools.log import getLogger
+from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.value import ValuesDict
 
 
-__all__ = ['BackendStorage', 'BackendConfig', 'Module']
+__all__ = ['SeenSet', 'BackendStorage', 'BackendConfig', 'Module']
+
+
+class SeenSet(object):
+    """
+    Set of identifiers of objects already seen by a backend, like read
+    messages, kept in its storage.
+
+    Identifiers are stored with the date they have been added, so the oldest
+    ones can be forgotten after *ttl*, or when there are more than
+    *max_size* of them. Lists of identifiers stored by previous versions of
+    modules are converted.
+
+    Get it with :func:`BackendStorage.get_seen`.
+
+    :param storage: storage of the backend
+    :type storage: :class:`BackendStorage`
+    :param key: where the identifiers are stored
+    :type key: :class:`str`
+    :param ttl: maximum age of identifiers
+    :type ttl: :class:`datetime.timedelta`
+    :param max_size: maximum number of identifiers
+    :type max_size: :class:`int`
+    """
+
+    def __init__(self, storage, key='seen', ttl=None, max_size=None):
+        self.storage = storage
+        self.key = key
+        self.ttl = ttl
+        self.max_size = max_size
+        self.modified = False
+
+        seen = storage.get(key, default=None)
+        if not isinstance(seen, dict):
+            now = datetime.now()
+            seen = dict((id, now) for id in seen or ())
+            storage.set(key, seen)
+            self.modified = True
+        self._seen = seen
+        self.purge()
+
+    def __contains__(self, id):
+        return id in self._seen
+
+    def __iter__(self):
+        return iter(self._seen)
+
+    def __len__(self):
+        return len(self._seen)
+
+    def add(self, id):
+        """
+        Add an identifier, or refresh its date if it is already seen.
+        """
+        self._seen[id] = datetime.now()
+        self.modified = True
+
+    def discard(self, id):
+        """
+        Remove an identifier, if it is seen.
+        """
+        if self._seen.pop(id, None) is not None:
+            self.modified = True
+
+    def purge(self):
+        """
+        Forget identifiers older than :attr:`ttl`, and the oldest ones above
+        :attr:`max_size`.
+        """
+        now = datetime.now()
+        for id, date in self._seen.items():
+            if not isinstance(date, datetime):
+                # Sets stored without dates are considered as seen now.
+                self._seen[id] = now
+                self.modified = True
+            elif self.ttl is not None and now - date > self.ttl:
+                del self._seen[id]
+                self.modified = True
+
+        if self.max_size is not None and len(self._seen) > self.max_size:
+            oldest = sorted(self._seen, key=self._seen.get)
+            for id in oldest[:len(self._seen) - self.max_size]:
+                del self._seen[id]
+            self.modified = True
+
+    def save(self):
+        """
+        Save the storage of the backend, if identifiers have been added or
+        removed.
+        """
+        if self.modified:
+            self.purge()
+            self.storage.save()
+            self.modified = False
 
 
 class BackendStorage(object):
@@ -48,6 +143,7 @@ class BackendStorage(object):
     def __init__(self, name, storage):
         self.name = name
         self.storage = storage
+        self._seen_sets = {}
 
     def set(self, *args):
         """
@@ -107,6 +203,7 @@ class BackendStorage(object):
         :param default: this is the default tree if storage is empty
         :type default: :class:`dict`
         """
+        self._seen_sets = {}
         if self.storage:
             return self.storage.load('backends', self.name, default)
 
@@ -117,6 +214,33 @@ class BackendStorage(object):
         if self.storage:
             return self.storage.save('backends', self.name)
 
+    def get_seen(self, key='seen', ttl=None, max_size=None):
+        """
+        Get a set of identifiers of seen objects, with O(1) membership tests.
+
+        Example:
+
+        >>> seen = backend.storage.get_seen(ttl=timedelta(days=60)) # doctest: +SKIP
+        >>> if thread.id not in seen: # doctest: +SKIP
+        ...     seen.add(thread.id)
+        ...     seen.save()
+
+        The same :class:`SeenSet` is returned for a key, until the storage is
+        loaded again.
+
+        :param key: where identifiers are stored
+        :param ttl: maximum age of identifiers
+        :type ttl: :class:`datetime.timedelta`
+        :param max_size: maximum number of identifiers
+        :type max_size: :class:`int`
+        :rtype: :class:`SeenSet`
+        """
+        try:
+            return self._seen_sets[key]
+        except KeyError:
+            seen = self._seen_sets[key] = SeenSet(self, key, ttl, max_size)
+            return seen
+
 
 class BackendConfig(ValuesDict):
     """
@@ -249,6 +373,13 @@ class Module(object):
     # When the method is called, fields are only the one which are
     # NOT yet filled.
     OBJECTS = {}
+    # Supported objects to fill several at once, by fillobjs()
+    # The key is the class and the value the method to call to fill
+    # Method prototype: method(objects, fields)
+    # When the method is called, fields are the ones which are NOT yet
+    # filled in at least one of the objects. Other objects are filled one by
+    # one with OBJECTS.
+    BULK_OBJECTS = {}
 
     class ConfigError(Exception):
         """
@@ -346,8 +477,32 @@ class Module(object):
             kwargs.setdefault('responses_dirname', os.path.join(self.logger.settings['responses_dirname'],
                                                                 self._private_config.get('_debug_dir', self.name)))
 
+        from weboob.browser import Browser
+        # Browsers of weboob.deprecated have no HTTP cache nor cassette.
+        if issubclass(self.BROWSER, Browser):
+            if self.logger.settings['http_cache_dirname']:
+                kwargs.setdefault('cache_dirname', os.path.join(self.logger.settings['http_cache_dirname'], self.name))
+            if self.logger.settings['cassettes_dirname']:
+                kwargs.setdefault('cassette', self.get_cassette())
+
         return self.BROWSER(*args, **kwargs)
 
+    _cassette = None
+
+    def get_cassette(self):
+        """
+        Get the cassette where HTTP exchanges of the backend's browsers are
+        recorded or replayed from, in the directory given by the
+        "cassettes_dirname" logging setting.
+
+        :rtype: :class:`weboob.browser.cassette.Cassette`
+        """
+        if self._cassette is None:
+            from weboob.browser.cassette import Cassette
+            path = os.path.join(self.logger.settings['cassettes_dirname'], '%s.json.gz' % self.name)
+            self._cassette = Cassette(path, record=self.logger.settings['cassette_mode'] == 'record')
+        return self._cassette
+
     @classmethod
     def iter_caps(klass):
         """
@@ -373,22 +528,10 @@ class Module(object):
                 return True
         return False
 
-    def fillobj(self, obj, fields=None):
-        """
-        Fill an object with the wanted fields.
-
-        :param fields: what fields to fill; if None, all fields are filled
-        :type fields: :class:`list`
-        """
-        if obj is None:
-            return obj
-
+    def _get_missing_fields(self, obj, fields):
         def not_loaded(v):
             return (v is NotLoaded or isinstance(v, BaseObject) and not v.__iscomplete__())
 
-        if isinstance(fields, basestring):
-            fields = (fields,)
-
         missing_fields = []
         if fields is None:
             # Select all fields
@@ -414,6 +557,22 @@ class Module(object):
             if missing:
                 missing_fields.append(field)
 
+        return missing_fields
+
+    def fillobj(self, obj, fields=None):
+        """
+        Fill an object with the wanted fields.
+
+        :param fields: what fields to fill; if None, all fields are filled
+        :type fields: :class:`list`
+        """
+        if obj is None:
+            return obj
+
+        if isinstance(fields, basestring):
+            fields = (fields,)
+
+        missing_fields = self._get_missing_fields(obj, fields)
         if not missing_fields:
             return obj
 
@@ -428,3 +587,57 @@ class Module(object):
             setattr(obj, field, NotAvailable)
 
         return obj
+
+    def fillobjs(self, objs, fields=None):
+        """
+        Fill several objects with the wanted fields.
+
+        Objects supported by a method of :attr:`BULK_OBJECTS` are given to it
+        at once, so it can fetch them together. Other objects are filled one
+        by one with :func:`fillobj`.
+
+        As with :func:`fillobj`, a method can return new objects to replace
+        the given ones (in the same order), and fields it has not been able
+        to fill are set to :class:`NotAvailable`.
+
+        :param objs: objects to fill
+        :type objs: :class:`list`
+        :param fields: what fields to fill; if None, all fields are filled
+        :type fields: :class:`list`
+        :returns: filled objects, in the same order
+        :rtype: :class:`list`
+        """
+        if isinstance(fields, basestring):
+            fields = (fields,)
+
+        results = list(objs)
+        groups = OrderedDict()
+        for i, obj in enumerate(results):
+            if obj is None:
+                continue
+
+            for key, value in self.BULK_OBJECTS.iteritems():
+                if isinstance(obj, key):
+                    break
+            else:
+                results[i] = self.fillobj(obj, fields)
+                continue
+
+            missing_fields = self._get_missing_fields(obj, fields)
+            if missing_fields:
+                indexes, group, group_fields = groups.setdefault(value, ([], [], []))
+                indexes.append(i)
+                group.append(obj)
+                group_fields.extend([field for field in missing_fields if field not in group_fields])
+
+        for value, (indexes, group, group_fields) in groups.iteritems():
+            self.logger.debug(u'Fill %d objects with fields: %s' % (len(group), group_fields))
+            filled = value(self, group, group_fields) or group
+            for i, obj in zip(indexes, filled):
+                obj = obj or results[i]
+                for field in group_fields:
+                    if getattr(obj, field) is NotLoaded:
+                        setattr(obj, field, NotAvailable)
+                results[i] = obj
+
+        return results
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from threading import Event, local
+
+
+__all__ = ['CancelToken', 'current_token', 'is_cancelled']
+
+
+_local = local()
+
+
+class CancelToken(object):
+    """
+    Cooperative cancellation flag.
+
+    A token is activated for the current thread with the ``with`` statement,
+    so code deeper in the stack (like pagination helpers of browsers) can
+    stop its work with :func:`is_cancelled` without knowing who started it.
+
+    >>> token = CancelToken()
+    >>> with token:
+    ...     is_cancelled()
+    ...     token.cancel()
+    ...     is_cancelled()
+    False
+    True
+    >>> is_cancelled()
+    False
+    """
+
+    def __init__(self):
+        self._event = Event()
+
+    def cancel(self):
+        """
+        Ask to stop the work.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the token is cancelled, or the timeout expires.
+
+        :rtype: :class:`bool`
+        """
+        return self._event.wait(timeout)
+
+    def __enter__(self):
+        if not hasattr(_local, 'tokens'):
+            _local.tokens = []
+        _local.tokens.append(self)
+        return self
+
+    def __exit__(self, t, v, tb):
+        _local.tokens.pop()
+
+
+def current_token():
+    """
+    Get the token active in the current thread, if any.
+
+    :rtype: :class:`CancelToken` or None
+    """
+    tokens = getattr(_local, 'tokens', None)
+    if tokens:
+        return tokens[-1]
+    return None
+
+
+def is_cancelled():
+    """
+    Return True if the work done by the current thread has been cancelled.
+    """
+    token = current_token()
+    return token is not None and token.cancelled
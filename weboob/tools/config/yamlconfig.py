@@ -69,10 +69,12 @@ class YamlConfig(IConfig):
         if self.values is None:
             self.values = {}
 
-    def save(self):
+    def save(self, values=None):
+        if values is None:
+            values = self.values
         # write in a temporary file to avoid corruption problems
         with tempfile.NamedTemporaryFile(dir=os.path.dirname(self.path), delete=False) as f:
-            yaml.dump(self.values, f, Dumper=WeboobDumper, default_flow_style=False)
+            yaml.dump(values, f, Dumper=WeboobDumper, default_flow_style=False)
         os.rename(f.name, self.path)
 
     def get(self, *args, **kwargs):
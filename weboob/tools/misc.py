@@ -39,7 +39,9 @@ def get_backtrace(empty="Empty backtrace."):
     try:
         info = sys.exc_info()
         trace = traceback.format_exception(*info)
-        sys.exc_clear()
+        if hasattr(sys, 'exc_clear'):
+            # Python 2 only
+            sys.exc_clear()
         if trace[0] != "None\n":
             return "".join(trace)
     except:
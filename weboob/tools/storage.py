@@ -18,9 +18,22 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+import os
+import shutil
+import sqlite3
+import time
 from copy import deepcopy
+from threading import Condition, Lock, RLock, Thread
 
-from .config.yamlconfig import YamlConfig
+import yaml
+
+from .config.iconfig import ConfigError
+from .config.yamlconfig import Loader, WeboobDumper, YamlConfig
+from .log import getLogger
+from .misc import get_backtrace
+
+
+__all__ = ['IStorage', 'StandardStorage', 'SQLiteStorage', 'BufferedStorage']
 
 
 class IStorage(object):
@@ -30,12 +43,25 @@ class IStorage(object):
         """
         raise NotImplementedError()
 
-    def save(self, what, name):
+    def save(self, what, name, tree=None):
         """
         Write changes in storage on the disk.
+
+        :param tree: data to write instead of the current one, as returned
+                     by :func:`snapshot`
+        :type tree: :class:`dict`
         """
         raise NotImplementedError()
 
+    def snapshot(self, what, name):
+        """
+        Get a copy of the current data, which can be given later to
+        :func:`save`.
+
+        :rtype: :class:`dict`
+        """
+        return deepcopy(self.get(what, name))
+
     def set(self, what, name, *args):
         """
         Set data in a path.
@@ -54,30 +80,321 @@ class IStorage(object):
         """
         raise NotImplementedError()
 
+    def flush(self):
+        """
+        Write on the disk the changes which are still pending, if any.
+        """
+        pass
+
 
 class StandardStorage(IStorage):
     def __init__(self, path):
+        # The storage is shared by backends, which are called from several
+        # threads.
+        self._lock = RLock()
         self.config = YamlConfig(path)
         self.config.load()
 
     def load(self, what, name, default={}):
-        d = {}
-        if what not in self.config.values:
-            self.config.values[what] = {}
-        else:
-            d = self.config.values[what].get(name, {})
+        with self._lock:
+            d = {}
+            if what not in self.config.values:
+                self.config.values[what] = {}
+            else:
+                d = self.config.values[what].get(name, {})
+
+            self.config.values[what][name] = deepcopy(default)
+            self.config.values[what][name].update(d)
 
-        self.config.values[what][name] = deepcopy(default)
-        self.config.values[what][name].update(d)
+    def save(self, what, name, tree=None):
+        with self._lock:
+            if tree is None:
+                self.config.save()
+            else:
+                values = dict(self.config.values)
+                values[what] = dict(values.get(what) or {})
+                values[what][name] = tree
+                self.config.save(values)
 
-    def save(self, what, name):
-        self.config.save()
+    def snapshot(self, what, name):
+        with self._lock:
+            return deepcopy(self.config.get(what, name, default={}))
 
     def set(self, what, name, *args):
-        self.config.set(what, name, *args)
+        with self._lock:
+            self.config.set(what, name, *args)
 
     def delete(self, what, name, *args):
-        self.config.delete(what, name, *args)
+        with self._lock:
+            self.config.delete(what, name, *args)
 
     def get(self, what, name, *args, **kwargs):
-        return self.config.get(what, name, *args, **kwargs)
+        with self._lock:
+            return self.config.get(what, name, *args, **kwargs)
+
+
+class SQLiteStorage(IStorage):
+    """
+    Storage in a SQLite database.
+
+    Like :class:`StandardStorage`, data of each backend or application is
+    kept in memory, so objects returned by :func:`get` can be modified in
+    place. But :func:`save` only writes the first-level keys of the saved
+    tree which have changed since the last save, in a transaction, instead
+    of the whole storage.
+
+    The database uses the WAL journal, and it can be used by several threads
+    at once.
+
+    When *path* is a storage file of :class:`StandardStorage`, it is
+    migrated: its content is imported in a new database, which then replaces
+    it, and the file is kept with a ``.yaml`` suffix. The database is built
+    aside, so if the migration is interrupted, it is done again from the
+    start on the next run.
+
+    :param path: path of the database
+    :type path: :class:`str`
+    """
+
+    TIMEOUT = 30
+    """
+    Seconds to wait for a lock on the database held by an other process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        self._saved = {}
+        self._lock = RLock()
+
+        if os.path.exists(path) and not self._is_database(path):
+            self._migrate(path)
+
+        self._db = self._connect(path)
+
+    def _connect(self, path):
+        db = sqlite3.connect(path, timeout=self.TIMEOUT, check_same_thread=False)
+        db.text_factory = str
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS storage ('
+                       'what TEXT NOT NULL, name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                       'PRIMARY KEY (what, name, key))')
+        return db
+
+    def _migrate(self, path):
+        tmp = path + '.tmp'
+        if os.path.exists(tmp):
+            # left by an interrupted migration
+            os.remove(tmp)
+
+        self._db = self._connect(tmp)
+        try:
+            self._import(path)
+        finally:
+            self._db.close()
+
+        shutil.copy2(path, path + '.yaml')
+        os.rename(tmp, path)
+
+    @staticmethod
+    def _is_database(path):
+        with open(path, 'rb') as f:
+            header = f.read(16)
+        return not header or header == b'SQLite format 3\x00'
+
+    def _import(self, path):
+        config = YamlConfig(path)
+        config.load()
+        with self._lock:
+            for what, names in config.values.iteritems():
+                for name, tree in (names or {}).iteritems():
+                    self.values.setdefault(what, {})[name] = tree
+                    self.save(what, name)
+
+    def _dump(self, value):
+        return yaml.dump(value, Dumper=WeboobDumper, default_flow_style=False)
+
+    def _tree(self, what, name):
+        try:
+            return self.values[what][name]
+        except KeyError:
+            pass
+
+        tree = {}
+        saved = {}
+        for key, value in self._db.execute('SELECT key, value FROM storage WHERE what = ? AND name = ?',
+                                           (what, name)):
+            tree[yaml.load(key, Loader=Loader)] = yaml.load(value, Loader=Loader)
+            saved[key] = value
+        self.values.setdefault(what, {})[name] = tree
+        self._saved[(what, name)] = saved
+        return tree
+
+    def load(self, what, name, default={}):
+        with self._lock:
+            d = self._tree(what, name)
+            self.values[what][name] = deepcopy(default)
+            self.values[what][name].update(d)
+
+    def save(self, what, name, tree=None):
+        with self._lock:
+            if tree is None:
+                tree = self._tree(what, name)
+            saved = self._saved.setdefault((what, name), {})
+            dumps = dict((self._dump(key), self._dump(value)) for key, value in tree.iteritems())
+
+            with self._db:
+                for key, value in dumps.iteritems():
+                    if saved.get(key) != value:
+                        self._db.execute('INSERT OR REPLACE INTO storage (what, name, key, value) VALUES (?, ?, ?, ?)',
+                                         (what, name, key, value))
+                for key in set(saved) - set(dumps):
+                    self._db.execute('DELETE FROM storage WHERE what = ? AND name = ? AND key = ?',
+                                     (what, name, key))
+            self._saved[(what, name)] = dumps
+
+    def snapshot(self, what, name):
+        with self._lock:
+            return deepcopy(self._tree(what, name))
+
+    def set(self, what, name, *args):
+        with self._lock:
+            v = self._tree(what, name)
+            for a in args[:-2]:
+                try:
+                    v = v[a]
+                except KeyError:
+                    v[a] = {}
+                    v = v[a]
+                except TypeError:
+                    raise ConfigError()
+
+            v[args[-2]] = args[-1]
+
+    def delete(self, what, name, *args):
+        with self._lock:
+            v = self._tree(what, name)
+            for a in args[:-1]:
+                try:
+                    v = v[a]
+                except KeyError:
+                    return
+                except TypeError:
+                    raise ConfigError()
+
+            v.pop(args[-1], None)
+
+    def get(self, what, name, *args, **kwargs):
+        with self._lock:
+            v = self._tree(what, name)
+            if not args:
+                return v
+
+            for a in args[:-1]:
+                try:
+                    v = v[a]
+                except KeyError:
+                    if 'default' in kwargs:
+                        v[a] = {}
+                        v = v[a]
+                    else:
+                        raise ConfigError()
+                except TypeError:
+                    raise ConfigError()
+
+            try:
+                v = v[args[-1]]
+            except KeyError:
+                v = kwargs.get('default')
+
+            return v
+
+
+class BufferedStorage(IStorage):
+    """
+    Delay and coalesce the saves of an other storage.
+
+    :func:`save` only takes a copy of the tree, and a background thread saves
+    the copies of modified trees *delay* seconds after the first
+    modification. So a burst of saves, like messages marked as read one by
+    one, is written once, without blocking the calling threads, and without
+    reading trees which may be modified meanwhile.
+
+    :func:`flush` saves the modified trees immediately. It is called by
+    :func:`weboob.core.ouiboube.WebNip.deinit`.
+
+    :param storage: storage to use
+    :type storage: :class:`IStorage`
+    :param delay: seconds to wait before saving modified trees
+    :type delay: :class:`float`
+    """
+
+    DELAY = 5
+
+    def __init__(self, storage, delay=None):
+        self.storage = storage
+        self.delay = self.DELAY if delay is None else delay
+        self.logger = getLogger('storage')
+
+        self._cond = Condition(Lock())
+        self._flush_lock = Lock()
+        self._dirty = {}
+        self._due = None
+        self._thread = None
+
+    def load(self, what, name, default={}):
+        return self.storage.load(what, name, default)
+
+    def set(self, what, name, *args):
+        return self.storage.set(what, name, *args)
+
+    def delete(self, what, name, *args):
+        return self.storage.delete(what, name, *args)
+
+    def get(self, what, name, *args, **kwargs):
+        return self.storage.get(what, name, *args, **kwargs)
+
+    def snapshot(self, what, name):
+        return self.storage.snapshot(what, name)
+
+    def save(self, what, name, tree=None):
+        if tree is None:
+            tree = self.storage.snapshot(what, name)
+        with self._cond:
+            self._dirty[(what, name)] = tree
+            if self._due is None:
+                self._due = time.time() + self.delay
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='storage')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                dirty = self._dirty
+                self._dirty = {}
+                self._due = None
+
+            for (what, name), tree in sorted(dirty.iteritems()):
+                try:
+                    self.storage.save(what, name, tree)
+                except Exception:
+                    # Try again later, unless it has been saved again.
+                    self.logger.error(get_backtrace())
+                    with self._cond:
+                        self._dirty.setdefault((what, name), tree)
+                        if self._due is None:
+                            self._due = time.time() + self.delay
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty and self._due > time.time():
+                    self._cond.wait(self._due - time.time())
+                if not self._dirty:
+                    self._thread = None
+                    return
+            self.flush()
@@ -17,11 +17,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import sys
 from random import choice
 from unittest import TestCase
 
 from weboob.core import Weboob
+from weboob.tools.log import settings as log_settings
 
 # This is what nose does for Python 2.6 and lower compatibility
 # We do the same so nose becomes optional
@@ -35,11 +37,25 @@ __all__ = ['BackendTest', 'SkipTest']
 
 
 class BackendTest(TestCase):
+    """
+    Base class of module tests.
+
+    HTTP exchanges can be recorded by setting the WEBOOB_RECORD environment
+    variable to a directory, and replayed without network by setting
+    WEBOOB_REPLAY to this directory.
+    """
+
     MODULE = None
 
     def __init__(self, *args, **kwargs):
         TestCase.__init__(self, *args, **kwargs)
 
+        for mode in ('record', 'replay'):
+            dirname = os.environ.get('WEBOOB_%s' % mode.upper())
+            if dirname:
+                log_settings['cassette_mode'] = mode
+                log_settings['cassettes_dirname'] = dirname
+
         self.backends = {}
         self.backend_instance = None
         self.backend = None
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from itertools import islice
+from unittest import TestCase
+
+from weboob.capabilities.base import BaseObject, NotAvailable, StringField
+from weboob.tools.application.base import Application, MoreResultsAvailable
+from weboob.tools.backend import BackendStorage, Module
+from weboob.tools.storage import SQLiteStorage
+
+
+class Video(BaseObject):
+    """
+    Video.
+    """
+    title = StringField('Title')
+    url = StringField('URL')
+
+
+class Image(BaseObject):
+    """
+    Image.
+    """
+    url = StringField('URL')
+
+
+class Recipe(BaseObject):
+    """
+    Recipe.
+    """
+    title = StringField('Title')
+
+
+class FakeModule(Module):
+    NAME = 'fake'
+
+    def __init__(self):
+        super(FakeModule, self).__init__(None, 'fake')
+        self.calls = []
+
+    def fill_video(self, videos, fields):
+        self.calls.append(([video.id for video in videos], fields))
+        for video in videos:
+            for field in fields:
+                setattr(video, field, u'%s-%s' % (field, video.id))
+
+    def fill_image(self, image, fields):
+        self.calls.append((image.id, fields))
+        image.url = u'url-%s' % image.id
+
+    OBJECTS = {Image: fill_image}
+    BULK_OBJECTS = {Video: fill_video}
+
+
+def iter_videos(n):
+    for i in range(n):
+        yield Video(unicode(i))
+
+
+class FillObjsTest(TestCase):
+    def setUp(self):
+        self.module = FakeModule()
+
+    def test_fillobjs(self):
+        videos = [Video(u'1'), Video(u'2'), Video(u'3')]
+        videos[1].title = u'known'
+        videos[2].title = videos[2].url = u'known'
+        objs = [videos[0], Image(u'4'), None, videos[1], Recipe(u'5'), videos[2]]
+
+        self.assertEqual(self.module.fillobjs(objs), objs)
+        self.assertEqual(self.module.calls, [(u'4', ['url']), ([u'1', u'2'], ['title', 'url'])])
+        self.assertEqual([(video.title, video.url) for video in videos],
+                         [(u'title-1', u'url-1'), (u'title-2', u'url-2'), (u'known', u'known')])
+        self.assertEqual(objs[1].url, u'url-4')
+        self.assertEqual(objs[4].title, NotAvailable)
+
+        self.module.calls = []
+        self.module.fillobjs([Video(u'6'), Video(u'7')], 'url')
+        self.assertEqual(self.module.calls, [([u'6', u'7'], ['url'])])
+
+    def test_fillobjs_result(self):
+        def fill_video(module, videos, fields):
+            # the first video is replaced, the second one is not found
+            video = Video(videos[0].id)
+            video.title = u'new'
+            return [video, None]
+
+        self.module.BULK_OBJECTS = {Video: fill_video}
+        videos = [Video(u'1'), Video(u'2')]
+        results = self.module.fillobjs(videos, ['title'])
+        self.assertIsNot(results[0], videos[0])
+        self.assertEqual(results[0].title, u'new')
+        self.assertIs(results[1], videos[1])
+        self.assertEqual(results[1].title, NotAvailable)
+
+    def create_app(self):
+        app = Application.__new__(Application)
+        app.condition = None
+        app._is_default_count = True
+        app.FILL_CHUNK_SIZE = 2
+        return app
+
+    def test_complete_iter(self):
+        app = self.create_app()
+        results = list(app._do_complete_iter(self.module, None, ['title'], iter_videos(5)))
+        self.assertEqual([video.title for video in results], [u'title-%d' % i for i in range(5)])
+        self.assertEqual([ids for ids, fields in self.module.calls],
+                         [[u'0', u'1'], [u'2', u'3'], [u'4']])
+        self.assertEqual(results[0].backend, 'fake')
+
+        # Only the results which are needed are filled.
+        self.module.calls = []
+        results = []
+        with self.assertRaises(MoreResultsAvailable):
+            for video in app._do_complete_iter(self.module, 3, ['title'], iter_videos(10)):
+                results.append(video)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([ids for ids, fields in self.module.calls],
+                         [[u'0', u'1'], [u'2'], [u'3']])
+        self.assertEqual(results[-1].title, u'title-2')
+
+        # Without bulk fillers, results are filled and returned one by one.
+        self.module.BULK_OBJECTS = {}
+        self.module.OBJECTS = {Video: lambda module, video, fields: module.calls.append(video.id)}
+        self.module.calls = []
+        for video in app._do_complete_iter(self.module, None, ['title'], iter_videos(2)):
+            self.assertEqual(self.module.calls[-1], video.id)
+        self.assertEqual(self.module.calls, [u'0', u'1'])
+
+    def test_complete_iter_cancelled(self):
+        app = self.create_app()
+
+        # The call is cancelled while the backend has other results.
+        results = app._do_complete_iter(self.module, None, ['title'], iter_videos(3))
+        next(results)
+        self.assertRaises(MoreResultsAvailable, results.close)
+        results = app._do_complete_iter(self.module, None, ['title'], iter_videos(3))
+        next(results)
+        next(results)
+        self.assertRaises(MoreResultsAvailable, results.close)
+
+        # The call is cancelled on the last result of the backend.
+        results = app._do_complete_iter(self.module, None, ['title'], iter_videos(3))
+        list(islice(results, 3))
+        results.close()
+
+
+class SeenSetTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.storage')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, default):
+        storage = BackendStorage('foo', SQLiteStorage(self.path))
+        storage.load(default)
+        return storage
+
+    def test_seen(self):
+        storage = self.load({'seen': [u'1', u'2']})
+        seen = storage.get_seen()
+        self.assertIs(storage.get_seen(), seen)
+        self.assertIn(u'1', seen)
+        self.assertNotIn(u'3', seen)
+
+        seen.add(u'3')
+        seen.discard(u'1')
+        seen.save()
+        self.assertFalse(seen.modified)
+
+        seen = self.load({'seen': {}}).get_seen()
+        self.assertEqual(sorted(seen), [u'2', u'3'])
+
+    def test_purge(self):
+        storage = self.load({'seen': {}})
+        now = datetime.now()
+        storage.set('seen', {u'old': now - timedelta(days=10), u'older': now - timedelta(days=20)})
+        seen = storage.get_seen(ttl=timedelta(days=15), max_size=2)
+        self.assertEqual(sorted(seen), [u'old'])
+
+        seen.add(u'1')
+        seen.add(u'2')
+        seen.save()
+        self.assertEqual(sorted(seen), [u'1', u'2'])
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2015 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from unittest import TestCase
+
+from weboob.tools.storage import BufferedStorage, SQLiteStorage, StandardStorage
+
+
+class SQLiteStorageTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.storage')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_and_reload(self):
+        storage = SQLiteStorage(self.path)
+        storage.load('backends', 'foo', {'seen': [], 'lastpurge': None})
+        storage.get('backends', 'foo', 'seen').append(u'1')
+        storage.set('backends', 'foo', 'contacts', 'bob', {'lastmsg': date(2015, 1, 2)})
+        storage.save('backends', 'foo')
+
+        changes = storage._db.total_changes
+        storage.get('backends', 'foo', 'seen').append(u'2')
+        storage.save('backends', 'foo')
+        self.assertEqual(storage._db.total_changes, changes + 1)
+
+        storage.delete('backends', 'foo', 'lastpurge')
+        storage.save('backends', 'foo')
+
+        storage = SQLiteStorage(self.path)
+        storage.load('backends', 'foo', {'seen': [], 'other': 1})
+        self.assertEqual(storage.get('backends', 'foo'),
+                         {'seen': [u'1', u'2'], 'other': 1, 'contacts': {'bob': {'lastmsg': date(2015, 1, 2)}}})
+        self.assertEqual(storage.get('backends', 'bar', 'seen', default=[]), [])
+
+    def test_migration(self):
+        legacy = StandardStorage(self.path)
+        legacy.load('backends', 'foo', {'seen': [u'1']})
+        legacy.load('applications', 'monboob', {'last': 2})
+        legacy.save('backends', 'foo')
+
+        storage = SQLiteStorage(self.path)
+        self.assertTrue(os.path.exists(self.path + '.yaml'))
+        self.assertEqual(storage.get('backends', 'foo', 'seen'), [u'1'])
+        self.assertEqual(SQLiteStorage(self.path).get('applications', 'monboob', 'last'), 2)
+
+    def test_interrupted_migration(self):
+        legacy = StandardStorage(self.path)
+        legacy.load('backends', 'foo', {'seen': [u'1']})
+        legacy.save('backends', 'foo')
+
+        class InterruptedStorage(SQLiteStorage):
+            def _import(self, path):
+                SQLiteStorage._import(self, path)
+                raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, InterruptedStorage, self.path)
+        self.assertFalse(SQLiteStorage._is_database(self.path))
+        self.assertFalse(os.path.exists(self.path + '.yaml'))
+
+        storage = SQLiteStorage(self.path)
+        self.assertEqual(storage.get('backends', 'foo', 'seen'), [u'1'])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_threads(self):
+        storage = SQLiteStorage(self.path)
+
+        def run(name):
+            storage.load('backends', name, {'seen': []})
+            for i in range(20):
+                storage.get('backends', name, 'seen').append(i)
+                storage.save('backends', name)
+
+        threads = [threading.Thread(target=run, args=('backend%d' % i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        storage = SQLiteStorage(self.path)
+        for i in range(5):
+            self.assertEqual(storage.get('backends', 'backend%d' % i, 'seen'), range(20))
+
+
+class RecordStorage(StandardStorage):
+    def __init__(self, path):
+        StandardStorage.__init__(self, path)
+        self.saves = []
+
+    def save(self, what, name, tree=None):
+        self.saves.append((what, name))
+        StandardStorage.save(self, what, name, tree)
+
+
+class BufferedStorageTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage = RecordStorage(os.path.join(self.tmpdir, 'test.storage'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_flush(self):
+        storage = BufferedStorage(self.storage, delay=60)
+        storage.load('backends', 'foo', {'seen': []})
+        for i in range(10):
+            storage.get('backends', 'foo', 'seen').append(i)
+            storage.save('backends', 'foo')
+        storage.save('backends', 'bar')
+        self.assertEqual(self.storage.saves, [])
+
+        storage.flush()
+        self.assertEqual(self.storage.saves, [('backends', 'bar'), ('backends', 'foo')])
+        storage.flush()
+        self.assertEqual(len(self.storage.saves), 2)
+        self.assertEqual(StandardStorage(self.storage.config.path).get('backends', 'foo', 'seen'), range(10))
+
+    def test_snapshot(self):
+        storage = BufferedStorage(self.storage, delay=60)
+        storage.load('backends', 'foo', {'seen': []})
+        storage.get('backends', 'foo', 'seen').append(1)
+        storage.save('backends', 'foo')
+        # changed after the save, but not saved again
+        storage.get('backends', 'foo', 'seen').append(2)
+
+        storage.flush()
+        self.assertEqual(StandardStorage(self.storage.config.path).get('backends', 'foo', 'seen'), [1])
+        self.assertEqual(storage.get('backends', 'foo', 'seen'), [1, 2])
+
+    def test_background(self):
+        storage = BufferedStorage(self.storage, delay=0.05)
+        storage.save('backends', 'foo')
+        storage.save('backends', 'foo')
+        thread = storage._thread
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.storage.saves, [('backends', 'foo')])
+        self.assertIsNone(storage._thread)